@@ -0,0 +1,111 @@
+// Token akses untuk API. Login.html menyimpan access/refresh token di sessionStorage;
+// skrip ini menambahkan header Authorization ke setiap fetch() dan $.ajax ke origin yang sama,
+// memperbarui access token sebelum kedaluwarsa, dan mengulang fetch() sekali bila server menjawab 401.
+// Muat setelah jQuery (bila halaman memakainya) dan sebelum skrip lain yang memanggil API.
+(function () {
+    const originalFetch = window.fetch.bind(window);
+    const REFRESH_MARGIN = 60 * 1000; // Perbarui token 1 menit sebelum kedaluwarsa
+    let refreshing = null;
+    let refreshTimer = null;
+
+    function sameOrigin(url) {
+        return new URL(url, window.location.href).origin === window.location.origin;
+    }
+
+    function authHeader() {
+        const token = sessionStorage.getItem('accessToken');
+        return token ? 'Bearer ' + token : null;
+    }
+
+    function saveTokens(data) {
+        sessionStorage.setItem('accessToken', data.access_token);
+        sessionStorage.setItem('refreshToken', data.refresh_token);
+        sessionStorage.setItem('tokenExpires', String(Date.now() + data.expires_in * 1000));
+        scheduleRefresh();
+    }
+
+    function refreshTokens() {
+        const refreshToken = sessionStorage.getItem('refreshToken');
+        if (!refreshToken) {
+            return Promise.resolve(false);
+        }
+        if (!refreshing) {
+            refreshing = originalFetch('/token/refresh', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ refresh_token: refreshToken })
+            })
+                .then(response => response.ok ? response.json() : null)
+                .then(data => {
+                    if (data) {
+                        saveTokens(data);
+                    }
+                    return Boolean(data);
+                })
+                .catch(() => false)
+                .finally(() => { refreshing = null; });
+        }
+        return refreshing;
+    }
+
+    function scheduleRefresh() {
+        clearTimeout(refreshTimer);
+        const expires = Number(sessionStorage.getItem('tokenExpires'));
+        if (expires) {
+            refreshTimer = setTimeout(refreshTokens, Math.max(expires - Date.now() - REFRESH_MARGIN, 0));
+        }
+    }
+
+    function sessionExpired() {
+        alert('Sesi Anda telah berakhir, silakan login kembali.');
+        sessionStorage.clear();
+        window.location.href = '../Login/Login.html';
+    }
+
+    function withAuth(init) {
+        const header = authHeader();
+        const headers = new Headers((init && init.headers) || {});
+        if (header && !headers.has('Authorization')) {
+            headers.set('Authorization', header);
+        }
+        return Object.assign({}, init, { headers: headers });
+    }
+
+    window.fetch = async function (input, init) {
+        const url = typeof input === 'string' ? input : input.url;
+        if (!sameOrigin(url)) {
+            return originalFetch(input, init);
+        }
+        let response = await originalFetch(input, withAuth(init));
+        if (response.status === 401 && sessionStorage.getItem('refreshToken')) {
+            if (await refreshTokens()) {
+                response = await originalFetch(input, withAuth(init));
+            } else {
+                sessionExpired();
+            }
+        }
+        return response;
+    };
+
+    if (window.jQuery) {
+        jQuery.ajaxPrefilter(function (options, originalOptions, jqXHR) {
+            const header = authHeader();
+            if (header && sameOrigin(options.url)) {
+                jqXHR.setRequestHeader('Authorization', header);
+            }
+        });
+        jQuery(document).ajaxError(function (event, jqXHR, settings) {
+            // $.ajax tidak diulang otomatis; token yang sudah tidak bisa diperbarui berarti sesi habis
+            if (jqXHR.status === 401 && sameOrigin(settings.url)) {
+                refreshTokens().then(ok => {
+                    if (!ok) {
+                        sessionExpired();
+                    }
+                });
+            }
+        });
+    }
+
+    window.saveTokens = saveTokens;
+    scheduleRefresh();
+})();
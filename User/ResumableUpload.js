@@ -0,0 +1,102 @@
+// Upload bertahap (resumable) ke backend Flask.
+// File dikirim per potongan ke /uploads; bila koneksi putus, potongan yang gagal dicoba ulang
+// dan upload yang sama bisa dilanjutkan dari offset terakhir (id sesi disimpan di localStorage).
+const UPLOAD_API_URL = ''; // Halaman dilayani backend di /app/, jadi API berada di origin yang sama
+const UPLOAD_MAX_RETRY = 5;
+
+async function uploadChecksum(buffer) {
+    // crypto.subtle hanya tersedia di secure context (https atau localhost)
+    if (!window.crypto || !window.crypto.subtle) {
+        return null;
+    }
+    const digest = new Uint8Array(await window.crypto.subtle.digest('SHA-256', buffer));
+    let binary = '';
+    digest.forEach(byte => { binary += String.fromCharCode(byte); });
+    return 'sha256 ' + btoa(binary);
+}
+
+function uploadDelay(attempt) {
+    return new Promise(resolve => setTimeout(resolve, Math.min(1000 * 2 ** attempt, 15000)));
+}
+
+async function startUploadSession(file, target, storageKey) {
+    const saved = localStorage.getItem(storageKey);
+    if (saved) {
+        const response = await fetch(`${UPLOAD_API_URL}/uploads/${saved}`);
+        if (response.ok) {
+            return response.json(); // Lanjutkan upload sebelumnya
+        }
+        localStorage.removeItem(storageKey);
+    }
+    const response = await fetch(`${UPLOAD_API_URL}/uploads`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ target: target, filename: file.name, size: file.size, mime: file.type })
+    });
+    const session = await response.json();
+    if (!response.ok) {
+        throw new Error(session.error);
+    }
+    localStorage.setItem(storageKey, session.id);
+    return session;
+}
+
+async function sendUploadChunk(session, file, offset) {
+    const index = Math.floor(offset / session.chunkSize);
+    const chunk = await file.slice(offset, offset + session.chunkSize).arrayBuffer();
+    const headers = { 'Content-Type': 'application/offset+octet-stream' };
+    const checksum = await uploadChecksum(chunk);
+    if (checksum) {
+        headers['Upload-Checksum'] = checksum;
+    }
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(`${UPLOAD_API_URL}/uploads/${session.id}/${index}`, {
+                method: 'PUT',
+                headers: headers,
+                body: chunk
+            });
+            const body = await response.json().catch(() => ({})); // Error 5xx bisa berupa halaman HTML
+            // 409 dengan offset lain: server sudah lebih jauh/belum sampai, ikuti offset server.
+            // 409 dengan offset yang sama: potongan ini sedang ditulis request lain, tunggu lalu coba lagi.
+            if (response.ok || (response.status === 409 && body.offset !== offset)) {
+                return body.offset;
+            }
+            if (response.status < 500 && response.status !== 409 && response.status !== 460) {
+                throw new Error(body.error);
+            }
+        } catch (error) {
+            if (!(error instanceof TypeError) || attempt >= UPLOAD_MAX_RETRY) {
+                throw error; // TypeError = koneksi putus, selain itu ditolak server
+            }
+        }
+        if (attempt >= UPLOAD_MAX_RETRY) {
+            throw new Error('Upload gagal setelah beberapa kali percobaan.');
+        }
+        await uploadDelay(attempt);
+    }
+}
+
+// Unggah file ke tabel target ('Proposal', 'LPJ', 'RAB', 'LRA', 'persuratan') lalu buat record-nya dengan fields.
+// onProgress(terkirim, total) dipanggil setiap satu potongan tersimpan. Hasilnya body JSON dari finalize.
+async function resumableUpload(file, target, fields, onProgress) {
+    const storageKey = `upload:${target}:${file.name}:${file.size}:${file.lastModified}`;
+    const session = await startUploadSession(file, target, storageKey);
+    let offset = session.offset;
+    while (offset < file.size) {
+        offset = await sendUploadChunk(session, file, offset);
+        if (onProgress) {
+            onProgress(offset, file.size);
+        }
+    }
+    const response = await fetch(`${UPLOAD_API_URL}/uploads/${session.id}/finalize`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(fields)
+    });
+    const body = await response.json();
+    if (response.ok || response.status === 404) {
+        localStorage.removeItem(storageKey); // Sesi sudah selesai/hilang; selain itu finalize bisa diulang
+    }
+    return body;
+}
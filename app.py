@@ -1,466 +1,3264 @@
 # app.py
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, request, jsonify, send_file, url_for, redirect, g, abort, has_request_context
 from flask_cors import CORS
 import mysql.connector
+from mysql.connector import pooling
 import os
 import base64
-from io import BytesIO
+import binascii
+import csv
+try:
+    import fcntl
+except ImportError: # Windows: tidak ada flock, sesi upload hanya dikunci antar-thread
+    fcntl = None
+try:
+    import brotli
+except ImportError: # Opsional: tanpa modul ini Content-Encoding br tidak ditawarkan
+    brotli = None
+try:
+    import zstandard
+except ImportError: # Opsional: tanpa modul ini Content-Encoding zstd tidak ditawarkan
+    zstandard = None
+import functools
+import hashlib
+import itertools
+import json
+import mimetypes
+import posixpath
+import random
+import re
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO, RawIOBase, StringIO
 import bcrypt
-from datetime import datetime
+import click
+import jwt
+from datetime import date, datetime, timezone
+from werkzeug.exceptions import RequestedRangeNotSatisfiable, RequestEntityTooLarge
+from werkzeug.http import is_resource_modified
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
-CORS(app)
+# Header paginasi dan upload bertahap harus di-expose agar bisa dibaca fetch() dari halaman di origin lain
+CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor', 'Link', 'Location', 'Upload-Offset', 'Upload-Length'])
 
 # === KONFIGURASI DATABASE ===
+# Backend penyimpanan: 'mysql' (default) atau 'sqlite' (satu file lokal, untuk pengembangan/benchmark dan cabang kecil)
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+if DB_BACKEND not in ('mysql', 'sqlite'):
+    raise RuntimeError(f"DB_BACKEND tidak dikenal: {DB_BACKEND} (pilih mysql atau sqlite)")
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'fkdk.sqlite3')
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5)) # Detik menunggu kunci tulis dilepas penulis lain
+SQLITE_CACHE_MB = int(os.getenv('SQLITE_CACHE_MB', 32)) # Page cache per koneksi
+
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'yamabiko.proxy.rlwy.net'), # Default jika variabel lingkungan tidak ditemukan (opsional)
     'user': os.getenv('DB_USER', 'root'),
     'password': os.getenv('DB_PASSWORD', 'LfbIfgJacUolfgMEkxbVDhaExXoxxPhZ'),
     'database': os.getenv('DB_DATABASE', 'railway'),
-    'port': int(os.getenv('DB_PORT', 35739)) # Pastikan dikonversi ke integer
+    'port': int(os.getenv('DB_PORT', 35739)), # Pastikan dikonversi ke integer
+    # Batas waktu (detik) agar proxy database yang lambat/mati tidak menahan worker terlalu lama
+    'connection_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+    'read_timeout': int(os.getenv('DB_READ_TIMEOUT', 30)),
+    'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', 30)),
 }
 
+# Read replica (opsional): bila DB_REPLICA_HOST diisi, GET list/record/download dibaca dari replica.
+# Kredensial dan nama database mengikuti primary kecuali diisi tersendiri.
+REPLICA_CONFIG = dict(
+    DB_CONFIG,
+    host=os.getenv('DB_REPLICA_HOST'),
+    user=os.getenv('DB_REPLICA_USER', DB_CONFIG['user']),
+    password=os.getenv('DB_REPLICA_PASSWORD', DB_CONFIG['password']),
+    database=os.getenv('DB_REPLICA_DATABASE', DB_CONFIG['database']),
+    port=int(os.getenv('DB_REPLICA_PORT', DB_CONFIG['port'])),
+) if os.getenv('DB_REPLICA_HOST') and DB_BACKEND == 'mysql' else None
+REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 1)) # Detik antar pengecekan ketertinggalan replica
+# Detik setelah klien menulis; selama itu semua bacaannya ke primary agar perubahannya langsung terlihat
+READ_YOUR_WRITES_WINDOW = int(os.getenv('READ_YOUR_WRITES_WINDOW', 10))
+
+# === KONFIGURASI POOL KONEKSI ===
+# Ukuran pool berlaku per worker (setiap proses gunicorn punya pool sendiri)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10)) # Detik menunggu koneksi bebas sebelum menyerah
+DB_POOL_MAX_IDLE = int(os.getenv('DB_POOL_MAX_IDLE', 300)) # Koneksi yang menganggur lebih lama dari ini dibuka ulang
+DB_POOL_MAX_AGE = int(os.getenv('DB_POOL_MAX_AGE', 3600)) # Umur maksimum satu koneksi fisik
+# Jumlah prepared statement yang disimpan per koneksi fisik (LRU); 0 = semua query lewat protokol teks
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 64))
+DB_LEAK_THRESHOLD = float(os.getenv('DB_LEAK_THRESHOLD', 30)) # Detik; koneksi yang ditahan lebih lama dilaporkan
+# Simpan stack trace setiap checkout untuk laporan kebocoran (1/0); bila tidak diisi mengikuti mode debug Flask
+DB_LEAK_TRACKING = {'1': True, '0': False}.get(os.getenv('DB_LEAK_TRACKING', ''))
+# Percobaan ulang membuka koneksi, dan SELECT yang koneksinya putus di tengah query; hanya untuk GET/HEAD
+DB_CONNECT_RETRIES = int(os.getenv('DB_CONNECT_RETRIES', 2))
+DB_RETRY_BACKOFF = 0.1 # Detik; jeda percobaan ke-n diacak antara 0 dan DB_RETRY_BACKOFF * 2^n (maks. 1 detik)
+DB_BREAKER_FAILURES = int(os.getenv('DB_BREAKER_FAILURES', 5)) # Kegagalan koneksi berturut-turut sebelum breaker terbuka
+DB_BREAKER_RESET = float(os.getenv('DB_BREAKER_RESET', 15)) # Detik breaker terbuka sebelum satu request percobaan
+
 # === FOLDER UPLOAD ===
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Batas ukuran body request (termasuk JSON base64 lama), default 50 MB
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 50 * 1024 * 1024))
+
+# === UPLOAD BERTAHAP ===
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024)) # Ukuran satu potongan (byte)
+UPLOAD_SESSION_MAX_SIZE = int(os.getenv('UPLOAD_SESSION_MAX_SIZE', 200 * 1024 * 1024))
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600)) # Sesi tanpa aktivitas selama ini dihapus
+UPLOAD_GC_INTERVAL = 600 # Detik minimum antar pembersihan sesi kedaluwarsa per worker
+
+# === FOLDER PENYIMPANAN DOKUMEN ===
+# Isi dokumen Proposal/LPJ/RAB/LRA dan bukti inventaris disimpan di sini, dikunci dengan SHA-256
+DOKUMEN_STORE_DIR = os.getenv('DOKUMEN_STORE_DIR', 'dokumen_store')
+DOKUMEN_ORPHAN_GRACE = int(os.getenv('DOKUMEN_ORPHAN_GRACE', 3600)) # Detik; file tanpa referensi yang lebih baru dibiarkan
+# Jumlah karakter base64 lama yang dibaca per query saat diunduh (dibulatkan ke kelipatan 4)
+DOWNLOAD_CHUNK_SIZE = max(4, int(os.getenv('DOWNLOAD_CHUNK_SIZE', 256 * 1024)) // 4 * 4)
+MAX_BYTE_RANGES = 16 # Permintaan dengan range lebih banyak dari ini dijawab dengan file utuh
+
+# === KOMPRESI RESPONSE ===
+# Urutan = preferensi server bila klien menerima beberapa encoding dengan bobot sama; kosong = nonaktif
+COMPRESS_ENCODINGS = os.getenv('COMPRESS_ENCODINGS', 'zstd,br,gzip')
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024)) # Body lebih kecil dari ini tidak dikompres
+# Awalan mimetype yang isinya sudah terkompresi (DOCX/XLSX/PPTX adalah arsip ZIP)
+COMPRESS_SKIP_TYPES = tuple(t.strip() for t in os.getenv(
+    'COMPRESS_SKIP_TYPES',
+    'application/pdf,application/zip,application/gzip,application/x-7z-compressed,application/x-rar-compressed,'
+    'application/vnd.openxmlformats-officedocument.,image/png,image/jpeg,image/gif,image/webp,image/avif,'
+    'video/,audio/,font/woff').split(',') if t.strip())
+
+# === POOL KONEKSI DATABASE ===
+# Koneksi gagal dibuka, putus di tengah query, atau timeout baca/tulis
+DB_CONNECTION_ERRNOS = (2003, 2005, 2006, 2013, 2055, 3024)
+
+def is_connection_error(err):
+    return err.errno in DB_CONNECTION_ERRNOS or isinstance(
+        err, (mysql.connector.errors.ConnectionTimeoutError, mysql.connector.errors.ReadTimeoutError,
+              mysql.connector.errors.WriteTimeoutError))
+
+class DatabaseUnavailable(Exception):
+    """Database tidak terjangkau atau circuit breaker sedang terbuka; dijawab 503 dengan Retry-After.
+
+    Sengaja bukan turunan mysql.connector.Error agar tidak tertangkap
+    handler yang menjawab 500 untuk error query.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Database sedang tidak dapat dihubungi, coba lagi nanti.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker untuk koneksi database.
+
+    Setelah `failures` kegagalan koneksi berturut-turut breaker terbuka:
+    semua peminjaman langsung gagal dengan DatabaseUnavailable tanpa
+    menunggu connect timeout. Setelah reset_timeout satu request diteruskan
+    sebagai percobaan (half-open); berhasil menutup breaker, gagal
+    membukanya lagi. Request lain tetap ditolak selama percobaan berjalan.
+    """
+
+    def __init__(self, failures, reset_timeout):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'failures': 0, 'opens': 0, 'rejected': 0}
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'closed':
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed >= self.reset_timeout:
+                # Pemanggil ini menjadi percobaan; jendela baru dimulai agar percobaan yang macet tidak mengunci breaker
+                self.state = 'half_open'
+                self._opened_at = time.monotonic()
+                return
+            self._stats['rejected'] += 1
+        raise DatabaseUnavailable(self.reset_timeout - elapsed)
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self.state = 'closed'
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._stats['failures'] += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self._consecutive >= self.failures):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._stats['opens'] += 1
+                print(f"Circuit breaker database terbuka setelah {self._consecutive} kegagalan koneksi")
+
+    def retry_after(self):
+        with self._lock:
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(state=self.state, consecutive_failures=self._consecutive)
+        stats.update(failure_threshold=self.failures, reset_timeout=self.reset_timeout)
+        return stats
+
+
+class ConnectionTracker:
+    """Pencatat peminjaman koneksi pool per endpoint untuk mendeteksi kebocoran.
+
+    Setiap checkout dicatat bersama endpoint, thread, waktu dan (bila
+    pelacakan aktif) stack pemanggilnya. Koneksi yang ditahan lebih lama
+    dari threshold dilaporkan sekali; koneksi yang tidak pernah di-close
+    lalu dikembalikan paksa oleh teardown request atau garbage collector
+    dihitung sebagai bocor.
+    """
+
+    def __init__(self, threshold, capture_stack=None):
+        self.threshold = threshold
+        self.capture_stack = capture_stack
+        self._live = {}
+        self._ids = itertools.count()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _endpoint_stats(self, endpoint):
+        return self._endpoints.setdefault(endpoint, {'live': 0, 'checkouts': 0, 'held_too_long': 0, 'leaked': 0})
+
+    def checkout(self):
+        capture = app.debug if self.capture_stack is None else self.capture_stack
+        thread = threading.current_thread().name
+        endpoint = (request.endpoint or request.path) if has_request_context() else f"thread:{thread}"
+        info = {'id': next(self._ids), 'endpoint': endpoint, 'thread': thread, 'since': time.monotonic(),
+                'stack': ''.join(traceback.format_stack(limit=16)[:-2]) if capture else None, 'reported': False}
+        with self._lock:
+            self._live[info['id']] = info
+            stats = self._endpoint_stats(endpoint)
+            stats['live'] += 1
+            stats['checkouts'] += 1
+        self.check_overdue()
+        return info
+
+    def checkin(self, info):
+        held = time.monotonic() - info['since']
+        with self._lock:
+            self._live.pop(info['id'], None)
+            stats = self._endpoint_stats(info['endpoint'])
+            stats['live'] -= 1
+            overdue = held > self.threshold and not info['reported']
+            if overdue:
+                info['reported'] = True
+                stats['held_too_long'] += 1
+        if overdue:
+            self._report(info, f"dikembalikan setelah ditahan {held:.1f} detik")
+
+    def abandoned(self, info, reason):
+        """Koneksi yang tidak di-close pemiliknya; pemanggil lalu menutupnya (checkin tetap terjadi)."""
+        with self._lock:
+            self._endpoint_stats(info['endpoint'])['leaked'] += 1
+        self._report(info, f"tidak di-close, dikembalikan oleh {reason}")
+
+    def check_overdue(self):
+        """Laporkan koneksi yang masih dipinjam lebih lama dari threshold (sekali per koneksi)."""
+        now = time.monotonic()
+        with self._lock:
+            overdue = [info for info in self._live.values()
+                       if not info['reported'] and now - info['since'] > self.threshold]
+            for info in overdue:
+                info['reported'] = True
+                self._endpoint_stats(info['endpoint'])['held_too_long'] += 1
+        for info in overdue:
+            self._report(info, f"masih ditahan setelah {now - info['since']:.1f} detik")
+
+    def _report(self, info, message):
+        print(f"Koneksi database dari {info['endpoint']} (thread {info['thread']}) {message}")
+        if info['stack']:
+            print(f"Checkout di:\n{info['stack']}")
+
+    def snapshot(self):
+        self.check_overdue()
+        now = time.monotonic()
+        with self._lock:
+            endpoints = {endpoint: dict(stats) for endpoint, stats in self._endpoints.items()}
+            overdue = [{'endpoint': info['endpoint'], 'thread': info['thread'],
+                        'held_s': round(now - info['since'], 1), 'stack': info['stack']}
+                       for info in self._live.values() if now - info['since'] > self.threshold]
+        return {'threshold_s': self.threshold,
+                'stack_tracking': app.debug if self.capture_stack is None else self.capture_stack,
+                'live': sum(stats['live'] for stats in endpoints.values()),
+                'leaked': sum(stats['leaked'] for stats in endpoints.values()),
+                'endpoints': endpoints, 'overdue': overdue}
+
+
+class DBPool:
+    """Pool koneksi MySQL per worker di atas mysql.connector.pooling.
+
+    MySQLConnectionPool langsung gagal saat semua koneksi terpakai, jadi
+    antrean tunggu dibatasi dengan semaphore. Koneksi divalidasi saat
+    checkout (pool melakukan ping dan reconnect bila putus) dan dibuka
+    ulang bila sudah terlalu lama menganggur atau melewati umur maksimum.
+
+    Setiap koneksi fisik juga menyimpan prepared statement-nya sendiri
+    (lihat prepared_cursor), sehingga query yang sama cukup di-parse MySQL
+    sekali per koneksi dan dipakai ulang oleh request berikutnya.
+    """
+
+    def __init__(self, config, size, timeout, max_idle, max_age, statement_cache_size=0, tracker=None,
+                 breaker=None, connect_retries=0, name='fkdk', pool_class=None):
+        self.config = config
+        self.name = name
+        self.pool_class = pool_class # None = pooling.MySQLConnectionPool
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.statement_cache_size = statement_cache_size
+        self.tracker = tracker or ConnectionTracker(float('inf'), False)
+        self.breaker = breaker or CircuitBreaker(float('inf'), 0)
+        self.connect_retries = connect_retries
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._meta = {} # id koneksi fisik -> waktu dibuat & terakhir dipakai
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'recycled': 0,
+            'in_use': 0,
+            'wait_total_ms': 0.0,
+            'wait_max_ms': 0.0,
+            'statement_hits': 0,
+            'statement_misses': 0,
+            'statement_evictions': 0,
+        }
+
+    def _get_pool(self):
+        # Pool dibuat saat pertama dipakai agar import app.py tidak langsung membuka koneksi
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = (self.pool_class or pooling.MySQLConnectionPool)(
+                        pool_name=f"{self.name}_{os.getpid()}",
+                        pool_size=self.size,
+                        # Reset session menghapus semua prepared statement di server; bila cache
+                        # aktif, transaksi yang tertinggal di-rollback oleh PooledConnection.close
+                        pool_reset_session=not self.statement_cache_size,
+                        **self.config
+                    )
+        return self._pool
+
+    def _connect(self):
+        """Koneksi dari pool mysql.connector; kegagalan koneksi dicatat di breaker lalu dicoba ulang untuk GET/HEAD."""
+        # Hanya request yang idempoten yang boleh menunggu percobaan ulang; sisanya langsung 503
+        retries = self.connect_retries if has_request_context() and request.method in ('GET', 'HEAD') else 0
+        for attempt in range(retries + 1):
+            if attempt:
+                self.breaker.before_call() # Percobaan pertama sudah diperiksa get_connection
+            try:
+                conn = self._get_pool().get_connection()
+            except mysql.connector.Error as err:
+                if not is_connection_error(err):
+                    raise
+                self.breaker.failure()
+                print(f"Database connection error: {err}")
+                if attempt == retries:
+                    raise DatabaseUnavailable(self.breaker.retry_after()) from err
+                time.sleep(random.uniform(0, min(1.0, DB_RETRY_BACKOFF * 2 ** attempt)))
+            else:
+                self.breaker.success()
+                return conn
+
+    def get_connection(self):
+        self.breaker.before_call() # Breaker terbuka: gagal sebelum ikut antre slot
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            self.tracker.check_overdue() # Pool habis: tampilkan siapa yang menahan koneksi
+            raise pooling.PoolError("Pool koneksi database penuh, coba lagi nanti.")
+        try:
+            conn = self._connect()
+            key = id(conn._cnx)
+            now = time.time()
+            meta = self._meta.setdefault(key, {'created': now, 'last_used': now, 'statements': OrderedDict()})
+            recycled = False
+            if now - meta['created'] > self.max_age or now - meta['last_used'] > self.max_idle:
+                conn.reconnect()
+                meta['created'] = now
+                recycled = True
+            # Koneksi yang dibuka ulang (oleh kita atau oleh ping pool) punya sesi baru tanpa prepared statement
+            if meta.get('connection_id') != conn.connection_id:
+                meta['connection_id'] = conn.connection_id
+                meta['statements'].clear()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['wait_total_ms'] += waited_ms
+            self._stats['wait_max_ms'] = max(self._stats['wait_max_ms'], waited_ms)
+            if recycled:
+                self._stats['recycled'] += 1
+        return PooledConnection(self, conn, key, self.tracker.checkout())
+
+    def release(self, key, checkout):
+        self.tracker.checkin(checkout)
+        self._meta[key]['last_used'] = time.time()
+        with self._lock:
+            self._stats['in_use'] -= 1
+        self._slots.release()
+
+    def prepared_cursor(self, conn, key, sql, dictionary):
+        """Prepared cursor untuk sql di koneksi fisik key, beserta string sql yang harus dipakai.
+
+        mysql.connector hanya melewati PREPARE bila objek string yang sama
+        dieksekusi ulang, jadi yang dikembalikan adalah string dari cache.
+        """
+        statements = self._meta[key]['statements']
+        cache_key = (sql, dictionary)
+        entry = statements.get(cache_key)
+        hit = entry is not None
+        evicted = None
+        if hit:
+            statements.move_to_end(cache_key)
+        else:
+            entry = statements[cache_key] = (conn.cursor(prepared=True, dictionary=dictionary), sql)
+            if len(statements) > self.statement_cache_size:
+                _, (evicted, _) = statements.popitem(last=False)
+        with self._lock:
+            self._stats['statement_hits' if hit else 'statement_misses'] += 1
+            if evicted is not None:
+                self._stats['statement_evictions'] += 1
+        if evicted is not None:
+            evicted.close() # COM_STMT_CLOSE: bebaskan statement di server
+        return entry
+
+    def forget_statement(self, key, sql, dictionary):
+        """Buang statement dari cache (mis. tidak bisa di-prepare atau handle-nya hilang di server)."""
+        self._meta[key]['statements'].pop((sql, dictionary), None)
+
+    def reconnect(self, conn, key):
+        """Buka ulang koneksi fisik yang putus di tengah query; prepared statement sesi lama ikut hilang."""
+        try:
+            conn.reconnect(attempts=1)
+        except mysql.connector.Error as err:
+            if is_connection_error(err):
+                self.breaker.failure()
+            raise
+        self.breaker.success()
+        meta = self._meta[key]
+        meta['connection_id'] = conn.connection_id
+        meta['statements'].clear()
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        checkouts = stats['checkouts']
+        stats['size'] = self.size
+        stats['wait_avg_ms'] = round(stats['wait_total_ms'] / checkouts, 3) if checkouts else 0.0
+        lookups = stats['statement_hits'] + stats['statement_misses']
+        stats['statement_hit_rate'] = round(stats['statement_hits'] / lookups, 4) if lookups else 0.0
+        stats['statements_cached'] = sum(len(meta['statements']) for meta in list(self._meta.values()))
+        stats['wait_total_ms'] = round(stats['wait_total_ms'], 3)
+        stats['wait_max_ms'] = round(stats['wait_max_ms'], 3)
+        stats['sessions'] = self.tracker.snapshot()
+        stats['breaker'] = self.breaker.snapshot()
+        return stats
+
+
+class PooledConnection:
+    """Koneksi pinjaman dari DBPool; close() mengembalikannya ke pool.
+
+    Koneksi yang dipinjam di dalam request juga dicatat di g, sehingga
+    yang belum di-close saat request selesai dikembalikan oleh teardown.
+    """
+
+    def __init__(self, pool, conn, key, checkout):
+        self._pool = pool
+        self._conn = conn
+        self._key = key
+        self.checkout = checkout
+        if has_request_context():
+            g.setdefault('db_connections', []).append(self)
+
+    def __del__(self):
+        if getattr(self, '_conn', None) is not None:
+            try:
+                self._pool.tracker.abandoned(self.checkout, 'garbage collector')
+                self.close()
+            except Exception:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def statements_enabled(self):
+        return self._pool.statement_cache_size > 0
+
+    def prepared(self, sql, dictionary):
+        return self._pool.prepared_cursor(self._conn, self._key, sql, dictionary)
+
+    def forget_statement(self, sql, dictionary):
+        self._pool.forget_statement(self._key, sql, dictionary)
+
+    @property
+    def read_retries(self):
+        """Berapa kali SELECT di request GET/HEAD diulang bila koneksinya putus (sama dengan percobaan koneksi)."""
+        if has_request_context() and request.method in ('GET', 'HEAD'):
+            return self._pool.connect_retries
+        return 0
+
+    def reconnect(self):
+        self._pool.reconnect(self._conn, self._key)
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            # Tanpa reset session, transaksi yang belum selesai (mis. SELECT ... FOR UPDATE
+            # lalu return 404) harus ditutup di sini agar kuncinya tidak terbawa ke peminjam berikutnya
+            if self.statements_enabled and self._conn.in_transaction:
+                self._conn.rollback()
+        except mysql.connector.Error:
+            pass # Koneksi sudah putus; pool membukanya ulang saat checkout berikutnya
+        finally:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+                self._pool.release(self._key, self.checkout)
+
+    @property
+    def closed(self):
+        return self._conn is None
+
+
+_query_log = threading.local()
+
+@contextmanager
+def recorded_queries():
+    """Catat (sql, params) setiap query StatementCursor di thread ini selama blok with (dipakai check-indexes)."""
+    _query_log.queries = queries = []
+    try:
+        yield queries
+    finally:
+        _query_log.queries = None
+
+
+class StatementCursor:
+    """Cursor yang dipakai db_cursor.
+
+    Query berparameter dijalankan lewat prepared statement milik koneksi
+    fisik (protokol biner, di-PREPARE sekali per koneksi); query tanpa
+    parameter dan statement yang tidak bisa di-prepare memakai cursor teks.
+    """
+
+    # ER_UNSUPPORTED_PS dan ER_UNKNOWN_STMT_HANDLER
+    FALLBACK_ERRNOS = (1295, 1243)
+
+    def __init__(self, conn, dictionary):
+        self._conn = conn
+        self._dictionary = dictionary
+        self._text = None
+        self._current = None
+
+    def _text_cursor(self):
+        if self._text is None:
+            self._text = self._conn.cursor(dictionary=self._dictionary)
+        return self._text
+
+    def execute(self, sql, params=()):
+        if getattr(_query_log, 'queries', None) is not None:
+            _query_log.queries.append((sql, tuple(params)))
+        # SELECT biasa di request GET/HEAD aman diulang di koneksi yang dibuka ulang; tulisan dan
+        # SELECT ... FOR UPDATE tidak, karena transaksinya ikut hilang bersama koneksi lama
+        retries = 0
+        if sql.lstrip()[:6].upper() == 'SELECT' and 'FOR UPDATE' not in sql.upper():
+            retries = getattr(self._conn, 'read_retries', 0)
+        for attempt in range(retries + 1):
+            try:
+                return self._execute(sql, params)
+            except mysql.connector.Error as err:
+                if attempt == retries or not is_connection_error(err):
+                    raise
+                print(f"Database connection lost, retrying read: {err}")
+            time.sleep(random.uniform(0, min(1.0, DB_RETRY_BACKOFF * 2 ** attempt)))
+            self._text = None # Cursor teks milik sesi lama
+            self._conn.reconnect()
+
+    def _execute(self, sql, params):
+        if params and self._conn.statements_enabled:
+            cursor, sql = self._conn.prepared(sql, self._dictionary)
+            self._current = cursor
+            try:
+                cursor.execute(sql, params)
+                return
+            except mysql.connector.Error as err:
+                if err.errno not in self.FALLBACK_ERRNOS:
+                    raise
+                self._conn.forget_statement(sql, self._dictionary)
+        self._current = self._text_cursor()
+        self._current.execute(sql, params)
+
+    def fetchone(self):
+        return self._current.fetchone()
+
+    def fetchall(self):
+        return self._current.fetchall()
+
+    def executemany(self, sql, seq_params):
+        # Cursor teks menggabungkan INSERT ... VALUES menjadi satu statement multi-baris
+        self._current = self._text_cursor()
+        self._current.executemany(sql, seq_params)
+
+    @property
+    def rowcount(self):
+        return self._current.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._current.lastrowid
+
+    def close(self):
+        # Prepared cursor tetap terbuka untuk request berikutnya; sisa hasil yang belum dibaca dibuang
+        if self._current is not None and self._conn.unread_result:
+            self._current.fetchall()
+        if self._text is not None:
+            self._text.close()
+
+
+# === BACKEND SQLITE ===
+# Dengan DB_BACKEND=sqlite, DBPool memakai SQLiteConnectionPool sebagai pengganti MySQLConnectionPool.
+# Koneksinya meniru antarmuka mysql.connector yang dipakai app (cursor dictionary, commit/rollback,
+# error mysql.connector.Error), dan dialek MySQL di query diterjemahkan oleh sqlite_sql.
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+
+def _sqlite_date(raw):
+    # Kolom SQLite menerima teks apa saja; nilai yang bukan tanggal dibaca sebagai None
+    # (seperti tanggal nol MySQL) agar satu baris rusak tidak menggagalkan seluruh list
+    try:
+        return date.fromisoformat(raw.decode())
+    except ValueError:
+        return None
+
+sqlite3.register_converter('DATE', _sqlite_date)
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+
+_SQLITE_DIALECT = [
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'ON DUPLICATE KEY UPDATE', re.I), 'ON CONFLICT DO UPDATE SET'),
+    (re.compile(r'UNIX_TIMESTAMP\((\w+)\)', re.I), r"CAST(strftime('%s', \1) AS INTEGER)"),
+    (re.compile(r'CHAR_LENGTH\(', re.I), 'LENGTH('),
+    (re.compile(r'RIGHT\((\w+), (\d+)\)', re.I), r'SUBSTR(\1, -\2)'),
+]
+_SQLITE_FOR_UPDATE = re.compile(r'\s+FOR UPDATE\s*$', re.I)
+
+@functools.lru_cache(maxsize=512)
+def sqlite_sql(sql):
+    """(sql versi SQLite, kunci tulis?) dari query berdialek MySQL yang dipakai app."""
+    locking = bool(_SQLITE_FOR_UPDATE.search(sql))
+    sql = _SQLITE_FOR_UPDATE.sub('', sql)
+    for pattern, replacement in _SQLITE_DIALECT:
+        sql = pattern.sub(replacement, sql)
+    return sql, locking
+
+def sqlite_error(err):
+    """Error mysql.connector yang setara, agar handler yang ada (mis. cek ER_DUP_ENTRY) tetap berlaku."""
+    message = str(err)
+    if isinstance(err, sqlite3.IntegrityError) and message.startswith('CHECK'):
+        return mysql.connector.errors.DataError(msg=message, errno=1292) # ER_TRUNCATED_WRONG_VALUE (tanggal salah)
+    if isinstance(err, sqlite3.IntegrityError):
+        errno = 1062 if message.startswith('UNIQUE') else 1048 if message.startswith('NOT NULL') else None
+        return mysql.connector.IntegrityError(msg=message, errno=errno)
+    if isinstance(err, sqlite3.OperationalError) and 'locked' in message:
+        return mysql.connector.errors.OperationalError(msg=message, errno=1205) # ER_LOCK_WAIT_TIMEOUT
+    return mysql.connector.DatabaseError(msg=message)
+
+def _sqlite_dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+class SQLiteCursor:
+    def __init__(self, conn, dictionary):
+        self._conn = conn
+        self._cursor = conn.cursor()
+        if dictionary:
+            self._cursor.row_factory = _sqlite_dict_row
+
+    def execute(self, sql, params=()):
+        sql, locking = sqlite_sql(sql)
+        try:
+            # SELECT ... FOR UPDATE: ambil kunci tulis di awal transaksi, bukan saat UPDATE berikutnya,
+            # karena transaksi baca yang naik menjadi tulis di WAL bisa langsung gagal SQLITE_BUSY
+            if locking and not self._conn.in_transaction:
+                self._conn.execute('BEGIN IMMEDIATE')
+            self._cursor.execute(sql, tuple(params))
+        except sqlite3.Error as err:
+            raise sqlite_error(err) from err
+
+    def executemany(self, sql, seq_params):
+        # INSERT multi-baris MySQL gagal utuh; savepoint membuat executemany SQLite berperilaku sama
+        sql, _ = sqlite_sql(sql)
+        if not self._conn.in_transaction:
+            self._conn.execute('BEGIN') # Tanpa transaksi luar, RELEASE savepoint langsung menjadi COMMIT
+        self._conn.execute('SAVEPOINT executemany')
+        try:
+            self._cursor.executemany(sql, seq_params)
+        except sqlite3.Error as err:
+            self._conn.execute('ROLLBACK TO executemany')
+            raise sqlite_error(err) from err
+        finally:
+            self._conn.execute('RELEASE executemany')
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """Koneksi pinjaman SQLiteConnectionPool dengan antarmuka PooledMySQLConnection yang dipakai DBPool."""
+
+    unread_result = False
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._cnx = conn
+        self.connection_id = id(conn)
+
+    @property
+    def in_transaction(self):
+        return self._cnx.in_transaction
+
+    def cursor(self, dictionary=False, prepared=False):
+        return SQLiteCursor(self._cnx, dictionary)
+
+    def commit(self):
+        try:
+            self._cnx.commit()
+        except sqlite3.Error as err:
+            raise sqlite_error(err) from err
+
+    def rollback(self):
+        self._cnx.rollback()
+
+    def reconnect(self):
+        pass # File lokal: koneksi tidak diputus server karena menganggur
+
+    def close(self):
+        if self._cnx.in_transaction:
+            self._cnx.rollback()
+        self._pool.put(self._cnx)
+
+class SQLiteConnectionPool:
+    """Pengganti pooling.MySQLConnectionPool untuk satu file SQLite.
+
+    Koneksi dibuka sesuai kebutuhan sampai pool_size (DBPool sudah
+    membatasi jumlah peminjam) dan diatur untuk WAL: banyak pembaca bisa
+    berjalan bersamaan dengan satu penulis. Skema dibuat dan diperbarui
+    oleh migrate_schema saat koneksi pertama dibuka.
+    """
+
+    def __init__(self, pool_name, pool_size, database, busy_timeout=5, cache_mb=32, **kwargs):
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.database = database
+        self.busy_timeout = busy_timeout
+        self.cache_mb = cache_mb
+        self._idle = []
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL') # Aman di WAL; yang hilang saat listrik mati hanya commit terakhir
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute(f'PRAGMA cache_size = {-1024 * self.cache_mb}')
+        conn.execute(f'PRAGMA mmap_size = {256 * 1024 * 1024}')
+        if not self._opened:
+            try:
+                migrate_schema(conn, SQLiteCursor(conn, False))
+            except Exception:
+                conn.close()
+                raise
+        return conn
+
+    def get_connection(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                if self._opened >= self.pool_size:
+                    raise pooling.PoolError("Pool koneksi SQLite habis.")
+                try:
+                    conn = self._open()
+                except sqlite3.Error as err:
+                    # File tidak bisa dibuka: perlakukan seperti server MySQL yang tidak terjangkau (2003)
+                    raise mysql.connector.errors.InterfaceError(msg=str(err), errno=2003) from err
+                self._opened += 1
+        return SQLiteConnection(self, conn)
+
+    def put(self, conn):
+        with self._lock:
+            self._idle.append(conn)
+
+if DB_BACKEND == 'sqlite':
+    # Prepared statement di-cache sqlite3 sendiri per koneksi, jadi cache DBPool dimatikan
+    db_pool = DBPool({'database': SQLITE_PATH, 'busy_timeout': SQLITE_BUSY_TIMEOUT, 'cache_mb': SQLITE_CACHE_MB},
+                     DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE, DB_POOL_MAX_AGE, 0,
+                     ConnectionTracker(DB_LEAK_THRESHOLD, DB_LEAK_TRACKING), pool_class=SQLiteConnectionPool)
+else:
+    db_pool = DBPool(DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE, DB_POOL_MAX_AGE,
+                     DB_STATEMENT_CACHE_SIZE, ConnectionTracker(DB_LEAK_THRESHOLD, DB_LEAK_TRACKING),
+                     CircuitBreaker(DB_BREAKER_FAILURES, DB_BREAKER_RESET), DB_CONNECT_RETRIES)
+# Replica tidak dicoba ulang: bila tidak terjangkau, bacaan langsung pindah ke primary
+replica_pool = DBPool(REPLICA_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE, DB_POOL_MAX_AGE,
+                      DB_STATEMENT_CACHE_SIZE, ConnectionTracker(DB_LEAK_THRESHOLD, DB_LEAK_TRACKING),
+                      CircuitBreaker(DB_BREAKER_FAILURES, DB_BREAKER_RESET), name='fkdk_replica'
+                      ) if REPLICA_CONFIG else None
+
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.999)))
+    return response
+
+@app.teardown_request
+def release_leaked_connections(exc):
+    # Semua handler memakai db_cursor, jadi daftar ini seharusnya selalu sudah tertutup
+    for conn in g.pop('db_connections', []):
+        if not conn.closed:
+            conn._pool.tracker.abandoned(conn.checkout, 'teardown request')
+            conn.close()
 
 # === HELPER FUNCTIONS ===
-def get_db_connection():
+def recently_wrote():
+    """True bila klien request aktif menulis dalam READ_YOUR_WRITES_WINDOW terakhir (lihat mark_recent_write)."""
+    try:
+        return float(request.cookies.get(RECENT_WRITE_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def reads_from_replica():
+    """Routing otomatis db_cursor: hanya GET/HEAD dari klien yang tidak baru saja menulis yang boleh ke replica."""
+    return (replica_pool is not None and has_request_context() and request.method in ('GET', 'HEAD')
+            and not recently_wrote())
+
+_runtime_schema_ready = False
+
+def _ensure_runtime_schema(conn):
+    """Pastikan table_version dan indeks unik users.username ada, sekali per proses.
+
+    Untuk database yang belum di-`flask migrate`. Dijalankan pada koneksi
+    primary pertama sebelum dipinjamkan: belum ada
+    transaksi yang ikut ter-commit oleh DDL MySQL, dan tidak perlu meminjam
+    koneksi kedua dari pool saat request sudah memegang satu.
+    """
+    global _runtime_schema_ready
+    cursor = StatementCursor(conn, False)
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        ensure_table_version_schema(cursor)
+        try:
+            ensure_users_schema(cursor)
+        except mysql.connector.Error as err:
+            # Tanpa indeks unik pengecekan username tetap berjalan, hanya tidak aman dari race
+            print(f"Indeks unik users.username tidak bisa dibuat: {err}")
+        conn.commit()
+        _runtime_schema_ready = True
     except mysql.connector.Error as err:
-        print(f"Database connection error: {err}")
-        return None
+        # Dicoba lagi pada checkout berikutnya; query request sendiri yang akan melaporkan kesalahannya
+        print(f"Skema table_version tidak bisa dipastikan: {err}")
+    finally:
+        cursor.close()
+
+def _checkout(replica):
+    if replica and replica_pool is not None and replica_monitor.caught_up():
+        try:
+            return replica_pool, replica_pool.get_connection()
+        except (DatabaseUnavailable, pooling.PoolError):
+            pass # Replica mati, breaker-nya terbuka, atau pool-nya penuh: baca dari primary
+    conn = db_pool.get_connection()
+    if not _runtime_schema_ready:
+        _ensure_runtime_schema(conn)
+    return db_pool, conn
+
+@contextmanager
+def db_cursor(dictionary=False, replica=None):
+    """Pinjam koneksi dari pool beserta cursor-nya.
+
+    Cursor dan koneksi selalu dikembalikan ke pool ketika blok with selesai,
+    termasuk saat handler return lebih awal atau terjadi exception (transaksi
+    yang belum di-commit di-rollback lebih dulu).
+
+    replica=None memilih pool otomatis (reads_from_replica); True/False
+    memaksa. Replica hanya dipakai bila replica_monitor menyatakan sudah
+    menyusul primary, selain itu query tetap ke primary.
+    """
+    pool, conn = _checkout(reads_from_replica() if replica is None else replica)
+    cursor = StatementCursor(conn, dictionary)
+    try:
+        yield conn, cursor
+    except Exception as exc:
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            pass
+        if isinstance(exc, mysql.connector.Error) and is_connection_error(exc):
+            # Koneksi putus/timeout di tengah query: hitung di breaker dan jawab 503, bukan 500
+            pool.breaker.failure()
+            raise DatabaseUnavailable(pool.breaker.retry_after()) from exc
+        raise
+    finally:
+        try:
+            cursor.close()
+        finally:
+            conn.close()
+
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 
 def detect_mime_type(filename):
     ext = os.path.splitext(filename)[1].lower()
     if ext == '.pdf':
         return 'application/pdf'
-    elif ext in ['.doc', '.docx']:
+    elif ext == '.doc':
         return 'application/msword'
-    return 'application/octet-stream'
-
-@app.route('/')
-def index():
-    return "Aplikasi backend UKM FKDK berjalan!"
+    elif ext == '.docx':
+        # Arsip zip yang sudah terkompresi; tipe ini masuk COMPRESS_SKIP_TYPES
+        return DOCX_MIME_TYPE
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def data_uri_mime(header):
+    # Header berbentuk "data:application/pdf;base64"
+    if header.startswith('data:') and ';' in header:
+        return header[5:].split(';')[0] or None
+    return None
+
+def decode_dokumen_base64(dokumen_base64, filename):
+    """Ubah string base64 (boleh berawalan data URI) menjadi (bytes, mime type)."""
+    mime_type = None
+    if ',' in dokumen_base64:
+        header, dokumen_base64 = dokumen_base64.split(',', 1)
+        mime_type = data_uri_mime(header)
+    # Base64 lama bisa dibungkus per baris; whitespace dibuang seperti di open_legacy_dokumen
+    dokumen_base64 = ''.join(dokumen_base64.split())
+    try:
+        data = base64.b64decode(dokumen_base64, validate=True)
+    except binascii.Error as err:
+        raise ValueError(f"Dokumen base64 tidak valid: {err}")
+    return data, mime_type or detect_mime_type(filename or '')
+
+# === JENIS DOKUMEN ===
+# (tabel, slug URL, kolom penanggung jawab). Endpoint tiap jenis dibuat oleh DokumenResource;
+# jenis baru cukup ditambahkan di sini atau lewat DOKUMEN_TYPES_EXTRA="Tabel:slug:kolom,..."
+# asalkan tabelnya memakai kolom yang sama dengan Proposal.
+DOKUMEN_TYPES = [
+    ('Proposal', 'proposal', 'sekretaris'),
+    ('LPJ', 'lpj', 'sekretaris'),
+    ('RAB', 'rab', 'bendahara'),
+    ('LRA', 'lra', 'bendahara'),
+]
+for _item in filter(None, (item.strip() for item in os.getenv('DOKUMEN_TYPES_EXTRA', '').split(','))):
+    _parts = _item.split(':')
+    if len(_parts) != 3 or not all(re.fullmatch(r'[A-Za-z_]\w*', part) for part in _parts):
+        raise RuntimeError(f"DOKUMEN_TYPES_EXTRA tidak valid: {_item!r} (format Tabel:slug:kolom)")
+    DOKUMEN_TYPES.append(tuple(_parts))
+
+# === PENYIMPANAN DOKUMEN (CONTENT-ADDRESSED) ===
+# Kolom-kolom dokumen per tabel: (nama file, base64 lama, hash, ukuran, mime type)
+DOKUMEN_COLUMNS = {
+    table: ('dokumenName', 'dokumenBase64', 'dokumenHash', 'dokumenSize', 'dokumenMime')
+    for table, _, _ in DOKUMEN_TYPES
+}
+DOKUMEN_COLUMNS.update({
+    'inventaris': ('bukti_pembayaran_name', 'bukti_pembayaran_base64', 'bukti_pembayaran_hash',
+                   'bukti_pembayaran_size', 'bukti_pembayaran_mime'),
+})
 
-# === ENDPOINT AUTH ===
-# Register
-@app.route('/register', methods=['POST'])
-def register():
-    data = request.get_json()
-    username = data.get('username')
-    email = data.get('email')
-    password = data.get('password')
-    if not all([username, email, password]):
-        return jsonify({"error": "Lengkapi semua kolom."}), 400
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-    if cursor.fetchone():
-        return jsonify({"error": "Username sudah digunakan."}), 409
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    cursor.execute("INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
-                   (username, email, hashed.decode()))
-    conn.commit()
-    cursor.close(); conn.close()
-    return jsonify({"message": "Registrasi berhasil!"}), 201
+class DokumenStore:
+    """Penyimpanan isi dokumen di disk, satu file per SHA-256.
 
-# Login
-@app.route('/login', methods=['POST'])
-def login():
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
-    if username == "fkdk" and password == "janissary":
-        return jsonify({"message": "Login admin berhasil", "role": "admin"}), 200
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT username, password_hash FROM users WHERE username = %s", (username,))
-    user = cursor.fetchone()
-    cursor.close(); conn.close()
-    if user and bcrypt.checkpw(password.encode(), user['password_hash'].encode()):
-        return jsonify({"message": "Login berhasil", "role": "user", "username": user['username']}), 200
-    return jsonify({"error": "Login gagal"}), 401
-    
-@app.route('/submit_proposal', methods=['POST'])
-def submit_proposal():
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
+    File diletakkan di subfolder dua tingkat (ab/cd/abcd...) agar satu folder
+    tidak berisi ribuan file. Jumlah referensi tiap hash dicatat di tabel
+    dokumen_blob sehingga upload yang identik hanya disimpan sekali.
+    """
 
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        sekretaris = data.get('sekretaris')
-        dokumen_name = data.get('dokumenName')
-        dokumen_base64 = data.get('dokumenBase64')
+    def __init__(self, root):
+        # Path absolut: send_file menafsirkan path relatif terhadap folder aplikasi, bukan cwd
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
 
-        # Validasi minimal
-        if not all([tanggal_masuk, departemen, nama_proker, sekretaris, dokumen_name, dokumen_base64]):
-            return jsonify({"error": "Data proposal tidak lengkap. Pastikan semua field terisi, termasuk dokumen."}), 400
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
 
-        # Hapus "data:mimetype;base64," prefix jika ada
-        if ',' in dokumen_base64:
-            dokumen_base64 = dokumen_base64.split(',')[1]
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    def write(self, digest, data):
+        """Simpan isi dokumen berupa bytes atau HashingUploadFile di bawah hash-nya.
 
-        insert_query = """
-        INSERT INTO Proposal (tanggalMasuk, departemen, namaProker, sekretaris, dokumenName, dokumenBase64)
-        VALUES (%s, %s, %s, %s, %s, %s)
+        mtime file selalu diperbarui, juga bila hash sudah ada, supaya
+        collect_orphan_dokumen tidak menghapus file yang transaksinya belum di-commit.
         """
-        cursor.execute(insert_query, (tanggal_masuk, departemen, nama_proker, sekretaris, dokumen_name, dokumen_base64))
+        self._write(digest, data)
+        os.utime(self.path(digest))
+
+    def _write(self, digest, data):
+        if self.exists(digest):
+            return
+        final_path = self.path(digest)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if isinstance(data, HashingUploadFile):
+            data.flush()
+            if data.owned:
+                # File upload sudah berada di tmp_dir, cukup dipindahkan tanpa disalin
+                os.replace(data.path, final_path)
+                return
+            # File milik pemanggil (sesi upload bertahap) harus tetap ada bila transaksinya gagal
+            try:
+                os.link(data.path, final_path)
+                return
+            except FileExistsError:
+                return
+            except OSError:
+                pass # Beda filesystem: salin lewat file sementara
+            fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+            os.close(fd)
+            try:
+                shutil.copyfile(data.path, tmp_path)
+                os.replace(tmp_path, final_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return
+        # Tulis ke file sementara lalu rename supaya pembaca tidak pernah melihat file setengah jadi
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, final_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, digest):
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+
+dokumen_store = DokumenStore(DOKUMEN_STORE_DIR)
+
+class HashingUploadFile:
+    """File sementara di tmp_dir dokumen_store yang menghitung SHA-256 sambil ditulis.
+
+    Dipakai parser multipart Flask untuk setiap file yang diunggah dan untuk
+    upload raw body, sehingga isi file tidak pernah ditampung utuh di memori
+    dan hash sudah tersedia begitu upload selesai. File yang tidak dipindah
+    ke dokumen_store dihapus saat ditutup (akhir request).
+    """
+
+    def __init__(self, directory, mime_type=None):
+        fd, self.path = tempfile.mkstemp(dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.mime_type = mime_type
+        self.owned = True # File milik objek ini: dipindahkan ke dokumen_store atau dihapus saat ditutup
+
+    @classmethod
+    def from_path(cls, path, mime_type=None):
+        """Bungkus file yang sudah utuh di disk (hasil upload bertahap); hash dihitung dengan membacanya sekali.
+
+        File tetap milik pemanggil: disalin/di-link ke dokumen_store dan tidak dihapus saat ditutup.
+        """
+        upload = cls.__new__(cls)
+        upload.owned = False
+        upload.path = path
+        upload._file = open(path, 'r+b')
+        upload._hash = hashlib.sha256()
+        upload.size = 0
+        upload.mime_type = mime_type
+        for block in iter(lambda: upload._file.read(1024 * 1024), b''):
+            upload._hash.update(block)
+            upload.size += len(block)
+        return upload
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def close(self):
+        self._file.close()
+        if self.owned and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingUploadFile(dokumen_store.tmp_dir, content_type)
+
+
+app.request_class = UploadRequest
+
+@app.teardown_request
+def close_raw_uploads(exc):
+    # File multipart ditutup oleh Flask; file raw body ditutup di sini
+    for upload in g.pop('raw_uploads', []):
+        upload.close()
+
+@app.before_request
+def check_upload_size():
+    # Tolak lebih awal agar handler tidak sempat membaca body yang terlalu besar
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    return jsonify({"error": f"Ukuran upload melebihi batas {limit_mb:g} MB."}), 413
+
+def binary_upload(file_field, name_field):
+    """Ambil field form dan file dari request multipart/form-data atau raw body.
+
+    Pada raw body seluruh body adalah isi file dan field lain dikirim lewat
+    query string. Mengembalikan (fields, HashingUploadFile atau None).
+    """
+    if request.mimetype == 'multipart/form-data':
+        fields = request.form.to_dict()
+        upload = request.files.get(file_field)
+        if not upload or not upload.filename:
+            return fields, None
+        fields.setdefault(name_field, upload.filename)
+        return fields, upload.stream
+    fields = request.args.to_dict()
+    if not request.content_length:
+        return fields, None
+    mime_type = request.mimetype if request.mimetype not in ('', 'application/octet-stream') else None
+    upload = HashingUploadFile(dokumen_store.tmp_dir, mime_type)
+    g.setdefault('raw_uploads', []).append(upload)
+    shutil.copyfileobj(request.stream, upload, 64 * 1024)
+    return fields, upload
+
+def read_dokumen(dokumen, filename):
+    """(isi, mime type) dari string base64 JSON lama atau dari HashingUploadFile."""
+    if isinstance(dokumen, HashingUploadFile):
+        mime_type = dokumen.mime_type
+        if not mime_type or mime_type == 'application/octet-stream':
+            mime_type = detect_mime_type(filename or '')
+        return dokumen, mime_type
+    return decode_dokumen_base64(dokumen, filename)
+
+def acquire_dokumen(cursor, data, mime_type):
+    """Simpan dokumen (bytes atau HashingUploadFile) dan tambah referensinya di dalam transaksi cursor.
+
+    Baris dokumen_blob dikunci lebih dulu, baru file dipastikan ada di disk,
+    sehingga tidak bisa bertabrakan dengan collect_dokumen yang sedang
+    menghapus hash yang sama. Mengembalikan (hash, ukuran).
+    """
+    if isinstance(data, HashingUploadFile):
+        digest, size = data.hexdigest(), data.size
+    else:
+        digest, size = hashlib.sha256(data).hexdigest(), len(data)
+    cursor.execute("""
+        INSERT INTO dokumen_blob (hash, size, mime_type, ref_count)
+        VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+    """, (digest, size, mime_type))
+    dokumen_store.write(digest, data)
+    return digest, size
+
+def release_dokumen(cursor, digest):
+    """Kurangi referensi sebuah hash; file baru dihapus oleh collect_dokumen setelah commit."""
+    if digest:
+        cursor.execute("UPDATE dokumen_blob SET ref_count = ref_count - 1 WHERE hash = %s", (digest,))
+
+def collect_dokumen(conn, cursor, digests):
+    """Hapus blob tanpa referensi. Dipanggil setelah transaksi utama di-commit."""
+    for digest in set(d for d in digests if d):
+        cursor.execute("SELECT ref_count FROM dokumen_blob WHERE hash = %s FOR UPDATE", (digest,))
+        row = cursor.fetchone()
+        if row and row[0] <= 0:
+            cursor.execute("DELETE FROM dokumen_blob WHERE hash = %s", (digest,))
+            dokumen_store.delete(digest)
         conn.commit()
 
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "Proposal berhasil dikirim!"}), 200
-
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error submitting proposal: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+def collect_orphan_dokumen(grace=DOKUMEN_ORPHAN_GRACE):
+    """Hapus file dokumen_store yang tidak punya baris dokumen_blob. Mengembalikan jumlah yang dihapus.
+
+    acquire_dokumen menulis file sebelum transaksinya di-commit, jadi
+    transaksi yang gagal meninggalkan file tanpa referensi. Hanya file yang
+    tidak ditulis ulang selama grace detik yang diperiksa, dan seperti
+    collect_dokumen pemeriksaannya memakai FOR UPDATE sehingga tidak
+    bertabrakan dengan acquire_dokumen untuk hash yang sama.
+    """
+    cutoff = time.time() - grace
+    candidates = []
+    for prefix in os.listdir(dokumen_store.root):
+        if not re.fullmatch(r'[0-9a-f]{2}', prefix): # Lewati tmp/ dan folder sesi upload
+            continue
+        for dirpath, _, filenames in os.walk(os.path.join(dokumen_store.root, prefix)):
+            for name in filenames:
+                try:
+                    if os.path.getmtime(os.path.join(dirpath, name)) < cutoff:
+                        candidates.append(name)
+                except OSError:
+                    continue
+    removed = 0
+    with db_cursor() as (conn, cursor):
+        for digest in candidates:
+            cursor.execute("SELECT hash FROM dokumen_blob WHERE hash = %s FOR UPDATE", (digest,))
+            if not cursor.fetchone():
+                try:
+                    if os.path.getmtime(dokumen_store.path(digest)) < cutoff: # Bisa saja baru dipakai lagi
+                        dokumen_store.delete(digest)
+                        removed += 1
+                except OSError:
+                    pass
+            conn.commit()
+    return removed
+
+@app.cli.command('gc-dokumen')
+@click.option('--grace', default=DOKUMEN_ORPHAN_GRACE, show_default=True,
+              help='Detik sejak file terakhir ditulis sebelum boleh dihapus.')
+def gc_dokumen_command(grace):
+    """Hapus file dokumen_store yang tidak punya baris dokumen_blob (sisa transaksi yang gagal)."""
+    click.echo(f"{collect_orphan_dokumen(grace)} file dokumen tanpa referensi dihapus.")
+
+def ensure_dokumen_schema(cursor):
+    """Tambahkan tabel dokumen_blob dan kolom hash/ukuran/mime bila belum ada."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dokumen_blob (
+            hash CHAR(64) NOT NULL PRIMARY KEY,
+            size BIGINT NOT NULL,
+            mime_type VARCHAR(100),
+            ref_count INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    if DB_BACKEND == 'sqlite':
+        return # Tabel SQLite sejak awal dibuat dengan kolom hash/ukuran/mime (lihat SCHEMA_TABLES)
+    for table, (_, base64_col, hash_col, size_col, mime_col) in DOKUMEN_COLUMNS.items():
+        cursor.execute("""
+            SELECT COLUMN_NAME, IS_NULLABLE FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, (table,))
+        existing = {row[0]: row[1] for row in cursor.fetchall()}
+        if hash_col not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {hash_col} CHAR(64) NULL, "
+                           f"ADD COLUMN {size_col} BIGINT NULL, ADD COLUMN {mime_col} VARCHAR(100) NULL")
+        # Baris baru tidak lagi mengisi kolom base64
+        if existing.get(base64_col) == 'NO':
+            cursor.execute(f"ALTER TABLE {table} MODIFY {base64_col} LONGTEXT NULL")
+
+def migrate_dokumen_table(table, batch_size=20, echo=print):
+    """Pindahkan isi kolom base64 sebuah tabel ke dokumen_store per batch.
+
+    Setiap batch di-commit sendiri dan baris yang sudah punya hash dilewati,
+    jadi migrasi aman dihentikan lalu dijalankan ulang kapan saja.
+    """
+    name_col, base64_col, hash_col, size_col, mime_col = DOKUMEN_COLUMNS[table]
+    last_id = 0
+    migrated = failed = 0
+    while True:
+        with db_cursor(dictionary=True) as (conn, cursor):
+            cursor.execute(f"""
+                SELECT id, {name_col} AS name, {base64_col} AS b64 FROM {table}
+                WHERE {hash_col} IS NULL AND {base64_col} IS NOT NULL AND id > %s
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                last_id = row['id']
+                try:
+                    data, mime_type = decode_dokumen_base64(row['b64'], row['name'])
+                except ValueError as err:
+                    echo(f"{table} id={row['id']}: dilewati, {err}")
+                    failed += 1
+                    continue
+                digest, size = acquire_dokumen(cursor, data, mime_type)
+                cursor.execute(f"""
+                    UPDATE {table} SET {hash_col} = %s, {size_col} = %s, {mime_col} = %s, {base64_col} = NULL
+                    WHERE id = %s
+                """, (digest, size, mime_type, row['id']))
+                migrated += 1
+            touch_table(cursor, table)
+            conn.commit()
+        echo(f"{table}: {migrated} dokumen dipindahkan (sampai id {last_id})")
+    return migrated, failed
+
+@app.cli.command('migrate-dokumen')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(list(DOKUMEN_COLUMNS)),
+              help='Tabel yang dimigrasikan (default: semua).')
+@click.option('--batch-size', default=20, show_default=True, help='Jumlah baris per transaksi.')
+def migrate_dokumen_command(tables, batch_size):
+    """Pindahkan dokumen base64 lama ke dokumen_store."""
+    with db_cursor() as (conn, cursor):
+        ensure_dokumen_schema(cursor)
+        conn.commit()
+    for table in tables or DOKUMEN_COLUMNS:
+        migrated, failed = migrate_dokumen_table(table, batch_size, echo=click.echo)
+        click.echo(f"{table}: selesai, {migrated} dipindahkan, {failed} gagal.")
+
+# === RANGE REQUEST (UNDUHAN YANG BISA DILANJUTKAN) ===
+def _requested_ranges(size):
+    """Range dari header Range dengan range yang bersambungan digabung.
+
+    None berarti header diabaikan (bukan bytes atau terlalu banyak range);
+    list kosong berarti tidak ada range yang bisa dipenuhi.
+    """
+    parsed = request.range
+    if parsed is None or parsed.units != 'bytes' or len(parsed.ranges) > MAX_BYTE_RANGES:
+        return None
+    ranges = []
+    for start, stop in parsed.ranges:
+        if start < 0:
+            start, stop = max(size + start, 0), size
+        stop = size if stop is None else min(stop, size)
+        if start >= stop:
+            continue
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], stop)
+        else:
+            ranges.append([start, stop])
+    return ranges
+
+def _if_range_matches(response):
+    if_range = request.if_range
+    if if_range.etag:
+        etag, weak = response.get_etag()
+        return not weak and etag == if_range.etag
+    if if_range.date:
+        return response.last_modified is not None and response.last_modified <= if_range.date
+    return True
+
+def _iter_range(fileobj, start, stop, block_size=64 * 1024):
+    fileobj.seek(start)
+    remaining = stop - start
+    while remaining > 0:
+        block = fileobj.read(min(block_size, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        yield block
+
+def _range_not_satisfiable(size):
+    response = app.response_class(status=416)
+    response.headers['Content-Range'] = f"bytes */{size}"
+    return response
+
+def send_ranged(source, mimetype, download_name, as_attachment=True, size=None, etag=True):
+    """send_file dengan dukungan Range: 206 untuk satu range, multipart/byteranges untuk beberapa.
+
+    source berupa path atau file-like yang bisa di-seek (size wajib diisi untuk
+    file-like). Setiap range dibaca langsung dari offset-nya di penyimpanan,
+    jadi PDF viewer bisa mengambil halaman sedikit demi sedikit.
+    """
+    response = send_file(source, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, etag=etag, conditional=False)
+    if size is None:
+        size = response.content_length
+    response.content_length = size
+
+    if request.range is None and 'Range' in request.headers:
+        # Header yang tidak bisa diurai (mis. range bertumpuk) diabaikan; file dikirim utuh
+        response.accept_ranges = 'bytes'
+        return response.make_conditional(request.environ)
+    if request.range is None or len(request.range.ranges) == 1:
+        # Satu range (termasuk If-Range dan 304) sudah ditangani werkzeug
+        try:
+            return response.make_conditional(request.environ, accept_ranges=True, complete_length=size)
+        except RequestedRangeNotSatisfiable:
+            response.close()
+            return _range_not_satisfiable(size)
+
+    response.make_conditional(request.environ)
+    response.accept_ranges = 'bytes'
+    ranges = _requested_ranges(size)
+    if response.status_code == 304 or ranges is None or not _if_range_matches(response):
+        return response
+    if not ranges:
+        response.close()
+        return _range_not_satisfiable(size)
+
+    if isinstance(source, str):
+        response.close()
+        fileobj = open(source, 'rb')
+    else:
+        fileobj = source
+    content_type = response.content_type
+    response.status_code = 206
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+        response.content_length = stop - start
+        parts, closing = [(b'', start, stop)], b''
+    else:
+        boundary = secrets.token_hex(16)
+        parts = [(f"\r\n--{boundary}\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n".encode(), start, stop)
+                 for start, stop in ranges]
+        closing = f"\r\n--{boundary}--\r\n".encode()
+        response.headers['Content-Type'] = f"multipart/byteranges; boundary={boundary}"
+        response.content_length = sum(len(head) + stop - start for head, start, stop in parts) + len(closing)
+
+    def generate():
+        try:
+            for head, start, stop in parts:
+                if head:
+                    yield head
+                yield from _iter_range(fileobj, start, stop)
+            if closing:
+                yield closing
+        finally:
+            fileobj.close()
+
+    response.response = generate()
+    return response
+
+# === UNDUHAN DOKUMEN BASE64 LAMA SECARA BERTAHAP ===
+class Base64ColumnReader(RawIOBase):
+    """File-like yang membaca kolom base64 lama dari MySQL sepotong demi sepotong.
+
+    Setiap potongan diambil dengan SUBSTRING lewat koneksi pinjaman yang
+    langsung dikembalikan ke pool (koneksi tidak ditahan selama klien
+    mengunduh), lalu di-decode pada batas 4 karakter. Memori per unduhan
+    hanya sebesar satu potongan, bukan seluruh dokumen. seek() cukup
+    menghitung posisi karakter dari offset byte (3 byte = 4 karakter),
+    sehingga range request tidak perlu membaca bagian sebelumnya.
+    """
+
+    def __init__(self, table, row_id, column, start, end):
+        self.table = table
+        self.row_id = row_id
+        self.column = column
+        self._start = start # Posisi karakter pertama isi base64 di kolom (0-based)
+        self._pos = start # Posisi karakter berikutnya yang diambil
+        self._end = end
+        self._buffer = b''
+        self._offset = 0
+        self._byte_pos = 0
+        # Potongan dibaca saat response dikirim, di luar request context: routing ditentukan sekarang
+        self._replica = reads_from_replica()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._byte_pos
+
+    def seek(self, offset, whence=0):
+        if whence != 0:
+            raise OSError("Base64ColumnReader hanya mendukung seek absolut.")
+        self._pos = self._start + offset // 3 * 4
+        self._buffer = b''
+        self._offset = offset % 3 # Dibuang dari potongan pertama setelah di-decode
+        self._byte_pos = offset
+        return offset
+
+    def _next_chunk(self):
+        length = min(DOWNLOAD_CHUNK_SIZE, self._end - self._pos)
+        with db_cursor(replica=self._replica) as (conn, cursor):
+            cursor.execute(f"SELECT SUBSTRING({self.column}, %s, %s) FROM {self.table} WHERE id = %s",
+                           (self._pos + 1, length, self.row_id))
+            row = cursor.fetchone()
+        if not row or not row[0] or len(row[0]) != length:
+            raise IOError(f"Dokumen {self.table} id={self.row_id} berubah saat diunduh.")
+        self._pos += length
+        return base64.b64decode(row[0], validate=True)
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._buffer):
+            if self._pos >= self._end:
+                return 0
+            skip = self._offset - len(self._buffer)
+            self._buffer = self._next_chunk()
+            self._offset = skip
+        count = min(len(buffer), len(self._buffer) - self._offset)
+        buffer[:count] = self._buffer[self._offset:self._offset + count]
+        self._offset += count
+        self._byte_pos += count
+        return count
+
+def open_legacy_dokumen(table, row_id):
+    """Siapkan pembacaan dokumen yang masih tersimpan sebagai base64 di tabel.
+
+    Hanya panjang, awalan data URI dan padding yang dibaca di sini sehingga
+    ukuran hasil decode (untuk Content-Length) diketahui sebelum isi dikirim.
+    Mengembalikan (file, ukuran, mime type), atau None bila kolom kosong.
+    """
+    name_col, base64_col = DOKUMEN_COLUMNS[table][:2]
+    with db_cursor() as (conn, cursor):
+        # Panjang tanpa baris baru/spasi ikut dihitung: base64 yang dibungkus per baris tidak bisa dibaca per potongan
+        cursor.execute(f"""
+            SELECT {name_col}, CHAR_LENGTH({base64_col}), SUBSTRING({base64_col}, 1, 256), RIGHT({base64_col}, 2),
+                   CHAR_LENGTH(REPLACE(REPLACE(REPLACE({base64_col}, %s, ''), %s, ''), ' ', ''))
+            FROM {table} WHERE id = %s
+        """, ('\n', '\r', row_id))
+        row = cursor.fetchone()
+        if not row or not row[1]:
+            return None
+        name, total, head, tail, compact = row
+        start, mime_type = 0, None
+        if ',' in head:
+            header = head.split(',', 1)[0]
+            start = len(header) + 1
+            mime_type = data_uri_mime(header)
+        payload = total - start
+        if payload % 4 or compact != total:
+            # Base64 berisi spasi/baris baru: panjang hasil tidak bisa dihitung, decode sekaligus
+            cursor.execute(f"SELECT {base64_col} FROM {table} WHERE id = %s", (row_id,))
+            data, mime_type = decode_dokumen_base64(cursor.fetchone()[0], name)
+            return BytesIO(data), len(data), mime_type
+    size = payload // 4 * 3 - (tail.count('=') if payload else 0)
+    reader = Base64ColumnReader(table, row_id, base64_col, start, total)
+    return reader, size, mime_type or detect_mime_type(name or '')
+
+def send_legacy_dokumen(table, row_id, download_name, as_attachment=True):
+    """Kirim dokumen base64 lama sebagai response bertahap (mendukung Range) dengan Content-Length yang benar."""
+    opened = open_legacy_dokumen(table, row_id)
+    if opened is None:
+        return None
+    reader, size, mime_type = opened
+    return send_ranged(reader, mime_type, download_name or 'dokumen', as_attachment, size=size)
+
+def dokumen_data_uri(table, row_id):
+    """Isi dokumen sebuah baris sebagai data URI base64 (untuk ?include=), atau None bila kosong."""
+    name_col, _, hash_col, _, mime_col = DOKUMEN_COLUMNS[table]
+    with db_cursor() as (conn, cursor):
+        cursor.execute(f"SELECT {name_col}, {hash_col}, {mime_col} FROM {table} WHERE id = %s", (row_id,))
+        row = cursor.fetchone()
+    if not row:
+        return None
+    name, digest, mime_type = row
+    if digest:
+        with open(dokumen_store.path(digest), 'rb') as f:
+            data = f.read()
+        mime_type = mime_type or detect_mime_type(name or '')
+    else:
+        opened = open_legacy_dokumen(table, row_id)
+        if opened is None:
+            return None
+        reader, _, mime_type = opened
+        data = reader.read()
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+
+# === PROYEKSI FIELD UNTUK ENDPOINT LIST ===
+def dokumen_list_fields(pic_col):
+    """Field yang bisa diminta dari list Proposal/LPJ/RAB/LRA.
+
+    Kolom blob tidak pernah dibaca; keberadaan dokumen cukup dilaporkan
+    lewat hasDokumen dan dokumenSize.
+    """
+    return {
+        'id': 'id',
+        'tanggalMasuk': 'tanggalMasuk',
+        'departemen': 'departemen',
+        'namaProker': 'namaProker',
+        pic_col: pic_col,
+        'dokumenName': 'dokumenName',
+        'tanggalDisetujui': 'tanggalDisetujui',
+        'hasDokumen': '(dokumenHash IS NOT NULL OR dokumenBase64 IS NOT NULL) AS hasDokumen',
+        'dokumenSize': 'dokumenSize',
+        'dokumenMime': 'dokumenMime',
+    }
+
+INVENTARIS_LIST_FIELDS = {
+    'id': 'id',
+    'nama': 'nama',
+    'instansi': 'instansi',
+    'tanggal_surat_masuk': 'tanggal_surat_masuk',
+    'tanggal_pengambilan': 'tanggal_pengambilan',
+    'tanggal_pengembalian': 'tanggal_pengembalian',
+    'masa': 'masa_sewa AS masa',
+    'status': 'keterangan_dp_lunas AS status',
+    'bukti': 'id AS bukti_id, bukti_pembayaran_name, bukti_pembayaran_size, '
+             '(bukti_pembayaran_hash IS NOT NULL OR bukti_pembayaran_base64 IS NOT NULL) AS bukti_ada',
+}
 
-@app.route('/get_proposals', methods=['GET'])
-def get_proposals():
+def parse_fields(field_map):
+    """Baca ?fields=a,b,c dan kembalikan potongan SELECT-nya.
+
+    Tanpa parameter fields semua field di field_map dikembalikan. Nama yang
+    tidak dikenal menghasilkan ValueError supaya klien tahu salah ketik.
+    """
+    raw = request.args.get('fields')
+    names = [name.strip() for name in raw.split(',') if name.strip()] if raw else list(field_map)
+    unknown = [name for name in names if name not in field_map]
+    if unknown:
+        raise ValueError(f"Field tidak dikenal: {', '.join(unknown)}")
+    return names, ', '.join(field_map[name] for name in names)
+
+def format_dokumen_row(row):
+    # Format tanggal agar sesuai dengan yang diharapkan oleh frontend
+    if row.get('tanggalMasuk'):
+        row['tanggalMasuk'] = row['tanggalMasuk'].strftime('%Y-%m-%d')
+    if 'tanggalDisetujui' in row:
+        if row['tanggalDisetujui']:
+            row['tanggalDisetujui'] = row['tanggalDisetujui'].strftime('%Y-%m-%d')
+        else:
+            row['tanggalDisetujui'] = '-' # Jika null, tampilkan '-'
+    if 'hasDokumen' in row:
+        row['hasDokumen'] = bool(row['hasDokumen'])
+    return row
+
+# === PAGINASI, FILTER & HITUNGAN TOTAL ===
+PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 50))
+PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 200))
+COUNT_CACHE_TTL = float(os.getenv('COUNT_CACHE_TTL', 60)) # Detik hasil COUNT(*) disimpan
+
+_count_cache = {} # (tabel, where, params) -> (jumlah, kedaluwarsa)
+_count_cache_lock = threading.Lock()
+
+# === VERSI TABEL & VALIDATOR HTTP ===
+# Setiap tabel punya nomor versi di MySQL yang naik pada setiap submit/update/delete,
+# sehingga semua worker gunicorn melihat versi yang sama
+TABLE_VERSION_POLL_MS = int(os.getenv('TABLE_VERSION_POLL_MS', 500)) # Jeda minimum antar pembacaan table_version per worker
+
+def ensure_table_version_schema(cursor):
+    if DB_BACKEND == 'sqlite':
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS table_version (
+                table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Pengganti ON UPDATE CURRENT_TIMESTAMP milik MySQL
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS table_version_touch AFTER UPDATE OF version ON table_version
+            BEGIN
+                UPDATE table_version SET updated_at = CURRENT_TIMESTAMP WHERE table_name = NEW.table_name;
+            END
+        """)
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_version (
+            table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+
+def touch_table(cursor, table):
+    """Naikkan versi tabel di dalam transaksi penulisan, tepat sebelum commit."""
+    cursor.execute("""
+        INSERT INTO table_version (table_name, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, (table,))
+
+class TableVersionRegistry:
+    """Salinan lokal tabel table_version untuk satu worker.
+
+    Semua versi dibaca dengan satu query, paling sering sekali per
+    interval. Bila versi sebuah tabel berbeda dari yang terakhir dilihat
+    (ditulis worker lain), cache tabel itu di worker ini dibuang, sehingga
+    semua worker berperilaku seperti satu cache dengan keterlambatan
+    maksimal satu interval.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._versions = {} # tabel -> (versi, waktu perubahan UTC)
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._stats = {'polls': 0, 'poll_errors': 0, 'remote_changes': 0}
+
+    def _fresh(self):
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.interval
+
+    def current(self):
+        """Versi semua tabel; dibaca ulang dari MySQL bila snapshot lebih tua dari interval."""
+        with self._lock:
+            if self._fresh():
+                return self._versions
+            has_snapshot = self._checked_at is not None
+        # Hanya satu thread yang membaca ulang; thread lain memakai snapshot lama bila ada
+        if not self._poll_lock.acquire(blocking=not has_snapshot):
+            return self._versions
+        try:
+            with self._lock:
+                if self._fresh():
+                    return self._versions
+            self._poll()
+        finally:
+            self._poll_lock.release()
+        return self._versions
+
+    def _poll(self):
+        try:
+            with db_cursor(replica=False) as (conn, cursor): # Versi acuan selalu dari primary
+                cursor.execute("SELECT table_name, version, UNIX_TIMESTAMP(updated_at) FROM table_version")
+                rows = cursor.fetchall()
+        except (mysql.connector.Error, DatabaseUnavailable) as err:
+            # Database tidak terjangkau: pakai snapshot lama, coba lagi setelah satu interval
+            print(f"Error polling table versions: {err}")
+            with self._lock:
+                self._stats['poll_errors'] += 1
+                self._checked_at = time.monotonic()
+            return
+        versions = {
+            name: (version, datetime.fromtimestamp(int(changed_at), timezone.utc) if changed_at is not None else None)
+            for name, version, changed_at in rows
+        }
+        with self._lock:
+            # Setelah snapshot pertama, tabel yang baru muncul (versi pertama ditulis worker lain) juga berubah
+            changed = [name for name, (version, _) in versions.items()
+                       if self._stats['polls'] and self._versions.get(name, (0, None))[0] != version]
+            self._versions = versions
+            self._checked_at = time.monotonic()
+            self._stats['polls'] += 1
+            self._stats['remote_changes'] += len(changed)
+        for name in changed:
+            invalidate_table_caches(name)
+
+    def get(self, table):
+        """(versi, waktu perubahan terakhir dalam UTC) sebuah tabel."""
+        return self.current().get(table, (0, None))
+
+    def expire(self):
+        """Paksa pembacaan ulang berikutnya, dipanggil setelah worker ini sendiri menulis."""
+        with self._lock:
+            self._checked_at = None
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['versions'] = {name: version for name, (version, _) in self._versions.items()}
+        stats['interval_ms'] = round(self.interval * 1000)
+        return stats
+
+table_versions = TableVersionRegistry(TABLE_VERSION_POLL_MS / 1000)
+
+class ReplicaMonitor:
+    """Cek apakah read replica sudah menyusul primary.
+
+    Versi table_version di replica dibaca paling sering sekali per
+    interval lalu dibandingkan dengan versi primary (table_versions).
+    Replica dianggap tertinggal selama ada tabel yang versinya lebih
+    rendah, termasuk tepat setelah worker ini menulis, sehingga bacaan
+    tidak pernah lebih tua dari yang sudah diketahui worker.
+    """
+
+    def __init__(self, pool, interval):
+        self.pool = pool
+        self.interval = interval
+        self._versions = None # tabel -> versi di replica; None = belum/gagal dibaca
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._stats = {'checks': 0, 'check_errors': 0, 'replica_reads': 0, 'lagging_reads': 0}
+
+    def _replica_versions(self):
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.interval:
+                return self._versions
+        # Hanya satu thread yang membaca ulang; thread lain memakai hasil lama
+        if not self._check_lock.acquire(blocking=False):
+            return self._versions
+        try:
+            self._check()
+        finally:
+            self._check_lock.release()
+        return self._versions
+
+    def _check(self):
+        versions = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = StatementCursor(conn, False)
+            try:
+                cursor.execute("SELECT table_name, version FROM table_version")
+                versions = dict(cursor.fetchall())
+            finally:
+                try:
+                    cursor.close()
+                finally:
+                    conn.close()
+        except mysql.connector.Error as err:
+            if is_connection_error(err):
+                self.pool.breaker.failure()
+            print(f"Error checking replica lag: {err}")
+        except DatabaseUnavailable:
+            pass # Breaker replica terbuka
+        with self._lock:
+            self._versions = versions
+            self._checked_at = time.monotonic()
+            self._stats['checks'] += 1
+            if versions is None:
+                self._stats['check_errors'] += 1
+
+    def behind(self):
+        """Tabel yang versinya di replica masih lebih rendah dari primary, atau None bila replica tidak terbaca."""
+        replica = self._replica_versions()
+        if replica is None:
+            return None
+        return sorted(name for name, (version, _) in table_versions.current().items()
+                      if replica.get(name, 0) < version)
+
+    def caught_up(self):
+        ok = self.behind() == []
+        with self._lock:
+            self._stats['replica_reads' if ok else 'lagging_reads'] += 1
+        return ok
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['behind'] = self.behind()
+        stats['interval_ms'] = round(self.interval * 1000)
+        stats['read_your_writes_window'] = READ_YOUR_WRITES_WINDOW
+        return stats
+
+replica_monitor = ReplicaMonitor(replica_pool, REPLICA_CHECK_INTERVAL) if replica_pool is not None else None
+
+RECENT_WRITE_COOKIE = 'fkdk_wrote'
+
+@app.after_request
+def mark_recent_write(response):
+    # Klien yang baru menulis membaca dari primary (dan melewati cache response) selama READ_YOUR_WRITES_WINDOW
+    if replica_pool is not None and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        response.set_cookie(RECENT_WRITE_COOKIE, str(int(time.time()) + READ_YOUR_WRITES_WINDOW),
+                            max_age=READ_YOUR_WRITES_WINDOW, httponly=True, samesite='Lax')
+    return response
+
+def list_etag(table):
+    """ETag lemah untuk response list/record: versi tabel plus path dan query string yang diminta."""
+    version, changed_at = table_versions.get(table)
+    query_hash = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+    return f"{table}-{version}-{query_hash}", changed_at
+
+def not_modified(etag, last_modified=None, weak=False):
+    """Response 304 bila If-None-Match/If-Modified-Since klien masih berlaku, selain itu None."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+def send_stored_dokumen(digest, mime_type, download_name, as_attachment=True):
+    """Kirim dokumen dari dokumen_store dengan ETag kuat berupa hash isinya.
+
+    If-None-Match yang cocok dijawab 304 sebelum file disentuh.
+    """
+    unchanged = not_modified(digest)
+    if unchanged is not None:
+        return unchanged
+    return send_ranged(dokumen_store.path(digest), mime_type, download_name, as_attachment, etag=digest)
+
+def invalidate_table_caches(table):
+    """Buang hitungan total dan response yang di-cache worker ini untuk sebuah tabel."""
+    with _count_cache_lock:
+        for key in [key for key in _count_cache if key[0] == table]:
+            del _count_cache[key]
+    response_cache.invalidate(table)
+
+def mark_table_changed(table):
+    """Dipanggil setiap kali isi tabel berubah (submit/update/delete) setelah commit."""
+    invalidate_table_caches(table)
+    table_versions.expire()
+
+def cached_count(cursor, table, where_sql, params):
+    key = (table, where_sql, tuple(params))
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+    if cached and cached[1] > now:
+        return cached[0]
+    cursor.execute(f"SELECT COUNT(*) AS total FROM {table}{where_sql}", params)
+    row = cursor.fetchone()
+    total = row['total'] if isinstance(row, dict) else row[0]
+    with _count_cache_lock:
+        _count_cache[key] = (total, now + COUNT_CACHE_TTL)
+    return total
+
+def encode_cursor(tanggal, row_id):
+    raw = json.dumps([tanggal.isoformat() if tanggal else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(value):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True) # Mengembalikan hasil sebagai dictionary
-        cursor.execute("SELECT id, tanggalMasuk, departemen, namaProker, sekretaris, dokumenName, tanggalDisetujui, dokumenBase64 FROM Proposal")
-        proposals = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        # Format tanggal agar sesuai dengan yang diharapkan oleh frontend
-        for proposal in proposals:
-            if proposal['tanggalMasuk']:
-                proposal['tanggalMasuk'] = proposal['tanggalMasuk'].strftime('%Y-%m-%d')
-            if proposal['tanggalDisetujui']:
-                proposal['tanggalDisetujui'] = proposal['tanggalDisetujui'].strftime('%Y-%m-%d')
-            else:
-                proposal['tanggalDisetujui'] = '-' # Jika null, tampilkan '-'
-
-        return jsonify(proposals), 200
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error fetching proposals: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/download_proposal/<int:proposal_id>', methods=['GET'])
-def download_proposal(proposal_id):
+        padded = value + '=' * (-len(value) % 4)
+        tanggal, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.strptime(tanggal, '%Y-%m-%d').date() if tanggal else None), int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Parameter cursor tidak valid.")
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT dokumenName, dokumenBase64 FROM Proposal WHERE id = %s", (proposal_id,))
-        proposal = cursor.fetchone()
-        cursor.close()
-        conn.close()
-
-        if proposal and proposal['dokumenBase64']:
-            dokumen_name = proposal['dokumenName']
-            dokumen_base64 = proposal['dokumenBase64']
-
-            # Deteksi MIME type dari base64 string
-            # Ambil bagian sebelum koma (data:mimetype)
-            mime_type_part = dokumen_base64.split(';')[0]
-            if ':' in mime_type_part:
-                mime_type = mime_type_part.split(':')[1]
-            else:
-                # Fallback atau tebak dari ekstensi jika tidak ada mimetype di base64 string
-                ext = os.path.splitext(dokumen_name)[1].lower()
-                if ext == '.pdf':
-                    mime_type = 'application/pdf'
-                elif ext == '.doc' or ext == '.docx':
-                    mime_type = 'application/msword' # atau application/vnd.openxmlformats-officedocument.wordprocessingml.document
-                else:
-                    mime_type = 'application/octet-stream' # Default jika tidak diketahui
-
-            # Hapus header data URI jika ada (misalnya 'data:application/pdf;base64,')
-            if ',' in dokumen_base64:
-                base64_data = dokumen_base64.split(',')[1]
-            else:
-                base64_data = dokumen_base64
-
-            file_bytes = base64.b64decode(base64_data)
-            return send_file(BytesIO(file_bytes),
-                             mimetype=mime_type,
-                             as_attachment=True,
-                             download_name=dokumen_name)
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Parameter {name} harus berformat YYYY-MM-DD.")
+
+def build_filters(date_col, equal_filters, approve_col=None):
+    """Susun klausa WHERE dari query string.
+
+    equal_filters memetakan nama parameter ke kolom yang dibandingkan
+    dengan '='. Rentang tanggal memakai ?dari= dan ?sampai=, sedangkan
+    ?status=approved|pending memeriksa approve_col terisi atau tidak.
+    """
+    clauses, params = [], []
+    for param, col in equal_filters.items():
+        value = request.args.get(param)
+        if value:
+            clauses.append(f"{col} = %s")
+            params.append(value)
+    dari = parse_date_arg('dari')
+    if dari:
+        clauses.append(f"{date_col} >= %s")
+        params.append(dari)
+    sampai = parse_date_arg('sampai')
+    if sampai:
+        clauses.append(f"{date_col} <= %s")
+        params.append(sampai)
+    status = request.args.get('status')
+    if status and approve_col:
+        if status == 'approved':
+            clauses.append(f"{approve_col} IS NOT NULL")
+        elif status == 'pending':
+            clauses.append(f"{approve_col} IS NULL")
         else:
-            return jsonify({"error": "Dokumen tidak ditemukan atau data kosong."}), 404
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error downloading proposal: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/update_proposal/<int:proposal_id>', methods=['PUT'])
-def update_proposal(proposal_id):
+            raise ValueError("Parameter status harus approved atau pending.")
+    return clauses, params
+
+def keyset_condition(date_col, cursor_value, descending):
+    """Klausa 'sesudah cursor' untuk urutan (tanggal, id).
+
+    MySQL menaruh NULL paling kecil, jadi baris bertanggal kosong muncul di
+    akhir urutan DESC dan di awal urutan ASC.
+    """
+    tanggal, row_id = cursor_value
+    op = '<' if descending else '>'
+    if tanggal is None:
+        if descending:
+            return f"({date_col} IS NULL AND id < %s)", [row_id]
+        return f"(({date_col} IS NULL AND id > %s) OR {date_col} IS NOT NULL)", [row_id]
+    clause = f"({date_col} {op} %s OR ({date_col} = %s AND id {op} %s)"
+    clause += f" OR {date_col} IS NULL)" if descending else ")"
+    return clause, [tanggal, tanggal, row_id]
+
+def fetch_page(cursor, table, select_list, date_col, clauses, params):
+    """Ambil satu halaman dengan keyset pagination pada (tanggal, id).
+
+    Query string yang dipakai: limit, cursor, order=desc|asc. Mengembalikan
+    (rows, next_cursor, total); total dihitung dengan COUNT(*) yang di-cache.
+    """
+    limit = request.args.get('limit', PAGE_SIZE_DEFAULT, type=int)
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    order = request.args.get('order', 'desc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError("Parameter order harus asc atau desc.")
+    descending = order == 'desc'
+
+    where_sql = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    total = cached_count(cursor, table, where_sql, params)
+
+    page_clauses, page_params = list(clauses), list(params)
+    if request.args.get('cursor'):
+        clause, cursor_params = keyset_condition(date_col, decode_cursor(request.args['cursor']), descending)
+        page_clauses.append(clause)
+        page_params += cursor_params
+    page_where = f" WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+    direction = 'DESC' if descending else 'ASC'
+    cursor.execute(
+        f"SELECT {select_list}, {date_col} AS _cursor_tanggal, id AS _cursor_id FROM {table}{page_where} "
+        f"ORDER BY {date_col} {direction}, id {direction} LIMIT %s",
+        page_params + [limit + 1]
+    )
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['_cursor_tanggal'], rows[-1]['_cursor_id'])
+    for row in rows:
+        del row['_cursor_tanggal']
+        del row['_cursor_id']
+    return rows, next_cursor, total
+
+def parse_ids():
+    """Baca ?ids=1,5,9 untuk multi-get. Mengembalikan list id tanpa duplikat, atau None."""
+    raw = request.args.get('ids')
+    if raw is None:
+        return None
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
-
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        sekretaris = data.get('sekretaris')
-        dokumen_name = data.get('dokumenName')
-        dokumen_base64 = data.get('dokumenBase64')
-        tanggal_disetujui = data.get('tanggalDisetujui')
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        update_query = """
-        UPDATE Proposal
-        SET tanggalMasuk = %s, departemen = %s, namaProker = %s, sekretaris = %s,
-            dokumenName = %s, dokumenBase64 = %s, tanggalDisetujui = %s
-        WHERE id = %s
-        """
-        cursor.execute(update_query, (
-            tanggal_masuk, departemen, nama_proker, sekretaris,
-            dokumen_name, dokumen_base64, tanggal_disetujui, proposal_id
-        ))
-        conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"error": "Proposal tidak ditemukan."}), 404
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "Proposal berhasil diupdate!"}), 200
-
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error updating proposal: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+        ids = list(dict.fromkeys(int(value) for value in raw.split(',') if value.strip()))
+    except ValueError:
+        raise ValueError("Parameter ids harus berupa daftar angka, contoh: ids=1,5,9.")
+    if not ids:
+        raise ValueError("Parameter ids tidak boleh kosong.")
+    if len(ids) > PAGE_SIZE_MAX:
+        raise ValueError(f"Parameter ids maksimal {PAGE_SIZE_MAX} id.")
+    return ids
+
+def fetch_by_ids(cursor, table, select_list, ids, clauses=(), params=()):
+    """Ambil baris lewat primary key dengan urutan sesuai ids; id yang tidak ada dilewati."""
+    where_sql = ' AND '.join([f"id IN ({', '.join(['%s'] * len(ids))})", *clauses])
+    cursor.execute(f"SELECT {select_list}, id AS _row_id FROM {table} WHERE {where_sql}", list(ids) + list(params))
+    by_id = {row.pop('_row_id'): row for row in cursor.fetchall()}
+    return [by_id[row_id] for row_id in ids if row_id in by_id]
+
+def parse_include(allowed):
+    """True bila ?include=<allowed> diminta (isi file ikut dikirim sebagai base64)."""
+    value = request.args.get('include')
+    if not value:
+        return False
+    if value != allowed:
+        raise ValueError(f"Parameter include hanya mendukung '{allowed}'.")
+    return True
+
+def record_response(row, etag, last_modified):
+    """Response satu record dengan validator yang sama seperti list."""
+    response = jsonify(row)
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+def page_response(rows, next_cursor, total, etag=None, last_modified=None):
+    """Body tetap berupa array; info halaman dikirim lewat header."""
+    response = jsonify(rows)
+    response.headers['X-Total-Count'] = str(total)
+    if etag:
+        # Browser wajib revalidasi ke server, tapi cukup dijawab 304 bila versi tabel belum berubah
+        response.set_etag(etag, weak=True)
+        response.cache_control.no_cache = True
+        if last_modified is not None:
+            response.last_modified = last_modified
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(request.endpoint, _external=True, **args)}>; rel="next"'
+    return response
+
+# === KOMPRESI RESPONSE ===
+def _gzip_stream(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits 31 = format gzip
+    return compressor.compress, compressor.flush
+
+def _brotli_stream(level):
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.finish
+
+def _zstd_stream(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, compressor.flush
+
+# encoding -> (pembuat kompresor, level per request, level untuk response yang di-cache)
+_ENCODERS = {
+    'gzip': (_gzip_stream, 6, 9),
+    'br': (_brotli_stream, 4, 9) if brotli is not None else None,
+    'zstd': (_zstd_stream, 3, 12) if zstandard is not None else None,
+}
+RESPONSE_ENCODINGS = {name: _ENCODERS[name] for name in (e.strip() for e in COMPRESS_ENCODINGS.split(','))
+                      if _ENCODERS.get(name)}
 
-@app.route('/delete_proposal/<int:proposal_id>', methods=['DELETE'])
-def delete_proposal(proposal_id):
+def negotiate_encoding():
+    """Content-Encoding terbaik menurut Accept-Encoding request aktif, atau None untuk identity."""
+    if not RESPONSE_ENCODINGS:
+        return None
+    return request.accept_encodings.best_match(RESPONSE_ENCODINGS)
+
+def compress_bytes(data, encoding, cached=False):
+    factory, level, cached_level = RESPONSE_ENCODINGS[encoding]
+    feed, finish = factory(cached_level if cached else level)
+    return feed(data) + finish()
+
+def _iter_compressed(chunks, encoding):
+    factory, level, _ = RESPONSE_ENCODINGS[encoding]
+    feed, finish = factory(level)
+    for chunk in chunks:
+        block = feed(chunk)
+        if block:
+            yield block
+    yield finish()
+
+@app.after_request
+def compress_response(response):
+    """Kompres response 200 yang belum ter-encode sesuai Accept-Encoding.
+
+    Body biasa dikompres sekaligus; unduhan yang dialirkan (send_file,
+    dokumen base64 lama) dikompres per potongan sehingga memori tetap
+    kecil. Response 206/304, HEAD, body kecil dan mimetype di
+    COMPRESS_SKIP_TYPES dikirim apa adanya.
+    """
+    if (request.method == 'HEAD' or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or not RESPONSE_ENCODINGS or (response.mimetype or '').startswith(COMPRESS_SKIP_TYPES)):
+        return response
+    length = response.content_length
+    if length is not None and length < COMPRESS_MIN_SIZE:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        original = response.response
+        if hasattr(original, 'close'):
+            response.call_on_close(original.close) # Generator yang tidak pernah diiterasi tidak menutup file
+        response.response = _iter_compressed(response.iter_encoded(), encoding)
+        del response.headers['Content-Length']
+    else:
+        response.set_data(compress_bytes(response.get_data(), encoding))
+    # Offset Range dan ETag kuat mengacu ke byte asli, bukan hasil kompresi
+    del response.headers['Accept-Ranges']
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# === CACHE RESPONSE LIST & RECORD ===
+# Response GET list/record disimpan per worker sebagai bytes JSON siap kirim (plus versi terkompresnya),
+# dikunci dengan path + query string. Cache hit tidak menyentuh MySQL maupun encoder JSON.
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 256)) # Jumlah response maksimum; 0 = nonaktif
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 30)) # Detik response dianggap segar
+RESPONSE_CACHE_STALE = float(os.getenv('RESPONSE_CACHE_STALE', 300)) # Detik response basi masih dikirim sambil diperbarui
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 1024 * 1024)) # Response lebih besar tidak disimpan
+
+class CachedResponse:
+    """Satu response yang sudah diserialisasi; to_response() membangun response baru untuk request aktif."""
+
+    # Header yang dihitung ulang per request atau ditambahkan after_request (CORS)
+    SKIP_HEADERS = {'content-length', 'content-type', 'content-encoding', 'vary'}
+
+    def __init__(self, table, response):
+        self.table = table
+        self.body = response.get_data()
+        self.encoded = {} # encoding -> body terkompres, diisi sekali saat pertama diminta
+        self.mimetype = response.mimetype
+        self.compressible = len(self.body) >= COMPRESS_MIN_SIZE and not self.mimetype.startswith(COMPRESS_SKIP_TYPES)
+        self.headers = [(name, value) for name, value in response.headers
+                        if name.lower() not in self.SKIP_HEADERS and not name.lower().startswith('access-control-')]
+        self.etag, self.weak = response.get_etag()
+        self.last_modified = response.last_modified
+        self.stored_at = time.monotonic()
+
+    def to_response(self):
+        if self.etag:
+            unchanged = not_modified(self.etag, self.last_modified, weak=self.weak)
+            if unchanged is not None:
+                return unchanged
+        encoding = negotiate_encoding() if self.compressible else None
+        response = app.response_class(self.encoded_body(encoding) if encoding else self.body, mimetype=self.mimetype)
+        response.headers.extend(self.headers)
+        if self.compressible:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def encoded_body(self, encoding):
+        body = self.encoded.get(encoding)
+        if body is None:
+            # Level lebih tinggi dari kompresi per request: biayanya dibayar sekali untuk semua hit
+            body = self.encoded[encoding] = compress_bytes(self.body, encoding, cached=True)
+        return body
+
+class ResponseCache:
+    """LRU dengan TTL dan stale-while-revalidate untuk CachedResponse.
+
+    Setiap tabel punya nomor generasi yang naik di invalidate(); hasil query
+    yang dimulai sebelum invalidate tidak akan disimpan, sehingga response
+    lama tidak bisa masuk lagi setelah ada penulisan.
+    """
+
+    def __init__(self, size, ttl, stale):
+        self.size = size
+        self.ttl = ttl
+        self.stale = stale
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0,
+                       'fallbacks': 0}
+
+    def generation(self, table):
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def lookup(self, key):
+        """(entry, basi?) atau (None, False) bila tidak ada/kedaluwarsa."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age < self.ttl + self.stale:
+                    self._entries.move_to_end(key)
+                    stale = age >= self.ttl
+                    self._stats['stale_hits' if stale else 'hits'] += 1
+                    return entry, stale
+                # Entri kedaluwarsa dibiarkan sampai tergeser LRU: masih berguna untuk fallback()
+            self._stats['misses'] += 1
+            return None, False
+
+    def fallback(self, key):
+        """Entri untuk key berapa pun umurnya; dipakai saat database tidak terjangkau."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._stats['fallbacks'] += 1
+            return entry
+
+    def store(self, key, entry, generation):
+        with self._lock:
+            if self._generations.get(entry.table, 0) != generation:
+                return False # Tabel berubah selama response dibuat
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+            return True
+
+    def invalidate(self, table):
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [key for key, entry in self._entries.items() if entry.table == table]:
+                del self._entries[key]
+                self._stats['invalidations'] += 1
+
+    def start_refresh(self, key):
+        """True bila pemanggil yang harus memperbarui key (hanya satu refresh per key)."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = sum(len(entry.body) + sum(map(len, list(entry.encoded.values())))
+                                 for entry in self._entries.values())
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        stats.update(size=self.size, ttl=self.ttl, stale=self.stale)
+        return stats
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_STALE)
+
+def _render_cacheable(view, args, kwargs, table, key):
+    """Jalankan view lalu simpan hasilnya bila berupa JSON 200. Mengembalikan (response, entry atau None)."""
+    generation = response_cache.generation(table)
+    response = app.make_response(view(*args, **kwargs))
+    if response.status_code != 200 or response.mimetype != 'application/json':
+        return response, None
+    size = response.calculate_content_length()
+    if size is None or size > RESPONSE_CACHE_MAX_BYTES:
+        return response, None
+    entry = CachedResponse(table, response)
+    response_cache.store(key, entry, generation)
+    return response, entry
+
+def _refresh_cached(view, args, kwargs, table, key, base_url):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Proposal WHERE id = %s", (proposal_id,))
-        conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"error": "Proposal tidak ditemukan."}), 404
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "Proposal berhasil dihapus!"}), 200
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
+        path, _, query = key.partition('?')
+        with app.test_request_context(path, base_url=base_url, query_string=query):
+            _render_cacheable(view, args, kwargs, table, key)
     except Exception as e:
-        print(f"Error deleting proposal: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/submit_lpj', methods=['POST'])
-def submit_lpj():
+        print(f"Error refreshing cache {key}: {e}")
+    finally:
+        response_cache.end_refresh(key)
+
+def cached_response(table):
+    """Decorator endpoint GET list/record: layani dari response_cache, isi saat miss.
+
+    Response basi (lewat TTL, masih dalam jendela stale) langsung dikirim
+    sementara satu thread memperbaruinya di belakang. Invalidasi terjadi di
+    mark_table_changed setiap kali tabel ditulis. Bila database tidak
+    terjangkau, entri yang sudah kedaluwarsa pun dikirim daripada 503.
+    Klien yang baru saja menulis (recently_wrote) selalu dijawab dari primary.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not response_cache.size or recently_wrote():
+                return view(*args, **kwargs)
+            table_versions.current() # Buang entri yang sudah diubah worker lain sebelum lookup
+            key = request.full_path
+            entry, stale = response_cache.lookup(key)
+            if entry is None:
+                try:
+                    response, entry = _render_cacheable(view, args, kwargs, table, key)
+                except DatabaseUnavailable:
+                    # Lebih baik data lama daripada 503 untuk pembacaan
+                    entry = response_cache.fallback(key)
+                    if entry is None:
+                        raise
+                    return entry.to_response()
+                if entry is None:
+                    return response
+            elif stale and response_cache.start_refresh(key):
+                threading.Thread(target=_refresh_cached, args=(view, args, kwargs, table, key, request.host_url),
+                                 daemon=True).start()
+            return entry.to_response()
+        return wrapper
+    return decorator
+
+# === TOKEN AKSES (JWT) ===
+# Setelah login klien menerima access token berumur pendek dan refresh token. Endpoint yang dilindungi
+# cukup memverifikasi tanda tangan token (hasilnya di-cache), tanpa query ke tabel users maupun bcrypt.
+# JWT_KEYS = "kid:rahasia,kid_lama:rahasia_lama": kunci pertama menandatangani, sisanya hanya memverifikasi
+# (rotasi: tambahkan kunci baru di depan, hapus yang lama setelah REFRESH_TOKEN_TTL berlalu).
+ACCESS_TOKEN_TTL = int(os.getenv('ACCESS_TOKEN_TTL', 15 * 60))
+REFRESH_TOKEN_TTL = int(os.getenv('REFRESH_TOKEN_TTL', 7 * 24 * 3600))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 4096)) # Jumlah access token terverifikasi yang diingat per worker
+AUTH_REQUIRED = os.getenv('AUTH_REQUIRED', '1') != '0' # 0 = endpoint yang dilindungi tetap terbuka (masa transisi)
+
+# Tanpa JWT_KEYS, kunci acak dibuat sekali dan disimpan di file ini (di luar repo) agar sama untuk semua worker
+JWT_KEY_FILE = os.getenv('JWT_KEY_FILE', os.path.join(os.path.expanduser('~'), '.config', 'fkdk', 'jwt_key'))
+
+def _generated_jwt_key(path):
+    """Rahasia dari JWT_KEY_FILE; dibuat (mode 0600) bila belum ada. Worker yang kalah balapan membaca milik pemenang."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
-
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        sekretaris = data.get('sekretaris')
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(path) as f:
+                secret = f.read().strip()
+            if secret:
+                return secret
+            time.sleep(0.01) # File baru dibuat worker lain dan belum terisi
+        raise RuntimeError(f"JWT_KEY_FILE kosong: {path}")
+    secret = secrets.token_urlsafe(48)
+    with os.fdopen(fd, 'w') as f:
+        f.write(secret)
+    return secret
+
+def _load_jwt_keys():
+    value = os.getenv('JWT_KEYS')
+    if not value:
+        # Jangan pernah menurunkan kunci dari kredensial yang punya nilai default di repo ini
+        return [('local', _generated_jwt_key(JWT_KEY_FILE))]
+    keys = []
+    for item in value.split(','):
+        kid, sep, secret = item.strip().partition(':')
+        if not sep or not kid or len(secret) < 32:
+            raise RuntimeError(f"JWT_KEYS tidak valid: {item.strip()!r} (format kid:rahasia, rahasia minimal 32 karakter)")
+        keys.append((kid, secret))
+    return keys
+
+JWT_KEYS = _load_jwt_keys()
+
+def issue_tokens(username, role):
+    """Pasangan access/refresh token baru, dalam bentuk yang dikirim ke klien."""
+    kid, secret = JWT_KEYS[0]
+    now = int(time.time())
+    tokens = {}
+    for token_type, ttl in (('access', ACCESS_TOKEN_TTL), ('refresh', REFRESH_TOKEN_TTL)):
+        claims = {'sub': username, 'role': role, 'type': token_type, 'iat': now, 'exp': now + ttl}
+        tokens[f"{token_type}_token"] = jwt.encode(claims, secret, algorithm='HS256', headers={'kid': kid})
+    tokens.update(token_type='Bearer', expires_in=ACCESS_TOKEN_TTL)
+    return tokens
+
+class TokenVerifier:
+    """Verifikasi JWT dengan cache LRU token -> claims sampai token kedaluwarsa."""
+
+    def __init__(self, keys, size):
+        self.keys = dict(keys)
+        self.size = size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'rejected': 0}
+
+    def verify(self, token, token_type='access'):
+        """Claims token, atau jwt.InvalidTokenError bila tanda tangan/jenis/masa berlaku tidak valid."""
+        now = time.time()
+        with self._lock:
+            claims = self._cache.get(token)
+            if claims is not None and claims['exp'] > now and claims['type'] == token_type:
+                self._cache.move_to_end(token)
+                self._stats['hits'] += 1
+                return claims
+            self._stats['misses'] += 1
+        try:
+            secret = self.keys.get(jwt.get_unverified_header(token).get('kid'))
+            if secret is None:
+                raise jwt.InvalidTokenError('kid tidak dikenal') # InvalidKeyError bukan turunan InvalidTokenError
+            claims = jwt.decode(token, secret, algorithms=['HS256'], options={'require': ['exp', 'sub', 'type']})
+            if claims['type'] != token_type:
+                raise jwt.InvalidTokenError(f"Bukan {token_type} token")
+        except jwt.InvalidTokenError:
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise
+        with self._lock:
+            self._cache[token] = claims
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+        return claims
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = len(self._cache)
+        stats.update(size=self.size, signing_kid=JWT_KEYS[0][0], kids=list(self.keys))
+        return stats
+
+token_verifier = TokenVerifier(JWT_KEYS, TOKEN_CACHE_SIZE)
+
+def _auth_error(message, status):
+    response = jsonify({"error": message})
+    response.status_code = status
+    if status == 401:
+        response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+def require_auth(*roles):
+    """Decorator endpoint: wajib header Authorization: Bearer <access token>; roles membatasi peran (mis. 'admin').
+
+    Claims token tersedia di g.auth. Bila AUTH_REQUIRED=0 request tanpa
+    token tetap diteruskan.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.auth = None
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            if scheme.lower() != 'bearer' or not token:
+                if not AUTH_REQUIRED:
+                    return view(*args, **kwargs)
+                return _auth_error("Login diperlukan.", 401)
+            try:
+                g.auth = token_verifier.verify(token.strip())
+            except jwt.InvalidTokenError:
+                return _auth_error("Token tidak valid atau sudah kedaluwarsa.", 401)
+            if roles and g.auth.get('role') not in roles:
+                return _auth_error("Akses ditolak.", 403)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# === RESOURCE DOKUMEN (PROPOSAL/LPJ/RAB/LRA) ===
+def dokumen_endpoint(action):
+    """Penanganan error yang sama untuk semua endpoint DokumenResource."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except (RequestEntityTooLarge, DatabaseUnavailable):
+                raise
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            except mysql.connector.DataError as err:
+                # Nilai kolom ditolak database (mis. tanggal bukan YYYY-MM-DD): kesalahan klien
+                return jsonify({"error": f"Data tidak valid: {err.msg}"}), 400
+            except mysql.connector.Error as err:
+                print(f"MySQL Error: {err}")
+                return jsonify({"error": f"Kesalahan database: {err}"}), 500
+            except Exception as e:
+                print(f"Error {action} {self.slug}: {e}")
+                return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+        return wrapper
+    return decorator
+
+class DokumenResource:
+    """Satu jenis dokumen beserta seluruh endpoint-nya, dibuat dari DOKUMEN_TYPES.
+
+    Semua jenis memakai kolom yang sama kecuali kolom penanggung jawab
+    (pic_col), jadi SQL cukup disusun sekali di sini. Endpoint yang
+    didaftarkan register() tetap memakai URL dan nama endpoint lama:
+    /submit_<slug>, /get_<slug>s, /<slug>/<id>, /download_<slug>/<id>,
+    /update_<slug>/<id> (PUT dan PATCH) dan /delete_<slug>/<id>.
+    """
+
+    def __init__(self, table, slug, pic_col):
+        self.table = table
+        self.slug = slug
+        self.pic_col = pic_col
+        self.required = ('tanggalMasuk', 'departemen', 'namaProker', pic_col)
+        self.editable = self.required + ('dokumenName', 'tanggalDisetujui')
+        self.list_fields = dokumen_list_fields(pic_col)
+
+        columns = self.required + ('dokumenName', 'dokumenHash', 'dokumenSize', 'dokumenMime')
+        self.insert_sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join(['%s'] * len(columns))})")
+        self.lock_sql = f"SELECT dokumenHash FROM {table} WHERE id = %s FOR UPDATE"
+        self.download_sql = (f"SELECT dokumenName, dokumenHash, dokumenMime, dokumenBase64 IS NOT NULL AS legacy "
+                             f"FROM {table} WHERE id = %s")
+        self.update_sql = (f"UPDATE {table} SET {', '.join(f'{name} = %s' for name in self.required)}, "
+                           f"dokumenName = COALESCE(%s, dokumenName), tanggalDisetujui = %s WHERE id = %s")
+        self.replace_dokumen_sql = (f"UPDATE {table} SET dokumenHash = %s, dokumenSize = %s, dokumenMime = %s, "
+                                    f"dokumenBase64 = NULL WHERE id = %s")
+        self.delete_sql = f"DELETE FROM {table} WHERE id = %s"
+
+    def register(self, app):
+        rules = [
+            (f'/submit_{self.slug}', f'submit_{self.slug}', require_auth()(self.submit), ['POST']),
+            (f'/get_{self.slug}s', f'get_{self.slug}s', cached_response(self.table)(self.list_rows), ['GET']),
+            (f'/{self.slug}/<int:row_id>', f'get_{self.slug}', cached_response(self.table)(self.record), ['GET']),
+            (f'/download_{self.slug}/<int:row_id>', f'download_{self.slug}', self.download, ['GET']),
+            (f'/update_{self.slug}/<int:row_id>', f'update_{self.slug}', require_auth('admin')(self.update), ['PUT']),
+            (f'/update_{self.slug}/<int:row_id>', f'patch_{self.slug}', require_auth('admin')(self.patch), ['PATCH']),
+            (f'/delete_{self.slug}/<int:row_id>', f'delete_{self.slug}', require_auth('admin')(self.delete), ['DELETE']),
+        ]
+        for rule, endpoint, view_func, methods in rules:
+            app.add_url_rule(rule, endpoint, view_func, methods=methods)
+
+    def commit(self, conn, cursor, released=()):
+        """Commit perubahan tabel: naikkan versi tabel, lalu bersihkan blob yang tidak dipakai lagi."""
+        touch_table(cursor, self.table)
+        conn.commit()
+        mark_table_changed(self.table)
+        collect_dokumen(conn, cursor, released)
+
+    def insert(self, cursor, fields, dokumen_name, content, mime_type):
+        """Simpan dokumen lalu tambahkan barisnya; dipakai submit dan finalize upload bertahap."""
+        dokumen_hash, dokumen_size = acquire_dokumen(cursor, content, mime_type)
+        cursor.execute(self.insert_sql, [fields[name] for name in self.required] +
+                       [dokumen_name, dokumen_hash, dokumen_size, mime_type])
+
+    def fetch_record(self, cursor, row_id, select_list=None):
+        """Satu baris dalam bentuk yang sama seperti list, atau None bila tidak ada."""
+        rows = fetch_by_ids(cursor, self.table, select_list or ', '.join(self.list_fields.values()), [row_id])
+        return format_dokumen_row(rows[0]) if rows else None
+
+    def request_data(self):
+        """(field, dokumen) dari body JSON (dokumenBase64) atau multipart/raw body (file "dokumen")."""
+        if request.is_json:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not data:
+                raise ValueError("No JSON data received")
+            return data, data.pop('dokumenBase64', None)
+        # File dialirkan ke disk tanpa base64
+        return binary_upload('dokumen', 'dokumenName')
+
+    @dokumen_endpoint('submitting')
+    def submit(self):
+        data, dokumen = self.request_data()
         dokumen_name = data.get('dokumenName')
-        dokumen_base64 = data.get('dokumenBase64')
 
         # Validasi minimal
-        if not all([tanggal_masuk, departemen, nama_proker, sekretaris, dokumen_name, dokumen_base64]):
-            return jsonify({"error": "Data lpj tidak lengkap. Pastikan semua field terisi, termasuk dokumen."}), 400
+        if not all([data.get(name) for name in self.required] + [dokumen_name, dokumen]):
+            return jsonify({"error": f"Data {self.table} tidak lengkap. Pastikan semua field terisi, termasuk dokumen."}), 400
 
-        # Hapus "data:mimetype;base64," prefix jika ada
-        if ',' in dokumen_base64:
-            dokumen_base64 = dokumen_base64.split(',')[1]
+        # Decode sekali di sini; tabel hanya menyimpan hash, ukuran, dan mime type dokumen
+        dokumen_content, mime_type = read_dokumen(dokumen, dokumen_name)
+        with db_cursor() as (conn, cursor):
+            self.insert(cursor, data, dokumen_name, dokumen_content, mime_type)
+            self.commit(conn, cursor)
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        return jsonify({"message": f"{self.table} berhasil dikirim!"}), 200
 
-        insert_query = """
-        INSERT INTO LPJ (tanggalMasuk, departemen, namaProker, sekretaris, dokumenName, dokumenBase64)
-        VALUES (%s, %s, %s, %s, %s, %s)
+    @dokumen_endpoint('fetching')
+    def list_rows(self):
+        """Filter: departemen, dari, sampai, status=approved|pending. Dengan
+        ?ids=1,5,9 hanya baris ber-id tersebut yang diambil, tanpa paginasi.
         """
-        cursor.execute(insert_query, (tanggal_masuk, departemen, nama_proker, sekretaris, dokumen_name, dokumen_base64))
-        conn.commit()
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "LPJ berhasil dikirim!"}), 200
-
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error submitting lpj: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/get_lpjs', methods=['GET'])
-def get_lpjs():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True) # Mengembalikan hasil sebagai dictionary
-        cursor.execute("SELECT id, tanggalMasuk, departemen, namaProker, sekretaris, dokumenName, tanggalDisetujui, dokumenBase64 FROM LPJ")
-        lpjs = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        # Format tanggal agar sesuai dengan yang diharapkan oleh frontend
-        for lpj in lpjs:
-            if lpj['tanggalMasuk']:
-                lpj['tanggalMasuk'] = lpj['tanggalMasuk'].strftime('%Y-%m-%d')
-            if lpj['tanggalDisetujui']:
-                lpj['tanggalDisetujui'] = lpj['tanggalDisetujui'].strftime('%Y-%m-%d')
+        _, select_list = parse_fields(self.list_fields)
+        clauses, params = build_filters('tanggalMasuk', {'departemen': 'departemen'}, 'tanggalDisetujui')
+        etag, changed_at = list_etag(self.table)
+        unchanged = not_modified(etag, changed_at, weak=True)
+        if unchanged is not None:
+            return unchanged
+        with db_cursor(dictionary=True) as (conn, cursor):
+            ids = parse_ids()
+            if ids:
+                rows = fetch_by_ids(cursor, self.table, select_list, ids, clauses, params)
+                next_cursor, total = None, len(rows)
             else:
-                lpj['tanggalDisetujui'] = '-' # Jika null, tampilkan '-'
-
-        return jsonify(lpjs), 200
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error fetching lpjs: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+                rows, next_cursor, total = fetch_page(cursor, self.table, select_list, 'tanggalMasuk', clauses, params)
 
-@app.route('/download_lpj/<int:lpj_id>', methods=['GET'])
-def download_lpj(lpj_id):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT dokumenName, dokumenBase64 FROM LPJ WHERE id = %s", (lpj_id,))
-        lpj = cursor.fetchone()
-        cursor.close()
-        conn.close()
-
-        if lpj and lpj['dokumenBase64']:
-            dokumen_name = lpj['dokumenName']
-            dokumen_base64 = lpj['dokumenBase64']
+        return page_response([format_dokumen_row(row) for row in rows], next_cursor, total, etag, changed_at), 200
 
-            # Deteksi MIME type dari base64 string
-            # Ambil bagian sebelum koma (data:mimetype)
-            mime_type_part = dokumen_base64.split(';')[0]
-            if ':' in mime_type_part:
-                mime_type = mime_type_part.split(':')[1]
-            else:
-                # Fallback atau tebak dari ekstensi jika tidak ada mimetype di base64 string
-                ext = os.path.splitext(dokumen_name)[1].lower()
-                if ext == '.pdf':
-                    mime_type = 'application/pdf'
-                elif ext == '.doc' or ext == '.docx':
-                    mime_type = 'application/msword' # atau application/vnd.openxmlformats-officedocument.wordprocessingml.document
-                else:
-                    mime_type = 'application/octet-stream' # Default jika tidak diketahui
-
-            # Hapus header data URI jika ada (misalnya 'data:application/pdf;base64,')
-            if ',' in dokumen_base64:
-                base64_data = dokumen_base64.split(',')[1]
-            else:
-                base64_data = dokumen_base64
-
-            file_bytes = base64.b64decode(base64_data)
-            return send_file(BytesIO(file_bytes),
-                             mimetype=mime_type,
-                             as_attachment=True,
-                             download_name=dokumen_name)
-        else:
+    @dokumen_endpoint('fetching')
+    def record(self, row_id):
+        """Satu lookup primary key. ?fields= sama seperti list, dan ?include=dokumen
+        menambahkan isi dokumen sebagai dokumenBase64 (data URI).
+        """
+        _, select_list = parse_fields(self.list_fields)
+        include = parse_include('dokumen')
+        etag, changed_at = list_etag(self.table)
+        unchanged = not_modified(etag, changed_at, weak=True)
+        if unchanged is not None:
+            return unchanged
+        with db_cursor(dictionary=True) as (conn, cursor):
+            row = self.fetch_record(cursor, row_id, select_list)
+        if row is None:
+            return jsonify({"error": f"{self.table} tidak ditemukan."}), 404
+
+        if include:
+            row['dokumenBase64'] = dokumen_data_uri(self.table, row_id)
+        return record_response(row, etag, changed_at), 200
+
+    @dokumen_endpoint('downloading')
+    def download(self, row_id):
+        with db_cursor(dictionary=True) as (conn, cursor):
+            cursor.execute(self.download_sql, (row_id,))
+            row = cursor.fetchone()
+
+        if row and row['dokumenHash']:
+            return send_stored_dokumen(row['dokumenHash'], row['dokumenMime'] or detect_mime_type(row['dokumenName']),
+                                       row['dokumenName'])
+        # Baris lama yang belum dimigrasikan masih menyimpan base64 di tabel; dialirkan per potongan
+        try:
+            response = send_legacy_dokumen(self.table, row_id, row['dokumenName']) if row and row['legacy'] else None
+        except ValueError as e:
+            return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+        if response is None:
             return jsonify({"error": "Dokumen tidak ditemukan atau data kosong."}), 404
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error downloading lpj: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+        return response
 
-@app.route('/update_lpj/<int:lpj_id>', methods=['PUT'])
-def update_lpj(lpj_id):
-    try:
+    @dokumen_endpoint('updating')
+    def update(self, row_id):
+        """PUT lama: semua field ditimpa, dokumen hanya diganti bila dikirim ulang."""
         data = request.get_json()
         if not data:
             return jsonify({"error": "No JSON data received"}), 400
-
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        sekretaris = data.get('sekretaris')
-        dokumen_name = data.get('dokumenName')
         dokumen_base64 = data.get('dokumenBase64')
-        tanggal_disetujui = data.get('tanggalDisetujui')
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        update_query = """
-        UPDATE LPJ
-        SET tanggalMasuk = %s, departemen = %s, namaProker = %s, sekretaris = %s,
-            dokumenName = %s, dokumenBase64 = %s, tanggalDisetujui = %s
-        WHERE id = %s
+        if dokumen_base64:
+            dokumen_bytes, mime_type = decode_dokumen_base64(dokumen_base64, data.get('dokumenName'))
+
+        with db_cursor() as (conn, cursor):
+            cursor.execute(self.lock_sql, (row_id,))
+            existing = cursor.fetchone()
+            if existing is None:
+                return jsonify({"error": f"{self.table} tidak ditemukan."}), 404
+
+            cursor.execute(self.update_sql, [data.get(name) for name in self.required] +
+                           [data.get('dokumenName'), data.get('tanggalDisetujui'), row_id])
+            # Dokumen hanya diganti bila dikirim ulang; tanpa dokumen baru isi lama dipertahankan
+            old_hash = None
+            if dokumen_base64:
+                dokumen_hash, dokumen_size = acquire_dokumen(cursor, dokumen_bytes, mime_type)
+                cursor.execute(self.replace_dokumen_sql, (dokumen_hash, dokumen_size, mime_type, row_id))
+                old_hash = existing[0]
+                release_dokumen(cursor, old_hash)
+            self.commit(conn, cursor, [old_hash])
+
+        return jsonify({"message": f"{self.table} berhasil diupdate!"}), 200
+
+    @dokumen_endpoint('updating')
+    def patch(self, row_id):
+        """Hanya field yang dikirim yang ditulis; dokumen diganti bila ada dokumen
+        baru. Balasannya baris yang sudah diupdate dengan bentuk yang sama seperti
+        list, sehingga halaman Riwayat cukup mengganti satu baris tabel.
         """
-        cursor.execute(update_query, (
-            tanggal_masuk, departemen, nama_proker, sekretaris,
-            dokumen_name, dokumen_base64, tanggal_disetujui, lpj_id
-        ))
-        conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"error": "LPJ tidak ditemukan."}), 404
+        data, dokumen = self.request_data()
+        unknown = [name for name in data if name not in self.editable]
+        if unknown:
+            return jsonify({"error": f"Field tidak dikenal: {', '.join(unknown)}"}), 400
+        if not data and not dokumen:
+            return jsonify({"error": "Tidak ada field yang diupdate."}), 400
+        required = [name for name in self.required + ('dokumenName',) if name in data and not data[name]]
+        if required:
+            return jsonify({"error": f"Field tidak boleh kosong: {', '.join(required)}"}), 400
+        if 'tanggalDisetujui' in data and data['tanggalDisetujui'] in ('', '-'):
+            data['tanggalDisetujui'] = None # '-' di tabel berarti belum disetujui
+
+        if dokumen:
+            dokumen_content, mime_type = read_dokumen(dokumen, data.get('dokumenName'))
+
+        with db_cursor() as (conn, cursor):
+            cursor.execute(self.lock_sql, (row_id,))
+            existing = cursor.fetchone()
+            if existing is None:
+                return jsonify({"error": f"{self.table} tidak ditemukan."}), 404
+
+            assignments = [f"{name} = %s" for name in data]
+            params = list(data.values())
+            old_hash = None
+            if dokumen:
+                dokumen_hash, dokumen_size = acquire_dokumen(cursor, dokumen_content, mime_type)
+                assignments.append("dokumenHash = %s, dokumenSize = %s, dokumenMime = %s, dokumenBase64 = NULL")
+                params += [dokumen_hash, dokumen_size, mime_type]
+                old_hash = existing[0]
+                release_dokumen(cursor, old_hash)
+            cursor.execute(f"UPDATE {self.table} SET {', '.join(assignments)} WHERE id = %s", params + [row_id])
+            self.commit(conn, cursor, [old_hash])
+
+        with db_cursor(dictionary=True) as (conn, cursor):
+            row = self.fetch_record(cursor, row_id)
+        return jsonify(row), 200
+
+    @dokumen_endpoint('deleting')
+    def delete(self, row_id):
+        with db_cursor() as (conn, cursor):
+            cursor.execute(self.lock_sql, (row_id,))
+            existing = cursor.fetchone()
+            if existing is None:
+                return jsonify({"error": f"{self.table} tidak ditemukan."}), 404
+
+            cursor.execute(self.delete_sql, (row_id,))
+            release_dokumen(cursor, existing[0])
+            self.commit(conn, cursor, [existing[0]])
+
+        return jsonify({"message": f"{self.table} berhasil dihapus!"}), 200
+
+DOKUMEN_RESOURCES = {table: DokumenResource(table, slug, pic_col) for table, slug, pic_col in DOKUMEN_TYPES}
+for resource in DOKUMEN_RESOURCES.values():
+    resource.register(app)
 
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "LPJ berhasil diupdate!"}), 200
+@app.route('/')
+def index():
+    return "Aplikasi backend UKM FKDK berjalan!"
 
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error updating lpj: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+# Statistik pool koneksi (waktu tunggu & jumlah checkout) untuk menentukan DB_POOL_SIZE
+@app.route('/metrics/db_pool', methods=['GET'])
+@require_auth('admin')
+def db_pool_metrics():
+    stats = dict(db_pool.snapshot(), backend=DB_BACKEND)
+    if replica_pool is not None:
+        stats['replica'] = dict(replica_pool.snapshot(), lag=replica_monitor.snapshot())
+    return jsonify(stats), 200
+
+# Statistik cache response list/record (hit rate, entri, byte) untuk menentukan RESPONSE_CACHE_*
+@app.route('/metrics/response_cache', methods=['GET'])
+@require_auth('admin')
+def response_cache_metrics():
+    stats = response_cache.snapshot()
+    stats['table_versions'] = table_versions.snapshot()
+    return jsonify(stats), 200
+
+# Statistik executor bcrypt (antrean, waktu tunggu, penolakan) untuk menentukan BCRYPT_*
+@app.route('/metrics/password_hasher', methods=['GET'])
+@require_auth('admin')
+def password_hasher_metrics():
+    return jsonify(password_hasher.snapshot()), 200
+
+# Statistik cache verifikasi access token dan kunci JWT yang aktif
+@app.route('/metrics/tokens', methods=['GET'])
+@require_auth('admin')
+def token_metrics():
+    return jsonify(token_verifier.snapshot()), 200
+
+# === FRONTEND (HALAMAN & ASET STATIS) ===
+# Halaman di folder berikut dilayani di /app/ dari origin yang sama dengan API, jadi fetch() tidak butuh preflight CORS
+FRONTEND_DIRS = ('Dashboard', 'Login', 'Riwayat', 'User', 'Static')
+FRONTEND_PREFIX = '/app'
+ASSET_MAX_AGE = 365 * 24 * 3600 # Aset ber-fingerprint tidak pernah berubah isinya
+_ASSET_REF = re.compile(r'\b(src|href|data-url)="([^"$:?#]+)"')
+_frontend_bundle = None
+_frontend_lock = threading.Lock()
+
+def _frontend_response(body, mimetype, cache_control):
+    response = app.response_class(body, mimetype=mimetype)
+    response.set_etag(hashlib.sha256(body).hexdigest()[:32], weak=True)
+    response.headers['Cache-Control'] = cache_control
+    entry = CachedResponse(None, response)
+    if entry.compressible:
+        for encoding in RESPONSE_ENCODINGS:
+            entry.encoded_body(encoding)
+    return entry
+
+def build_frontend(root=None):
+    """Petakan path di bawah /app/ -> CachedResponse untuk semua file di FRONTEND_DIRS.
+
+    Aset selain HTML juga tersedia dengan nama ber-fingerprint
+    (FKDK.<hash>.png) yang di-cache selamanya, dan referensi src/href di
+    HTML ditulis ulang ke nama itu. HTML dan nama asli aset selalu
+    divalidasi ulang lewat ETag. Semua versi terkompres dibuat di sini.
+    """
+    root = root or app.root_path
+    files = {}
+    for folder in FRONTEND_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(root, folder)):
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, root).replace(os.sep, '/')] = f.read()
+
+    bundle, fingerprinted = {}, {}
+    for name, body in files.items():
+        if name.endswith('.html'):
+            continue
+        stem, ext = posixpath.splitext(name)
+        fingerprinted[name] = f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        bundle[fingerprinted[name]] = _frontend_response(body, mimetype, f"public, max-age={ASSET_MAX_AGE}, immutable")
+        bundle[name] = _frontend_response(body, mimetype, 'no-cache')
+
+    for name, body in files.items():
+        if not name.endswith('.html'):
+            continue
+        folder = posixpath.dirname(name)
+        def fingerprint(match):
+            ref = match.group(2)
+            target = fingerprinted.get(posixpath.normpath(posixpath.join(folder, ref)))
+            if target is None:
+                return match.group(0)
+            return f'{match.group(1)}="{ref[:len(ref) - len(posixpath.basename(ref))]}{posixpath.basename(target)}"'
+        html = _ASSET_REF.sub(fingerprint, body.decode('utf-8'))
+        bundle[name] = _frontend_response(html.encode('utf-8'), 'text/html', 'no-cache')
+    return bundle
+
+def frontend_bundle():
+    """Bundle frontend worker ini, dibangun saat pertama diminta (dan setiap request dalam mode debug)."""
+    global _frontend_bundle
+    with _frontend_lock:
+        if _frontend_bundle is None or app.debug:
+            _frontend_bundle = build_frontend()
+        return _frontend_bundle
+
+@app.route(f'{FRONTEND_PREFIX}/', methods=['GET'])
+def frontend_index():
+    return redirect(f'{FRONTEND_PREFIX}/Login/Login.html')
+
+@app.route(f'{FRONTEND_PREFIX}/<path:filename>', methods=['GET'])
+def frontend_asset(filename):
+    entry = frontend_bundle().get(filename)
+    if entry is None:
+        abort(404)
+    return entry.to_response()
+
+# === HASH PASSWORD & PEMBATASAN LOGIN ===
+# bcrypt dijalankan di executor terbatas per worker, bukan di thread request, agar lonjakan login
+# tidak menghabiskan CPU yang dibutuhkan endpoint lain
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12)) # Cost factor hash baru; hash lama dengan cost lain diganti saat login
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 2)) # Thread bcrypt per worker
+BCRYPT_QUEUE_SIZE = int(os.getenv('BCRYPT_QUEUE_SIZE', 16)) # Antrean di luar yang sedang dikerjakan; lebih dari ini langsung 503
+BCRYPT_QUEUE_TIMEOUT = float(os.getenv('BCRYPT_QUEUE_TIMEOUT', 2)) # Detik maksimum menunggu giliran sebelum 503
+# Token bucket per worker: "jumlah/menit" dengan kapasitas burst sebesar jumlah itu
+LOGIN_RATE_PER_IP = int(os.getenv('LOGIN_RATE_PER_IP', 20))
+LOGIN_RATE_PER_USERNAME = int(os.getenv('LOGIN_RATE_PER_USERNAME', 5)) # Hanya percobaan yang gagal yang dihitung
+RATE_LIMIT_MAX_KEYS = 10000 # Bucket yang paling lama tidak dipakai dibuang lebih dulu
+# Jumlah reverse proxy tepercaya di depan aplikasi (mis. 1 di Railway). Tanpa ini semua request terlihat datang
+# dari alamat proxy, sehingga limit "per IP" menjadi satu bucket bersama. 0 = X-Forwarded-For diabaikan
+# (header itu bisa dipalsukan klien bila tidak ada proxy yang menimpanya).
+PROXY_FIX_HOPS = int(os.getenv('PROXY_FIX_HOPS', 0))
+if PROXY_FIX_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_HOPS, x_proto=PROXY_FIX_HOPS)
+
+class HasherBusy(Exception):
+    """Executor bcrypt penuh atau giliran tidak datang sebelum BCRYPT_QUEUE_TIMEOUT."""
+
+
+class PasswordHasher:
+    """Executor bcrypt dengan jumlah thread dan panjang antrean terbatas.
+
+    Pekerjaan yang menunggu lebih lama dari queue_timeout dibatalkan sebelum
+    dijalankan, jadi request yang klien-nya mungkin sudah menyerah tidak
+    memakan CPU. Statistik dipakai /metrics/password_hasher.
+    """
+
+    def __init__(self, workers, queue_size, queue_timeout, rounds):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {'hashes': 0, 'verifies': 0, 'rehashes': 0, 'rejected': 0, 'expired': 0,
+                       'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self._stats['rejected'] += 1
+                raise HasherBusy()
+            self._pending += 1
+        queued_at = time.monotonic()
+
+        def job():
+            try:
+                waited = time.monotonic() - queued_at
+                with self._lock:
+                    self._stats['wait_ms_total'] += waited * 1000
+                    self._stats['wait_ms_max'] = max(self._stats['wait_ms_max'], waited * 1000)
+                    if waited > self.queue_timeout:
+                        self._stats['expired'] += 1
+                        raise HasherBusy()
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+        return self._executor.submit(job).result()
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password, bcrypt.gensalt(self.rounds)).decode()
+
+    def hash(self, password):
+        """Hash bcrypt (str) untuk password baru. Panjang password (maks. 72 byte) dicek pemanggil."""
+        with self._lock:
+            self._stats['hashes'] += 1
+        return self._run(self._hash, password.encode())
+
+    def _verify(self, password, hashed):
+        try:
+            if not bcrypt.checkpw(password, hashed.encode()):
+                return False, None
+        except ValueError: # Hash rusak atau password terlalu panjang
+            return False, None
+        if self.cost(hashed) == self.rounds:
+            return True, None
+        return True, self._hash(password)
+
+    def verify(self, password, hashed):
+        """(cocok?, hash baru atau None). Hash baru dibuat di giliran yang sama bila cost hash lama berbeda."""
+        with self._lock:
+            self._stats['verifies'] += 1
+        ok, rehashed = self._run(self._verify, password.encode(), hashed)
+        if rehashed:
+            with self._lock:
+                self._stats['rehashes'] += 1
+        return ok, rehashed
+
+    @staticmethod
+    def cost(hashed):
+        try:
+            return int(hashed.split('$')[2])
+        except (IndexError, ValueError):
+            return None
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+        runs = stats['verifies'] + stats['hashes'] - stats['rejected'] # Termasuk yang kedaluwarsa di antrean
+        stats['wait_ms_avg'] = round(stats.pop('wait_ms_total') / runs, 2) if runs > 0 else 0.0
+        stats['wait_ms_max'] = round(stats['wait_ms_max'], 2)
+        stats.update(workers=self.workers, queue_size=self.queue_size, queue_timeout=self.queue_timeout,
+                     rounds=self.rounds)
+        return stats
+
+password_hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_QUEUE_SIZE, BCRYPT_QUEUE_TIMEOUT, BCRYPT_ROUNDS)
+
+class TokenBucketLimiter:
+    """Token bucket per kunci (IP atau username): per_minute token per menit, kapasitas per_minute."""
+
+    def __init__(self, per_minute, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """0 bila token diambil, selain itu detik sampai token berikutnya tersedia."""
+        if not self.capacity:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / self.rate
+
+    def refund(self, key):
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.capacity, tokens + 1), updated)
+
+login_ip_limiter = TokenBucketLimiter(LOGIN_RATE_PER_IP)
+login_username_limiter = TokenBucketLimiter(LOGIN_RATE_PER_USERNAME)
+
+def too_many_attempts(retry_after):
+    response = jsonify({"error": "Terlalu banyak percobaan, coba lagi nanti."})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+def hasher_busy():
+    response = jsonify({"error": "Server sedang sibuk, coba lagi sebentar."})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
-@app.route('/delete_lpj/<int:lpj_id>', methods=['DELETE'])
-def delete_lpj(lpj_id):
+# === ENDPOINT AUTH ===
+# Register
+@app.route('/register', methods=['POST'])
+def register():
+    retry_after = login_ip_limiter.take(request.remote_addr)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    data = request.get_json()
+    username = data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+    if not all([username, email, password]):
+        return jsonify({"error": "Lengkapi semua kolom."}), 400
+    # bcrypt 4.x memotong password > 72 byte tanpa error, jadi dicek di sini seperti parse_users_csv
+    if len(password.encode()) > 72:
+        return jsonify({"error": "Password terlalu panjang (maksimal 72 byte)."}), 400
+    with db_cursor() as (conn, cursor):
+        cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+        if cursor.fetchone():
+            return jsonify({"error": "Username sudah digunakan."}), 409
+    # Hash dibuat tanpa menahan koneksi pool
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM LPJ WHERE id = %s", (lpj_id,))
+        hashed = password_hasher.hash(password)
+    except HasherBusy:
+        return hasher_busy()
+    with db_cursor() as (conn, cursor):
+        try:
+            cursor.execute(USER_INSERT_SQL, (username, email, hashed))
+        except mysql.connector.IntegrityError as err:
+            if err.errno != ER_DUP_ENTRY:
+                raise
+            return jsonify({"error": "Username sudah digunakan."}), 409 # Didaftarkan request lain setelah pengecekan
+        touch_table(cursor, 'users')
         conn.commit()
+        mark_table_changed('users')
+    return jsonify({"message": "Registrasi berhasil!"}), 201
 
-        if cursor.rowcount == 0:
-            return jsonify({"error": "LPJ tidak ditemukan."}), 404
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "LPJ berhasil dihapus!"}), 200
+# Login
+@app.route('/login', methods=['POST'])
+def login():
+    retry_after = login_ip_limiter.take(request.remote_addr)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    data = request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+    if not username or not password:
+        return jsonify({"error": "Login gagal"}), 401
+    retry_after = login_username_limiter.take(username)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    if username == "fkdk" and password == "janissary":
+        login_username_limiter.refund(username)
+        return jsonify({"message": "Login admin berhasil", "role": "admin", **issue_tokens(username, 'admin')}), 200
+    with db_cursor(dictionary=True) as (conn, cursor):
+        cursor.execute("SELECT username, password_hash FROM users WHERE username = %s", (username,))
+        user = cursor.fetchone()
+    if not user:
+        return jsonify({"error": "Login gagal"}), 401
+    try:
+        ok, rehashed = password_hasher.verify(password, user['password_hash'])
+    except HasherBusy:
+        login_username_limiter.refund(username) # Bukan percobaan yang gagal
+        return hasher_busy()
+    if not ok:
+        return jsonify({"error": "Login gagal"}), 401
+    login_username_limiter.refund(username)
+    if rehashed:
+        # Cost factor berubah: simpan hash baru, kecuali password sudah diganti di antaranya
+        with db_cursor() as (conn, cursor):
+            cursor.execute("UPDATE users SET password_hash = %s WHERE username = %s AND password_hash = %s",
+                           (rehashed, user['username'], user['password_hash']))
+            touch_table(cursor, 'users')
+            conn.commit()
+            mark_table_changed('users')
+    return jsonify({"message": "Login berhasil", "role": "user", "username": user['username'],
+                    **issue_tokens(user['username'], 'user')}), 200
+
+# Tukar refresh token dengan pasangan token baru (refresh token lama tetap berlaku sampai kedaluwarsa)
+@app.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    retry_after = login_ip_limiter.take(request.remote_addr)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    data = request.get_json(silent=True) or {}
+    try:
+        claims = token_verifier.verify(str(data.get('refresh_token', '')), token_type='refresh')
+    except jwt.InvalidTokenError:
+        return _auth_error("Refresh token tidak valid atau sudah kedaluwarsa.", 401)
+    if claims.get('role') == 'user':
+        # Akun yang sudah dihapus tidak bisa memperpanjang sesinya
+        with db_cursor() as (conn, cursor):
+            cursor.execute("SELECT id FROM users WHERE username = %s", (claims['sub'],))
+            if not cursor.fetchone():
+                return _auth_error("Akun tidak ditemukan.", 401)
+    return jsonify(issue_tokens(claims['sub'], claims['role'])), 200
+
+# === REGISTRASI USER MASSAL ===
+# Satu angkatan anggota didaftarkan sekaligus dari CSV berheader username,email,password
+BULK_USERS_MAX_ROWS = int(os.getenv('BULK_USERS_MAX_ROWS', 5000))
+BULK_USERS_BATCH = 500 # Baris per INSERT multi-baris (dan per commit)
+# Thread bcrypt POST /users/bulk per worker, dipakai bersama semua impor yang berjalan. Terpisah dari
+# password_hasher agar impor besar tidak mengantrekan login, dan default-nya hanya seperempat core
+BULK_HASH_WORKERS = int(os.getenv('BULK_HASH_WORKERS', max(1, (os.cpu_count() or 1) // 4)))
+USER_INSERT_SQL = "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)"
+ER_DUP_ENTRY = 1062
+
+def ensure_users_schema(cursor):
+    """Indeks unik users.username. Gagal bila tabel sudah berisi username ganda (harus dibereskan manual)."""
+    if DB_BACKEND == 'sqlite':
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_users_username ON users (username)")
+        return
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'username'
+          AND SEQ_IN_INDEX = 1 AND NON_UNIQUE = 0
+    """)
+    if not cursor.fetchall():
+        cursor.execute("ALTER TABLE users ADD UNIQUE INDEX uq_users_username (username)")
+
+def _hash_password(password, rounds):
+    # Fungsi tingkat modul agar bisa dijalankan di ProcessPoolExecutor
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def parse_users_csv(text):
+    """(baris valid, baris ditolak) dari isi CSV; ValueError bila header salah atau baris terlalu banyak."""
+    reader = csv.DictReader(StringIO(text))
+    missing = {'username', 'email', 'password'} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Kolom CSV kurang: {', '.join(sorted(missing))}.")
+    valid, invalid, seen = [], [], set()
+    for row in reader:
+        if len(valid) + len(invalid) >= BULK_USERS_MAX_ROWS:
+            raise ValueError(f"CSV berisi lebih dari {BULK_USERS_MAX_ROWS} baris.")
+        username, email = (row.get('username') or '').strip(), (row.get('email') or '').strip()
+        password = row.get('password') or ''
+        entry = {'line': reader.line_num, 'username': username}
+        if not all([username, email, password]):
+            invalid.append(dict(entry, error="Lengkapi semua kolom."))
+        elif len(password.encode()) > 72:
+            invalid.append(dict(entry, error="Password terlalu panjang (maksimal 72 byte)."))
+        elif username.lower() in seen: # Kolasi MySQL default tidak membedakan huruf besar/kecil
+            invalid.append(dict(entry, error="Username muncul lebih dari sekali di CSV."))
+        else:
+            seen.add(username.lower())
+            valid.append(dict(entry, email=email, password=password))
+    return valid, invalid
+
+def import_users(rows, executor, rounds=BCRYPT_ROUNDS):
+    """Daftarkan baris hasil parse_users_csv. Mengembalikan (jumlah dibuat, daftar konflik).
+
+    Username yang sudah ada disaring dulu agar bcrypt tidak dijalankan
+    percuma; hash dibuat paralel di executor, lalu disimpan dengan
+    executemany per BULK_USERS_BATCH baris. Bila INSERT multi-baris
+    bentrok dengan indeks unik (username didaftarkan di antaranya), batch
+    itu diulang per baris untuk menemukan konfliknya.
+    """
+    existing = set()
+    with db_cursor() as (conn, cursor):
+        for start in range(0, len(rows), BULK_USERS_BATCH):
+            names = [row['username'] for row in rows[start:start + BULK_USERS_BATCH]]
+            cursor.execute(f"SELECT username FROM users WHERE username IN ({', '.join(['%s'] * len(names))})", names)
+            existing.update(name.lower() for (name,) in cursor.fetchall())
+    conflicts = [{'line': row['line'], 'username': row['username'], 'error': "Username sudah digunakan."}
+                 for row in rows if row['username'].lower() in existing]
+    rows = [row for row in rows if row['username'].lower() not in existing]
+    hashes = executor.map(_hash_password, [row['password'] for row in rows], itertools.repeat(rounds), chunksize=8)
+    params = [(row['username'], row['email'], hashed) for row, hashed in zip(rows, hashes)]
+
+    created = 0
+    with db_cursor() as (conn, cursor):
+        for start in range(0, len(params), BULK_USERS_BATCH):
+            batch = params[start:start + BULK_USERS_BATCH]
+            try:
+                cursor.executemany(USER_INSERT_SQL, batch)
+                created += len(batch)
+            except mysql.connector.IntegrityError as err:
+                if err.errno != ER_DUP_ENTRY:
+                    raise
+                for row, values in zip(rows[start:start + BULK_USERS_BATCH], batch):
+                    try:
+                        cursor.execute(USER_INSERT_SQL, values)
+                        created += 1
+                    except mysql.connector.IntegrityError as err:
+                        if err.errno != ER_DUP_ENTRY:
+                            raise
+                        conflicts.append({'line': row['line'], 'username': row['username'],
+                                          'error': "Username sudah digunakan."})
+            touch_table(cursor, 'users')
+            conn.commit()
+        mark_table_changed('users')
+    conflicts.sort(key=lambda conflict: conflict['line'])
+    return created, conflicts
+
+# bcrypt melepas GIL, jadi thread sudah berjalan paralel tanpa mem-fork worker gunicorn
+bulk_hash_executor = ThreadPoolExecutor(max_workers=BULK_HASH_WORKERS, thread_name_prefix='bulk-bcrypt')
+
+# Registrasi massal dari CSV (file multipart "file" atau body text/csv)
+@app.route('/users/bulk', methods=['POST'])
+@require_auth('admin')
+def bulk_register():
+    upload = request.files.get('file')
+    data = upload.read() if upload else request.get_data()
+    try:
+        valid, invalid = parse_users_csv(data.decode('utf-8-sig'))
+    except UnicodeDecodeError:
+        return jsonify({"error": "CSV harus berupa teks UTF-8."}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        created, conflicts = import_users(valid, bulk_hash_executor)
     except mysql.connector.Error as err:
         print(f"MySQL Error: {err}")
         return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error deleting lpj: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+    return jsonify({"created": created, "conflicts": conflicts, "invalid": invalid}), 200
+
+@app.cli.command('import-users')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--processes', default=os.cpu_count() or 1, show_default=True, help='Jumlah proses bcrypt.')
+def import_users_command(csv_file, processes):
+    """Daftarkan user dari CSV berheader username,email,password."""
+    try:
+        valid, invalid = parse_users_csv(csv_file.read())
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        created, conflicts = import_users(valid, executor)
+    for problem in sorted(invalid + conflicts, key=lambda problem: problem['line']):
+        click.echo(f"Baris {problem['line']} ({problem['username'] or '-'}): {problem['error']}")
+    click.echo(f"{created} user dibuat, {len(conflicts)} konflik, {len(invalid)} tidak valid.")
 
 # 1. Menambahkan Data Persuratan Baru (POST)
 @app.route('/persuratan', methods=['POST'])
+@require_auth()
 def add_persuratan():
     data = request.json
     tanggal_masuk = data.get('tanggalMasuk')
@@ -470,61 +3268,97 @@ def add_persuratan():
     tanggal_approve = data.get('tanggalApprove') # Akan jadi '-' atau tanggal
     aktivitas = data.get('aktivitas') # Akan jadi '-'
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
-    cursor = conn.cursor()
     try:
-        query = """
-        INSERT INTO persuratan (tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve, aktivitas)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        # Konversi '-' menjadi None untuk tanggal_approve jika itu adalah string '-'
-        tanggal_approve_db = None if tanggal_approve == '-' else tanggal_approve
-        aktivitas_db = None if aktivitas == '-' else aktivitas
-
-        cursor.execute(query, (tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve_db, aktivitas_db))
-        conn.commit()
-        return jsonify({"message": "Data persuratan berhasil disimpan!"}), 201
+        with db_cursor() as (conn, cursor):
+            query = """
+            INSERT INTO persuratan (tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve, aktivitas)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """
+            # Konversi '-' menjadi None untuk tanggal_approve jika itu adalah string '-'
+            tanggal_approve_db = None if tanggal_approve == '-' else tanggal_approve
+            aktivitas_db = None if aktivitas == '-' else aktivitas
+
+            cursor.execute(query, (tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve_db, aktivitas_db))
+            touch_table(cursor, 'persuratan')
+            conn.commit()
+            mark_table_changed('persuratan')
+            return jsonify({"message": "Data persuratan berhasil disimpan!"}), 201
     except mysql.connector.Error as err:
         print(f"Error saving data: {err}")
         return jsonify({"message": f"Error saving data: {err}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 # 2. Mendapatkan Semua Data Persuratan (GET)
+PERSURATAN_FIELDS = "id, tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve, aktivitas"
+
+def format_persuratan_row(row):
+    # Format tanggal agar konsisten jika diperlukan, meskipun MySQL DATE sudah YYYY-MM-DD
+    if row['tanggal_masuk']:
+        row['tanggal_masuk'] = row['tanggal_masuk'].strftime('%Y-%m-%d')
+    if row['tanggal_approve']:
+        row['tanggal_approve'] = row['tanggal_approve'].strftime('%Y-%m-%d')
+    else:
+        row['tanggal_approve'] = '-' # Jika None di DB, tampilkan '-'
+    if not row['aktivitas']:
+        row['aktivitas'] = '-' # Jika None di DB, tampilkan '-'
+    return row
+
 @app.route('/persuratan', methods=['GET'])
+@cached_response('persuratan')
 def get_persuratan():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
-    cursor = conn.cursor(dictionary=True) # Mengambil hasil sebagai dictionary
+    # Filter: instansi, jenis_surat, dari, sampai, status=approved|pending; ?ids=1,5,9 untuk beberapa id sekaligus
     try:
-        cursor.execute("SELECT id, tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve, aktivitas FROM persuratan ORDER BY tanggal_masuk DESC")
-        data = cursor.fetchall()
-        
-        # Format tanggal agar konsisten jika diperlukan, meskipun MySQL DATE sudah YYYY-MM-DD
-        for row in data:
-            if row['tanggal_masuk']:
-                row['tanggal_masuk'] = row['tanggal_masuk'].strftime('%Y-%m-%d')
-            if row['tanggal_approve']:
-                row['tanggal_approve'] = row['tanggal_approve'].strftime('%Y-%m-%d')
+        clauses, params = build_filters('tanggal_masuk', {'instansi': 'instansi', 'jenis_surat': 'jenis_surat'}, 'tanggal_approve')
+        etag, changed_at = list_etag('persuratan')
+        unchanged = not_modified(etag, changed_at, weak=True)
+        if unchanged is not None:
+            return unchanged
+        with db_cursor(dictionary=True) as (conn, cursor): # Mengambil hasil sebagai dictionary
+            ids = parse_ids()
+            if ids:
+                data = fetch_by_ids(cursor, 'persuratan', PERSURATAN_FIELDS, ids, clauses, params)
+                next_cursor, total = None, len(data)
             else:
-                row['tanggal_approve'] = '-' # Jika None di DB, tampilkan '-'
-            if not row['aktivitas']:
-                row['aktivitas'] = '-' # Jika None di DB, tampilkan '-'
+                data, next_cursor, total = fetch_page(cursor, 'persuratan', PERSURATAN_FIELDS, 'tanggal_masuk', clauses, params)
 
-        return jsonify(data), 200
+            return page_response([format_persuratan_row(row) for row in data], next_cursor, total, etag, changed_at), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except mysql.connector.Error as err:
+        print(f"Error fetching data: {err}")
+        return jsonify({"message": f"Error fetching data: {err}"}), 500
+
+@app.route('/persuratan/<int:persuratan_id>', methods=['GET'])
+@cached_response('persuratan')
+def get_persuratan_record(persuratan_id):
+    # Satu record lewat primary key; ?include=aktivitas menambahkan isi file aktivitas (data URI)
+    try:
+        include = parse_include('aktivitas')
+        etag, changed_at = list_etag('persuratan')
+        unchanged = not_modified(etag, changed_at, weak=True)
+        if unchanged is not None:
+            return unchanged
+        with db_cursor(dictionary=True) as (conn, cursor):
+            rows = fetch_by_ids(cursor, 'persuratan', PERSURATAN_FIELDS, [persuratan_id])
+        if not rows:
+            return jsonify({"message": "Data persuratan tidak ditemukan."}), 404
+
+        row = format_persuratan_row(rows[0])
+        if include:
+            row['aktivitasBase64'] = None
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], row['aktivitas'])
+            if row['aktivitas'] != '-' and os.path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    row['aktivitasBase64'] = f"data:{detect_mime_type(row['aktivitas'])};base64,{base64.b64encode(f.read()).decode()}"
+        return record_response(row, etag, changed_at), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except mysql.connector.Error as err:
         print(f"Error fetching data: {err}")
         return jsonify({"message": f"Error fetching data: {err}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 # 3. Memperbarui Data Persuratan (PUT)
 @app.route('/persuratan/<int:persuratan_id>', methods=['PUT'])
+@require_auth('admin')
 def update_persuratan(persuratan_id):
     # Menggunakan request.form karena ada file upload
     tanggal_masuk = request.form.get('tanggalMasuk')
@@ -538,154 +3372,156 @@ def update_persuratan(persuratan_id):
     # Konversi '-' menjadi None untuk tanggal_approve
     tanggal_approve_db = None if tanggal_approve_str == '-' else tanggal_approve_str
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
-    cursor = conn.cursor()
-
     old_aktivitas_filename = None
-    try:
-        # Dapatkan nama file aktivitas yang lama (jika ada) untuk dihapus
-        cursor.execute("SELECT aktivitas FROM persuratan WHERE id = %s", (persuratan_id,))
-        result = cursor.fetchone()
-        if result:
-            old_aktivitas_filename = result[0]
 
-        aktivitas_db = None
+    try:
+        with db_cursor() as (conn, cursor):
+            # Dapatkan nama file aktivitas yang lama (jika ada) untuk dihapus
+            cursor.execute("SELECT aktivitas FROM persuratan WHERE id = %s", (persuratan_id,))
+            result = cursor.fetchone()
+            if result:
+                old_aktivitas_filename = result[0]
 
-        if remove_existing_file_flag:
-            # Jika user memilih '-', set aktivitas ke None dan hapus file fisik
             aktivitas_db = None
-            if old_aktivitas_filename and old_aktivitas_filename != '-':
-                file_path_to_delete = os.path.join(app.config['UPLOAD_FOLDER'], old_aktivitas_filename)
-                if os.path.exists(file_path_to_delete):
-                    os.remove(file_path_to_delete)
-                    print(f"Deleted old file: {file_path_to_delete}")
-                else:
-                    print(f"Old file not found for deletion: {file_path_to_delete}")
-        elif 'aktivitasFile' in request.files:
-            # Jika ada file baru diupload
-            file = request.files['aktivitasFile']
-            if file.filename != '':
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                aktivitas_db = filename # Simpan nama file baru di DB
-
-                # Hapus file lama jika ada dan berbeda dengan yang baru
-                if old_aktivitas_filename and old_aktivitas_filename != '-' and old_aktivitas_filename != filename:
+
+            if remove_existing_file_flag:
+                # Jika user memilih '-', set aktivitas ke None dan hapus file fisik
+                aktivitas_db = None
+                if old_aktivitas_filename and old_aktivitas_filename != '-':
                     file_path_to_delete = os.path.join(app.config['UPLOAD_FOLDER'], old_aktivitas_filename)
                     if os.path.exists(file_path_to_delete):
                         os.remove(file_path_to_delete)
                         print(f"Deleted old file: {file_path_to_delete}")
                     else:
                         print(f"Old file not found for deletion: {file_path_to_delete}")
+            elif 'aktivitasFile' in request.files:
+                # Jika ada file baru diupload
+                file = request.files['aktivitasFile']
+                if file.filename != '':
+                    filename = secure_filename(file.filename)
+                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                    file.save(file_path)
+                    aktivitas_db = filename # Simpan nama file baru di DB
+
+                    # Hapus file lama jika ada dan berbeda dengan yang baru
+                    if old_aktivitas_filename and old_aktivitas_filename != '-' and old_aktivitas_filename != filename:
+                        file_path_to_delete = os.path.join(app.config['UPLOAD_FOLDER'], old_aktivitas_filename)
+                        if os.path.exists(file_path_to_delete):
+                            os.remove(file_path_to_delete)
+                            print(f"Deleted old file: {file_path_to_delete}")
+                        else:
+                            print(f"Old file not found for deletion: {file_path_to_delete}")
+                else:
+                    # Jika input file kosong, gunakan nama file aktivitas yang ada sebelumnya (jika ada)
+                    aktivitas_db = old_aktivitas_filename if old_aktivitas_filename and old_aktivitas_filename != '-' else None
             else:
-                # Jika input file kosong, gunakan nama file aktivitas yang ada sebelumnya (jika ada)
+                # Jika tidak ada file baru diupload dan tidak ada instruksi untuk menghapus,
+                # gunakan nama file aktivitas yang ada sebelumnya dari database
                 aktivitas_db = old_aktivitas_filename if old_aktivitas_filename and old_aktivitas_filename != '-' else None
-        else:
-            # Jika tidak ada file baru diupload dan tidak ada instruksi untuk menghapus,
-            # gunakan nama file aktivitas yang ada sebelumnya dari database
-            aktivitas_db = old_aktivitas_filename if old_aktivitas_filename and old_aktivitas_filename != '-' else None
 
 
-        query = """
-        UPDATE persuratan
-        SET tanggal_masuk = %s, jenis_surat = %s, nama = %s, instansi = %s, tanggal_approve = %s, aktivitas = %s
-        WHERE id = %s
-        """
-        cursor.execute(query, (tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve_db, aktivitas_db, persuratan_id))
-        conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"message": "Data not found or no changes made"}), 404
-        return jsonify({"message": "Data persuratan berhasil diperbarui!"}), 200
+            query = """
+            UPDATE persuratan
+            SET tanggal_masuk = %s, jenis_surat = %s, nama = %s, instansi = %s, tanggal_approve = %s, aktivitas = %s
+            WHERE id = %s
+            """
+            cursor.execute(query, (tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve_db, aktivitas_db, persuratan_id))
+            # rowcount dibaca sebelum touch_table, yang menjalankan query-nya sendiri
+            if cursor.rowcount == 0:
+                return jsonify({"message": "Data not found or no changes made"}), 404
+            touch_table(cursor, 'persuratan')
+            conn.commit()
+            mark_table_changed('persuratan')
+            return jsonify({"message": "Data persuratan berhasil diperbarui!"}), 200
     except mysql.connector.Error as err:
         print(f"Error updating data: {err}")
         return jsonify({"message": f"Error updating data: {err}"}), 500
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         print(f"Unexpected error during update: {e}")
         return jsonify({"message": f"Unexpected error: {e}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 # 4. Menghapus Data Persuratan (DELETE)
 @app.route('/persuratan/<int:persuratan_id>', methods=['DELETE'])
+@require_auth('admin')
 def delete_persuratan(persuratan_id):
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
-    cursor = conn.cursor()
-
     try:
-        # Dapatkan nama file aktivitas yang terkait sebelum dihapus
-        cursor.execute("SELECT aktivitas FROM persuratan WHERE id = %s", (persuratan_id,))
-        result = cursor.fetchone()
-        file_to_delete = None
-        if result and result[0]:
-            file_to_delete = result[0]
-
-        query = "DELETE FROM persuratan WHERE id = %s"
-        cursor.execute(query, (persuratan_id,))
-        conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"message": "Data not found"}), 404
+        with db_cursor() as (conn, cursor):
+            # Dapatkan nama file aktivitas yang terkait sebelum dihapus
+            cursor.execute("SELECT aktivitas FROM persuratan WHERE id = %s", (persuratan_id,))
+            result = cursor.fetchone()
+            file_to_delete = None
+            if result and result[0]:
+                file_to_delete = result[0]
+
+            query = "DELETE FROM persuratan WHERE id = %s"
+            cursor.execute(query, (persuratan_id,))
+            if cursor.rowcount == 0:
+                return jsonify({"message": "Data not found"}), 404
+            touch_table(cursor, 'persuratan')
+            conn.commit()
+            mark_table_changed('persuratan')
         
-        # Hapus file fisik jika ada
-        if file_to_delete:
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_to_delete)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"Deleted associated file: {file_path}")
-            else:
-                print(f"Associated file not found: {file_path}")
+            # Hapus file fisik jika ada
+            if file_to_delete:
+                file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_to_delete)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    print(f"Deleted associated file: {file_path}")
+                else:
+                    print(f"Associated file not found: {file_path}")
 
-        return jsonify({"message": "Data persuratan berhasil dihapus!"}), 200
+            return jsonify({"message": "Data persuratan berhasil dihapus!"}), 200
     except mysql.connector.Error as err:
         print(f"Error deleting data: {err}")
         return jsonify({"message": f"Error deleting data: {err}"}), 500
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         print(f"Unexpected error during deletion: {e}")
         return jsonify({"message": f"Unexpected error: {e}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 # 5. Mengunduh File Aktivitas (GET)
 @app.route('/download_file/<int:persuratan_id>', methods=['GET'])
 def download_file(persuratan_id):
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
-    cursor = conn.cursor()
-
     try:
-        cursor.execute("SELECT aktivitas FROM persuratan WHERE id = %s", (persuratan_id,))
-        result = cursor.fetchone()
+        with db_cursor() as (conn, cursor):
+            cursor.execute("SELECT aktivitas FROM persuratan WHERE id = %s", (persuratan_id,))
+            result = cursor.fetchone()
         
-        if result and result[0]:
-            filename = result[0]
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            if result and result[0]:
+                filename = result[0]
+                file_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], filename))
             
-            if os.path.exists(file_path):
-                return send_file(file_path, as_attachment=True, download_name=filename)
+                if os.path.exists(file_path):
+                    return send_ranged(file_path, None, filename)
+                else:
+                    return jsonify({"message": "File not found on server."}), 404
             else:
-                return jsonify({"message": "File not found on server."}), 404
-        else:
-            return jsonify({"message": "No file associated with this record."}), 404
+                return jsonify({"message": "No file associated with this record."}), 404
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         print(f"Error during file download: {e}")
         return jsonify({"message": f"Error downloading file: {e}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/inventaris', methods=['POST'])
+@require_auth()
 def add_inventaris():
-    """Adds a new inventaris entry to the database."""
-    data = request.json
+    """Adds a new inventaris entry to the database.
+
+    Accepts the JSON body (bukti as {base64, name}) or multipart/form-data
+    with the proof uploaded as the "bukti" file field.
+    """
+    if request.is_json:
+        data = request.json
+        bukti = data.get('bukti') or {}
+        bukti_source = bukti.get('base64')
+        bukti_name = bukti.get('name')
+    else:
+        data, bukti_source = binary_upload('bukti', 'buktiName')
+        bukti_name = data.get('buktiName')
     nama = data.get('nama')
     instansi = data.get('instansi')
     tanggal_masuk = datetime.strptime(data.get('suratMasuk'), '%Y-%m-%d').date() if data.get('suratMasuk') else None
@@ -697,76 +3533,138 @@ def add_inventaris():
     keterangan_dp_lunas = data.get('status')
     # --- End penambahan ---
 
-    bukti_base64 = data.get('bukti', {}).get('base64')
-    bukti_name = data.get('bukti', {}).get('name')
-
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
+    bukti_content = bukti_mime = None
+    if bukti_source:
+        try:
+            bukti_content, bukti_mime = read_dokumen(bukti_source, bukti_name)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
 
-    cursor = conn.cursor()
     try:
-        query = """
-        INSERT INTO inventaris (nama, instansi, tanggal_surat_masuk, tanggal_pengambilan, tanggal_pengembalian, masa_sewa, keterangan_dp_lunas, bukti_pembayaran_base64, bukti_pembayaran_name)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (nama, instansi, tanggal_masuk, tanggal_ambil, tanggal_kembali, masa_sewa, keterangan_dp_lunas, bukti_base64, bukti_name))
-        conn.commit()
-        return jsonify({"message": "Inventaris data added successfully!"}), 201
+        with db_cursor() as (conn, cursor):
+            bukti_hash = bukti_size = None
+            if bukti_content is not None:
+                bukti_hash, bukti_size = acquire_dokumen(cursor, bukti_content, bukti_mime)
+            query = """
+            INSERT INTO inventaris (nama, instansi, tanggal_surat_masuk, tanggal_pengambilan, tanggal_pengembalian, masa_sewa, keterangan_dp_lunas, bukti_pembayaran_name, bukti_pembayaran_hash, bukti_pembayaran_size, bukti_pembayaran_mime)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            cursor.execute(query, (nama, instansi, tanggal_masuk, tanggal_ambil, tanggal_kembali, masa_sewa, keterangan_dp_lunas, bukti_name, bukti_hash, bukti_size, bukti_mime))
+            touch_table(cursor, 'inventaris')
+            conn.commit()
+            mark_table_changed('inventaris')
+            return jsonify({"message": "Inventaris data added successfully!"}), 201
     except mysql.connector.Error as err:
-        conn.rollback()
         return jsonify({"message": f"Error: {err}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
+
+def format_inventaris_row(row, names):
+    # Format tanggal menjadi string YYYY-MM-DD
+    for col in ('tanggal_surat_masuk', 'tanggal_pengambilan', 'tanggal_pengembalian'):
+        if col in row:
+            row[col] = row[col].strftime('%Y-%m-%d') if row[col] else None
+
+    # Reconstruct bukti object for frontend
+    if 'bukti' in names:
+        bukti = None
+        if row['bukti_ada'] and row['bukti_pembayaran_name']:
+            bukti = {
+                'url': url_for('download_bukti', inventaris_id=row['bukti_id'], _external=True),
+                'name': row['bukti_pembayaran_name'],
+                'size': row['bukti_pembayaran_size']
+            }
+        row['bukti'] = bukti
+
+        # Hapus kolom bantu dari objek yang dikembalikan ke frontend
+        del row['bukti_id']
+        del row['bukti_pembayaran_name']
+        del row['bukti_pembayaran_size']
+        del row['bukti_ada']
+    return row
 
 @app.route('/inventaris', methods=['GET'])
+@cached_response('inventaris')
 def get_inventaris():
     """Retrieves all inventaris entries from the database."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
+    # Filter: instansi, status (DP/Lunas), dari, sampai; ?ids=1,5,9 untuk beberapa id sekaligus
+    try:
+        names, select_list = parse_fields(INVENTARIS_LIST_FIELDS)
+        clauses, params = build_filters('tanggal_surat_masuk', {'instansi': 'instansi', 'status': 'keterangan_dp_lunas'})
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    try:
+        etag, changed_at = list_etag('inventaris')
+        unchanged = not_modified(etag, changed_at, weak=True)
+        if unchanged is not None:
+            return unchanged
+        with db_cursor(dictionary=True) as (conn, cursor): # Return results as dictionaries
+            # Isi bukti tidak ikut diambil; frontend memuatnya lewat /download_bukti
+            ids = parse_ids()
+            if ids:
+                rows = fetch_by_ids(cursor, 'inventaris', select_list, ids, clauses, params)
+                next_cursor, total = None, len(rows)
+            else:
+                rows, next_cursor, total = fetch_page(cursor, 'inventaris', select_list, 'tanggal_surat_masuk', clauses, params)
+            inventaris_list = [format_inventaris_row(row, names) for row in rows]
+            return page_response(inventaris_list, next_cursor, total, etag, changed_at), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except mysql.connector.Error as err:
+        return jsonify({"message": f"Error: {err}"}), 500
+
+@app.route('/inventaris/<int:inventaris_id>', methods=['GET'])
+@cached_response('inventaris')
+def get_inventaris_record(inventaris_id):
+    """Retrieves one inventaris entry by primary key.
 
-    cursor = conn.cursor(dictionary=True) # Return results as dictionaries
+    Supports ?fields= like the list; ?include=bukti adds the proof as bukti.base64 (data URI).
+    """
     try:
-        query = "SELECT id, nama, instansi, tanggal_surat_masuk, tanggal_pengambilan, tanggal_pengembalian, masa_sewa, keterangan_dp_lunas, bukti_pembayaran_base64, bukti_pembayaran_name FROM inventaris"
-        cursor.execute(query)
-        inventaris_list = []
-        for row in cursor.fetchall():
-            # Format tanggal menjadi string YYYY-MM-DD
-            row['tanggal_surat_masuk'] = row['tanggal_surat_masuk'].strftime('%Y-%m-%d') if row['tanggal_surat_masuk'] else None
-            row['tanggal_pengambilan'] = row['tanggal_pengambilan'].strftime('%Y-%m-%d') if row['tanggal_pengambilan'] else None
-            row['tanggal_pengembalian'] = row['tanggal_pengembalian'].strftime('%Y-%m-%d') if row['tanggal_pengembalian'] else None
-            
-            # --- Perubahan utama: Petakan nama kolom database ke nama properti yang diharapkan frontend ---
-            row['masa'] = row['masa_sewa']
-            row['status'] = row['keterangan_dp_lunas']
-            # --- End perubahan ---
-
-            # Reconstruct bukti object for frontend
-            bukti = None
-            if row['bukti_pembayaran_base64'] and row['bukti_pembayaran_name']:
-                bukti = {
-                    'base64': row['bukti_pembayaran_base64'],
-                    'name': row['bukti_pembayaran_name']
-                }
-            row['bukti'] = bukti
-            
-            # Hapus kolom asli dari objek yang dikembalikan ke frontend
-            del row['masa_sewa']
-            del row['keterangan_dp_lunas']
-            del row['bukti_pembayaran_base64']
-            del row['bukti_pembayaran_name']
-            
-            inventaris_list.append(row)
-        return jsonify(inventaris_list), 200
+        names, select_list = parse_fields(INVENTARIS_LIST_FIELDS)
+        include = parse_include('bukti')
+        etag, changed_at = list_etag('inventaris')
+        unchanged = not_modified(etag, changed_at, weak=True)
+        if unchanged is not None:
+            return unchanged
+        with db_cursor(dictionary=True) as (conn, cursor):
+            rows = fetch_by_ids(cursor, 'inventaris', select_list, [inventaris_id])
+        if not rows:
+            return jsonify({"message": "Inventaris data not found."}), 404
+
+        row = format_inventaris_row(rows[0], names)
+        if include and row.get('bukti'):
+            row['bukti']['base64'] = dokumen_data_uri('inventaris', inventaris_id)
+        return record_response(row, etag, changed_at), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except mysql.connector.Error as err:
         return jsonify({"message": f"Error: {err}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
+
+@app.route('/download_bukti/<int:inventaris_id>', methods=['GET'])
+def download_bukti(inventaris_id):
+    """Sends the bukti pembayaran of an inventaris entry (inline, so it can be used as <img src>)."""
+    try:
+        with db_cursor(dictionary=True) as (conn, cursor):
+            cursor.execute("SELECT bukti_pembayaran_name, bukti_pembayaran_hash, bukti_pembayaran_mime, bukti_pembayaran_base64 IS NOT NULL AS legacy FROM inventaris WHERE id = %s", (inventaris_id,))
+            row = cursor.fetchone()
+    except mysql.connector.Error as err:
+        return jsonify({"message": f"Error: {err}"}), 500
+
+    if row and row['bukti_pembayaran_hash']:
+        return send_stored_dokumen(row['bukti_pembayaran_hash'],
+                                   row['bukti_pembayaran_mime'] or detect_mime_type(row['bukti_pembayaran_name'] or ''),
+                                   row['bukti_pembayaran_name'], as_attachment=False)
+    # Baris lama yang belum dimigrasikan masih menyimpan base64 di tabel; dialirkan per potongan
+    if row and row['legacy']:
+        try:
+            response = send_legacy_dokumen('inventaris', inventaris_id, row['bukti_pembayaran_name'] or 'bukti', as_attachment=False)
+        except (ValueError, mysql.connector.Error) as e:
+            return jsonify({"message": str(e)}), 500
+        if response is not None:
+            return response
+    return jsonify({"message": "Inventaris data not found."}), 404
 
 @app.route('/inventaris/<int:inventaris_id>', methods=['PUT'])
+@require_auth('admin')
 def update_inventaris(inventaris_id):
     """Updates an existing inventaris entry in the database."""
     data = request.json
@@ -781,429 +3679,649 @@ def update_inventaris(inventaris_id):
     keterangan_dp_lunas = data.get('status')
     # --- End penambahan ---
 
-    bukti_base64 = data.get('bukti', {}).get('base64') if data.get('bukti') else None
-    bukti_name = data.get('bukti', {}).get('name') if data.get('bukti') else None
+    # bukti null -> bukti dihapus; bukti tanpa base64 -> bukti lama dipertahankan
+    bukti = data.get('bukti')
+    bukti_base64 = bukti.get('base64') if bukti else None
+    bukti_name = bukti.get('name') if bukti else None
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
+    bukti_bytes = bukti_mime = None
+    if bukti_base64:
+        try:
+            bukti_bytes, bukti_mime = decode_dokumen_base64(bukti_base64, bukti_name)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
 
-    cursor = conn.cursor()
     try:
-        query = """
-        UPDATE inventaris
-        SET nama = %s, instansi = %s, tanggal_surat_masuk = %s, tanggal_pengambilan = %s, tanggal_pengembalian = %s, masa_sewa = %s, keterangan_dp_lunas = %s, bukti_pembayaran_base64 = %s, bukti_pembayaran_name = %s
-        WHERE id = %s
-        """
-        cursor.execute(query, (nama, instansi, tanggal_masuk, tanggal_ambil, tanggal_kembali, masa_sewa, keterangan_dp_lunas, bukti_base64, bukti_name, inventaris_id))
-        conn.commit()
-        if cursor.rowcount > 0:
+        with db_cursor() as (conn, cursor):
+            cursor.execute("SELECT bukti_pembayaran_hash FROM inventaris WHERE id = %s FOR UPDATE", (inventaris_id,))
+            existing = cursor.fetchone()
+            if existing is None:
+                return jsonify({"message": "Inventaris data not found."}), 404
+
+            query = """
+            UPDATE inventaris
+            SET nama = %s, instansi = %s, tanggal_surat_masuk = %s, tanggal_pengambilan = %s, tanggal_pengembalian = %s, masa_sewa = %s, keterangan_dp_lunas = %s
+            WHERE id = %s
+            """
+            cursor.execute(query, (nama, instansi, tanggal_masuk, tanggal_ambil, tanggal_kembali, masa_sewa, keterangan_dp_lunas, inventaris_id))
+
+            old_hash = None
+            if bukti_bytes is not None or not bukti:
+                bukti_hash = bukti_size = None
+                if bukti_bytes is not None:
+                    bukti_hash, bukti_size = acquire_dokumen(cursor, bukti_bytes, bukti_mime)
+                cursor.execute("""
+                UPDATE inventaris
+                SET bukti_pembayaran_name = %s, bukti_pembayaran_hash = %s, bukti_pembayaran_size = %s, bukti_pembayaran_mime = %s, bukti_pembayaran_base64 = NULL
+                WHERE id = %s
+                """, (bukti_name, bukti_hash, bukti_size, bukti_mime, inventaris_id))
+                old_hash = existing[0]
+                release_dokumen(cursor, old_hash)
+            touch_table(cursor, 'inventaris')
+            conn.commit()
+            mark_table_changed('inventaris')
+            collect_dokumen(conn, cursor, [old_hash])
             return jsonify({"message": "Inventaris data updated successfully!"}), 200
-        else:
-            return jsonify({"message": "Inventaris data not found."}), 404
     except mysql.connector.Error as err:
-        conn.rollback()
         return jsonify({"message": f"Error: {err}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/inventaris/<int:inventaris_id>', methods=['DELETE'])
+@require_auth('admin')
 def delete_inventaris(inventaris_id):
     """Deletes an inventaris entry from the database."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"message": "Database connection failed"}), 500
-
-    cursor = conn.cursor()
     try:
-        query = "DELETE FROM inventaris WHERE id = %s"
-        cursor.execute(query, (inventaris_id,))
-        conn.commit()
-        if cursor.rowcount > 0:
+        with db_cursor() as (conn, cursor):
+            cursor.execute("SELECT bukti_pembayaran_hash FROM inventaris WHERE id = %s FOR UPDATE", (inventaris_id,))
+            existing = cursor.fetchone()
+            if existing is None:
+                return jsonify({"message": "Inventaris data not found."}), 404
+
+            query = "DELETE FROM inventaris WHERE id = %s"
+            cursor.execute(query, (inventaris_id,))
+            release_dokumen(cursor, existing[0])
+            touch_table(cursor, 'inventaris')
+            conn.commit()
+            mark_table_changed('inventaris')
+            collect_dokumen(conn, cursor, [existing[0]])
             return jsonify({"message": "Inventaris data deleted successfully!"}), 200
-        else:
-            return jsonify({"message": "Inventaris data not found."}), 404
     except mysql.connector.Error as err:
-        conn.rollback()
         return jsonify({"message": f"Error: {err}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
-@app.route('/submit_rab', methods=['POST'])
-def submit_rab():
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
-
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        bendahara = data.get('bendahara')
-        dokumen_name = data.get('dokumenName')
-        dokumen_base64 = data.get('dokumenBase64')
-
-        # Validasi minimal
-        if not all([tanggal_masuk, departemen, nama_proker, bendahara, dokumen_name, dokumen_base64]):
-            return jsonify({"error": "Data RAB tidak lengkap. Pastikan semua field terisi, termasuk dokumen."}), 400
-
-        # Hapus "data:mimetype;base64," prefix jika ada
-        if ',' in dokumen_base64:
-            dokumen_base64 = dokumen_base64.split(',')[1]
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        insert_query = """
-        INSERT INTO RAB (tanggalMasuk, departemen, namaProker, bendahara, dokumenName, dokumenBase64)
-        VALUES (%s, %s, %s, %s, %s, %s)
+# === UPLOAD BERTAHAP (RESUMABLE) ===
+# Alur mengikuti gaya tus: POST /uploads membuat sesi, PUT /uploads/<id>/<n> mengirim
+# potongan ke-n (opsional dengan header Upload-Checksum: sha256 <base64>), GET/HEAD
+# /uploads/<id> menanyakan offset yang sudah tersimpan, lalu POST /uploads/<id>/finalize
+# membuat record Proposal/LPJ/RAB/LRA/persuratan dari file yang sudah lengkap.
+UPLOAD_SESSION_DIR = os.path.join(dokumen_store.root, 'uploads') # Satu filesystem dengan dokumen_store agar bisa di-rename
+os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+
+# Field form wajib per tabel tujuan
+UPLOAD_TARGETS = {table: resource.required for table, resource in DOKUMEN_RESOURCES.items()}
+UPLOAD_TARGETS['persuratan'] = ('tanggalMasuk', 'jenisSurat', 'nama', 'instansi')
+UPLOAD_CHECKSUM_ALGORITHMS = ('sha256', 'sha1', 'md5')
+
+class UploadBusy(Exception):
+    """Sesi upload sedang dipakai request lain (mis. potongan yang sama dikirim ulang)."""
+
+
+class UploadSession:
+    """Satu sesi upload bertahap: folder berisi meta.json, file data, dan file lock.
+
+    Offset yang tersimpan di meta.json adalah sumber kebenaran; byte di file
+    data setelah offset itu (sisa potongan yang putus di tengah) dipotong
+    sebelum potongan berikutnya ditulis. Semua perubahan dilakukan di bawah
+    flock sehingga aman dipakai beberapa worker gunicorn sekaligus.
+    """
+
+    _thread_locks = {}
+    _thread_locks_guard = threading.Lock()
+
+    def __init__(self, upload_id):
+        self.id = upload_id
+        self.dir = os.path.join(UPLOAD_SESSION_DIR, upload_id)
+        self.data_path = os.path.join(self.dir, 'data')
+        self.meta_path = os.path.join(self.dir, 'meta.json')
+
+    @classmethod
+    def create(cls, target, filename, size, mime_type):
+        session = cls(secrets.token_hex(16))
+        os.makedirs(session.dir)
+        open(session.data_path, 'wb').close()
+        now = time.time()
+        meta = {
+            'id': session.id,
+            'target': target,
+            'filename': filename,
+            'size': size,
+            'mime': mime_type,
+            'chunkSize': UPLOAD_CHUNK_SIZE,
+            'offset': 0,
+            'createdAt': now,
+            'expiresAt': now + UPLOAD_SESSION_TTL,
+        }
+        session.save(meta)
+        return session, meta
+
+    @classmethod
+    def open(cls, upload_id):
+        """Sesi yang masih berlaku, atau None bila id tidak valid, tidak ada, atau kedaluwarsa."""
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+            return None
+        session = cls(upload_id)
+        meta = session.load()
+        if meta is None or meta['expiresAt'] < time.time():
+            return None
+        return session
+
+    def load(self):
+        try:
+            with open(self.meta_path) as meta_file:
+                return json.load(meta_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, meta):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp_path, self.meta_path)
+
+    @contextmanager
+    def locked(self):
+        if fcntl is None:
+            with self._thread_locks_guard:
+                lock = self._thread_locks.setdefault(self.id, threading.Lock())
+            if not lock.acquire(blocking=False):
+                raise UploadBusy()
+            try:
+                yield
+            finally:
+                lock.release()
+            return
+        with open(os.path.join(self.dir, 'lock'), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadBusy()
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, stream, offset, length, hasher):
+        """Tulis satu potongan dari stream mulai di offset; kembalikan jumlah byte yang dibaca.
+
+        Dibaca paling banyak length + 1 byte supaya potongan yang terlalu besar
+        bisa dikenali tanpa menampung seluruh body.
         """
-        cursor.execute(insert_query, (tanggal_masuk, departemen, nama_proker, bendahara, dokumen_name, dokumen_base64))
-        conn.commit()
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "RAB berhasil dikirim!"}), 200
-
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error submitting RAB: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/get_rabs', methods=['GET'])
-def get_rabs():
+        written = 0
+        with open(self.data_path, 'r+b') as data_file:
+            data_file.truncate(offset)
+            data_file.seek(offset)
+            while written <= length:
+                block = stream.read(min(64 * 1024, length + 1 - written))
+                if not block:
+                    break
+                hasher.update(block)
+                data_file.write(block)
+                written += len(block)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+        return written
+
+    def truncate(self, offset):
+        with open(self.data_path, 'r+b') as data_file:
+            data_file.truncate(offset)
+
+    def remove(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+        with self._thread_locks_guard:
+            self._thread_locks.pop(self.id, None)
+
+
+_last_upload_gc = 0.0
+
+def collect_upload_sessions():
+    """Hapus folder sesi upload yang sudah kedaluwarsa. Mengembalikan jumlah yang dihapus."""
+    global _last_upload_gc
+    _last_upload_gc = time.time()
+    removed = 0
+    for upload_id in os.listdir(UPLOAD_SESSION_DIR):
+        session = UploadSession(upload_id)
+        meta = session.load()
+        try:
+            # Folder tanpa meta.json (create yang gagal di tengah) diukur dari waktu folder dibuat
+            expires_at = meta['expiresAt'] if meta else os.path.getmtime(session.dir) + UPLOAD_SESSION_TTL
+        except OSError:
+            continue
+        if expires_at >= time.time():
+            continue
+        try:
+            with session.locked():
+                session.remove()
+                removed += 1
+        except (UploadBusy, OSError):
+            continue
+    return removed
+
+def upload_status(meta, status=200):
+    response = jsonify({
+        'id': meta['id'],
+        'target': meta['target'],
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'chunkSize': meta['chunkSize'],
+        'offset': meta['offset'],
+        'nextChunk': meta['offset'] // meta['chunkSize'],
+        'complete': meta['offset'] >= meta['size'],
+        'expiresAt': datetime.fromtimestamp(meta['expiresAt'], timezone.utc).isoformat(),
+    })
+    response.status_code = status
+    response.headers['Upload-Offset'] = str(meta['offset'])
+    response.headers['Upload-Length'] = str(meta['size'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def parse_upload_checksum(value):
+    """Header 'Upload-Checksum: <algoritma> <base64>' menjadi (objek hash, digest), atau (None, None)."""
+    if not value:
+        return None, None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True) # Mengembalikan hasil sebagai dictionary
-        cursor.execute("SELECT id, tanggalMasuk, departemen, namaProker, bendahara, dokumenName, tanggalDisetujui, dokumenBase64 FROM RAB")
-        rabs = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        # Format tanggal agar sesuai dengan yang diharapkan oleh frontend
-        for rab in rabs:
-            if rab['tanggalMasuk']:
-                rab['tanggalMasuk'] = rab['tanggalMasuk'].strftime('%Y-%m-%d')
-            if rab['tanggalDisetujui']:
-                rab['tanggalDisetujui'] = rab['tanggalDisetujui'].strftime('%Y-%m-%d')
-            else:
-                rab['tanggalDisetujui'] = '-' # Jika null, tampilkan '-'
-
-        return jsonify(rabs), 200
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error fetching rabs: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/download_rab/<int:rab_id>', methods=['GET'])
-def download_rab(rab_id):
+        algorithm, encoded = value.split(' ', 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except (ValueError, binascii.Error):
+        raise ValueError("Header Upload-Checksum harus berformat '<algoritma> <base64>'.")
+    if algorithm.lower() not in UPLOAD_CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Algoritma checksum {algorithm} tidak didukung.")
+    return hashlib.new(algorithm.lower()), digest
+
+@app.route('/uploads', methods=['POST'])
+@require_auth()
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    target = data.get('target')
+    filename = data.get('filename')
+    size = data.get('size')
+    if target not in UPLOAD_TARGETS:
+        return jsonify({"error": f"Target upload harus salah satu dari: {', '.join(UPLOAD_TARGETS)}."}), 400
+    if not filename or not isinstance(size, int) or size <= 0:
+        return jsonify({"error": "filename dan size (byte, lebih dari 0) wajib diisi."}), 400
+    if size > UPLOAD_SESSION_MAX_SIZE:
+        return jsonify({"error": f"Ukuran file melebihi batas {UPLOAD_SESSION_MAX_SIZE} byte."}), 413
+
+    if time.time() - _last_upload_gc > UPLOAD_GC_INTERVAL:
+        collect_upload_sessions()
+    session, meta = UploadSession.create(target, filename, size, data.get('mime') or None)
+    response = upload_status(meta, 201)
+    response.headers['Location'] = url_for('get_upload', upload_id=session.id, _external=True)
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@require_auth()
+def get_upload(upload_id):
+    session = UploadSession.open(upload_id)
+    if session is None:
+        return jsonify({"error": "Sesi upload tidak ditemukan atau sudah kedaluwarsa."}), 404
+    return upload_status(session.load())
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+@require_auth()
+def cancel_upload(upload_id):
+    session = UploadSession.open(upload_id)
+    if session is None:
+        return jsonify({"error": "Sesi upload tidak ditemukan atau sudah kedaluwarsa."}), 404
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT dokumenName, dokumenBase64 FROM RAB WHERE id = %s", (rab_id,))
-        rab = cursor.fetchone()
-        cursor.close()
-        conn.close()
-
-        if rab and rab['dokumenBase64']:
-            dokumen_name = rab['dokumenName']
-            dokumen_base64 = rab['dokumenBase64']
-
-            # Deteksi MIME type dari base64 string
-            # Ambil bagian sebelum koma (data:mimetype)
-            mime_type_part = dokumen_base64.split(';')[0]
-            if ':' in mime_type_part:
-                mime_type = mime_type_part.split(':')[1]
-            else:
-                # Fallback atau tebak dari ekstensi jika tidak ada mimetype di base64 string
-                ext = os.path.splitext(dokumen_name)[1].lower()
-                if ext == '.pdf':
-                    mime_type = 'application/pdf'
-                elif ext == '.doc' or ext == '.docx':
-                    mime_type = 'application/msword' # atau application/vnd.openxmlformats-officedocument.wordprocessingml.document
-                else:
-                    mime_type = 'application/octet-stream' # Default jika tidak diketahui
-
-            # Hapus header data URI jika ada (misalnya 'data:application/pdf;base64,')
-            if ',' in dokumen_base64:
-                base64_data = dokumen_base64.split(',')[1]
-            else:
-                base64_data = dokumen_base64
-
-            file_bytes = base64.b64decode(base64_data)
-            return send_file(BytesIO(file_bytes),
-                             mimetype=mime_type,
-                             as_attachment=True,
-                             download_name=dokumen_name)
-        else:
-            return jsonify({"error": "Dokumen tidak ditemukan atau data kosong."}), 404
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error downloading RAB: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/update_rab/<int:rab_id>', methods=['PUT'])
-def update_rab(rab_id):
+        with session.locked():
+            session.remove()
+    except UploadBusy:
+        return jsonify({"error": "Sesi upload sedang dipakai, coba lagi."}), 409
+    return jsonify({"message": "Upload dibatalkan."}), 200
+
+@app.route('/uploads/<upload_id>/<int:index>', methods=['PUT'])
+@require_auth()
+def put_upload_chunk(upload_id, index):
+    session = UploadSession.open(upload_id)
+    if session is None:
+        return jsonify({"error": "Sesi upload tidak ditemukan atau sudah kedaluwarsa."}), 404
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
-
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        bendahara = data.get('bendahara')
-        dokumen_name = data.get('dokumenName')
-        dokumen_base64 = data.get('dokumenBase64')
-        tanggal_disetujui = data.get('tanggalDisetujui')
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        update_query = """
-        UPDATE RAB
-        SET tanggalMasuk = %s, departemen = %s, namaProker = %s, bendahara = %s,
-            dokumenName = %s, dokumenBase64 = %s, tanggalDisetujui = %s
-        WHERE id = %s
-        """
-        cursor.execute(update_query, (
-            tanggal_masuk, departemen, nama_proker, bendahara,
-            dokumen_name, dokumen_base64, tanggal_disetujui, rab_id
-        ))
-        conn.commit()
+        hasher, expected_digest = parse_upload_checksum(request.headers.get('Upload-Checksum'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        if cursor.rowcount == 0:
-            return jsonify({"error": "RAB tidak ditemukan."}), 404
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "RAB berhasil diupdate!"}), 200
-
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error updating RAB: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/delete_rab/<int:rab_id>', methods=['DELETE'])
-def delete_rab(rab_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM RAB WHERE id = %s", (rab_id,))
-        conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"error": "RAB tidak ditemukan."}), 404
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "RAB berhasil dihapus!"}), 200
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error deleting RAB: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/submit_lra', methods=['POST'])
-def submit_lra():
+        with session.locked():
+            meta = session.load()
+            if meta is None:
+                return jsonify({"error": "Sesi upload sudah diselesaikan."}), 404
+            offset, chunk_size = meta['offset'], meta['chunkSize']
+            start = index * chunk_size
+            if start < offset:
+                # Potongan ini sudah tersimpan (dikirim ulang setelah koneksi putus)
+                return upload_status(meta)
+            if start > offset or offset >= meta['size']:
+                return upload_status(meta, 409)
+            length = min(chunk_size, meta['size'] - offset)
+            written = session.append(request.stream, offset, length, hasher or hashlib.sha256())
+            if written != length:
+                session.truncate(offset)
+                return jsonify({"error": f"Potongan {index} harus berukuran {length} byte, diterima {written}.",
+                                "offset": offset}), 400
+            if expected_digest is not None and hasher.digest() != expected_digest:
+                session.truncate(offset)
+                # 460 Checksum Mismatch, mengikuti protokol tus
+                return jsonify({"error": f"Checksum potongan {index} tidak cocok.", "offset": offset}), 460
+            meta['offset'] = offset + written
+            meta['expiresAt'] = time.time() + UPLOAD_SESSION_TTL
+            session.save(meta)
+    except UploadBusy:
+        meta = session.load()
+        if meta is None:
+            return jsonify({"error": "Sesi upload sudah diselesaikan."}), 404
+        return upload_status(meta, 409)
+    return upload_status(meta)
+
+def finish_dokumen_upload(session, meta, fields):
+    resource = DOKUMEN_RESOURCES[meta['target']]
+    dokumen_name = fields.get('dokumenName') or meta['filename']
+    content = HashingUploadFile.from_path(session.data_path, meta['mime'])
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
-
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        bendahara = data.get('bendahara')
-        dokumen_name = data.get('dokumenName')
-        dokumen_base64 = data.get('dokumenBase64')
-
-        # Validasi minimal
-        if not all([tanggal_masuk, departemen, nama_proker, bendahara, dokumen_name, dokumen_base64]):
-            return jsonify({"error": "Data LRA tidak lengkap. Pastikan semua field terisi, termasuk dokumen."}), 400
-
-        # Hapus "data:mimetype;base64," prefix jika ada
-        if ',' in dokumen_base64:
-            dokumen_base64 = dokumen_base64.split(',')[1]
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        insert_query = """
-        INSERT INTO LRA (tanggalMasuk, departemen, namaProker, bendahara, dokumenName, dokumenBase64)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (tanggal_masuk, departemen, nama_proker, bendahara, dokumen_name, dokumen_base64))
-        conn.commit()
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "LRA berhasil dikirim!"}), 200
-
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error submitting LRA: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/get_lras', methods=['GET'])
-def get_lras():
+        _, mime_type = read_dokumen(content, dokumen_name)
+        with db_cursor() as (conn, cursor):
+            resource.insert(cursor, fields, dokumen_name, content, mime_type)
+            resource.commit(conn, cursor)
+    finally:
+        content.close()
+    return {"message": f"{resource.table} berhasil dikirim!"}, 200
+
+def finish_persuratan_upload(session, meta, fields):
+    # File aktivitas persuratan tetap disimpan di UPLOAD_FOLDER seperti pada PUT /persuratan. Nama diberi
+    # akhiran id sesi agar tidak menimpa file lain.
+    stem, ext = os.path.splitext(secure_filename(meta['filename']) or 'aktivitas')
+    filename = f"{stem}_{session.id[:8]}{ext}"
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    tanggal_approve = fields.get('tanggalApprove')
+    with db_cursor() as (conn, cursor):
+        cursor.execute("""
+            INSERT INTO persuratan (tanggal_masuk, jenis_surat, nama, instansi, tanggal_approve, aktivitas)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (fields['tanggalMasuk'], fields['jenisSurat'], fields['nama'], fields['instansi'],
+              None if tanggal_approve in (None, '', '-') else tanggal_approve, filename))
+        touch_table(cursor, 'persuratan')
+        # File dipindahkan sebelum commit: bila pemindahan gagal, INSERT di-rollback oleh db_cursor;
+        # bila commit gagal, file dikembalikan ke sesi agar finalize bisa diulang
+        shutil.move(session.data_path, file_path)
+        try:
+            conn.commit()
+        except Exception:
+            shutil.move(file_path, session.data_path)
+            raise
+        mark_table_changed('persuratan')
+    return {"message": "Data persuratan berhasil disimpan!"}, 201
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@require_auth()
+def finalize_upload(upload_id):
+    session = UploadSession.open(upload_id)
+    if session is None:
+        return jsonify({"error": "Sesi upload tidak ditemukan atau sudah kedaluwarsa."}), 404
+    fields = request.get_json(silent=True) or {}
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True) # Mengembalikan hasil sebagai dictionary
-        cursor.execute("SELECT id, tanggalMasuk, departemen, namaProker, bendahara, dokumenName, tanggalDisetujui, dokumenBase64 FROM LRA")
-        lras = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        # Format tanggal agar sesuai dengan yang diharapkan oleh frontend
-        for lra in lras:
-            if lra['tanggalMasuk']:
-                lra['tanggalMasuk'] = lra['tanggalMasuk'].strftime('%Y-%m-%d')
-            if lra['tanggalDisetujui']:
-                lra['tanggalDisetujui'] = lra['tanggalDisetujui'].strftime('%Y-%m-%d')
+        with session.locked():
+            meta = session.load()
+            if meta is None:
+                return jsonify({"error": "Sesi upload sudah diselesaikan."}), 404
+            if meta['offset'] < meta['size']:
+                return upload_status(meta, 409)
+            missing = [name for name in UPLOAD_TARGETS[meta['target']] if not fields.get(name)]
+            if missing:
+                return jsonify({"error": f"Data {meta['target']} tidak lengkap: {', '.join(missing)}."}), 400
+            if meta['target'] == 'persuratan':
+                body, status = finish_persuratan_upload(session, meta, fields)
             else:
-                lra['tanggalDisetujui'] = '-' # Jika null, tampilkan '-'
-
-        return jsonify(lras), 200
+                body, status = finish_dokumen_upload(session, meta, fields)
+            # Hanya setelah commit: bila database gagal (5xx) file tetap ada dan finalize bisa diulang
+            session.remove()
+    except UploadBusy:
+        return jsonify({"error": "Sesi upload sedang dipakai, coba lagi."}), 409
+    except mysql.connector.DataError as err:
+        # Field ditolak database (mis. tanggal salah); sesi tetap ada, perbaiki field lalu ulangi finalize
+        return jsonify({"error": f"Data tidak valid: {err.msg}"}), 400
     except mysql.connector.Error as err:
         print(f"MySQL Error: {err}")
         return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error fetching lras: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/download_lra/<int:lra_id>', methods=['GET'])
-def download_lra(lra_id):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT dokumenName, dokumenBase64 FROM LRA WHERE id = %s", (lra_id,))
-        lra = cursor.fetchone()
-        cursor.close()
-        conn.close()
-
-        if lra and lra['dokumenBase64']:
-            dokumen_name = lra['dokumenName']
-            dokumen_base64 = lra['dokumenBase64']
-
-            # Deteksi MIME type dari base64 string
-            # Ambil bagian sebelum koma (data:mimetype)
-            mime_type_part = dokumen_base64.split(';')[0]
-            if ':' in mime_type_part:
-                mime_type = mime_type_part.split(':')[1]
-            else:
-                # Fallback atau tebak dari ekstensi jika tidak ada mimetype di base64 string
-                ext = os.path.splitext(dokumen_name)[1].lower()
-                if ext == '.pdf':
-                    mime_type = 'application/pdf'
-                elif ext == '.doc' or ext == '.docx':
-                    mime_type = 'application/msword' # atau application/vnd.openxmlformats-officedocument.wordprocessingml.document
-                else:
-                    mime_type = 'application/octet-stream' # Default jika tidak diketahui
-
-            # Hapus header data URI jika ada (misalnya 'data:application/pdf;base64,')
-            if ',' in dokumen_base64:
-                base64_data = dokumen_base64.split(',')[1]
-            else:
-                base64_data = dokumen_base64
-
-            file_bytes = base64.b64decode(base64_data)
-            return send_file(BytesIO(file_bytes),
-                             mimetype=mime_type,
-                             as_attachment=True,
-                             download_name=dokumen_name)
-        else:
-            return jsonify({"error": "Dokumen tidak ditemukan atau data kosong."}), 404
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error downloading LRA: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
-
-@app.route('/update_lra/<int:lra_id>', methods=['PUT'])
-def update_lra(lra_id):
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
-
-        tanggal_masuk = data.get('tanggalMasuk')
-        departemen = data.get('departemen')
-        nama_proker = data.get('namaProker')
-        bendahara = data.get('bendahara')
-        dokumen_name = data.get('dokumenName')
-        dokumen_base64 = data.get('dokumenBase64')
-        tanggal_disetujui = data.get('tanggalDisetujui')
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        update_query = """
-        UPDATE LRA
-        SET tanggalMasuk = %s, departemen = %s, namaProker = %s, bendahara = %s,
-            dokumenName = %s, dokumenBase64 = %s, tanggalDisetujui = %s
-        WHERE id = %s
-        """
-        cursor.execute(update_query, (
-            tanggal_masuk, departemen, nama_proker, bendahara,
-            dokumen_name, dokumen_base64, tanggal_disetujui, lra_id
-        ))
-        conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"error": "LRA tidak ditemukan."}), 404
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "LRA berhasil diupdate!"}), 200
-
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error updating LRA: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+    return jsonify(body), status
+
+@app.cli.command('gc-uploads')
+def gc_uploads_command():
+    """Hapus sesi upload bertahap yang sudah kedaluwarsa."""
+    click.echo(f"{collect_upload_sessions()} sesi upload dihapus.")
+
+# === MIGRASI SKEMA ===
+# Skema dibuat dan diubah lewat migrasi bernomor; nomor yang sudah dijalankan dicatat di schema_migrations.
+# MySQL: jalankan `flask migrate` saat deploy. SQLite: dijalankan otomatis saat koneksi pertama dibuka.
+SCHEMA_MIGRATIONS = [] # (versi, nama, fungsi(cursor)), urut menurut versi
+MIGRATION_LOCK = 'fkdk_schema_migrations' # Nama GET_LOCK MySQL agar dua deploy tidak bermigrasi bersamaan
+
+# Jenis kolom -> (tipe MySQL, tipe SQLite). Teks yang difilter memakai NOCASE seperti collation default MySQL.
+COLUMN_TYPES = {
+    'date': ('DATE', 'DATE'),
+    'text': ('VARCHAR(255)', 'TEXT COLLATE NOCASE'),
+    'name': ('VARCHAR(255)', 'TEXT'),
+    'base64': ('LONGTEXT', 'TEXT'),
+    'hash': ('CHAR(64)', 'CHAR(64)'),
+    'size': ('BIGINT', 'INTEGER'),
+    'mime': ('VARCHAR(100)', 'VARCHAR(100)'),
+}
 
-@app.route('/delete_lra/<int:lra_id>', methods=['DELETE'])
-def delete_lra(lra_id):
+def _dokumen_table_columns(pic_col):
+    return [('tanggalMasuk', 'date', True), ('departemen', 'text', False), ('namaProker', 'text', False),
+            (pic_col, 'text', False), ('dokumenName', 'name', False), ('dokumenBase64', 'base64', False),
+            ('dokumenHash', 'hash', False), ('dokumenSize', 'size', False), ('dokumenMime', 'mime', False),
+            ('tanggalDisetujui', 'date', False)]
+
+# Tabel -> [(kolom, jenis, NOT NULL?)]; kolom id selalu ditambahkan sebagai primary key
+SCHEMA_TABLES = {table: _dokumen_table_columns(pic_col) for table, _, pic_col in DOKUMEN_TYPES}
+SCHEMA_TABLES.update({
+    'persuratan': [('tanggal_masuk', 'date', True), ('jenis_surat', 'text', False), ('nama', 'text', False),
+                   ('instansi', 'text', False), ('tanggal_approve', 'date', False), ('aktivitas', 'name', False)],
+    'inventaris': [('nama', 'text', False), ('instansi', 'text', False), ('tanggal_surat_masuk', 'date', False),
+                   ('tanggal_pengambilan', 'date', False), ('tanggal_pengembalian', 'date', False),
+                   ('masa_sewa', 'text', False), ('keterangan_dp_lunas', 'text', False),
+                   ('bukti_pembayaran_name', 'name', False), ('bukti_pembayaran_base64', 'base64', False),
+                   ('bukti_pembayaran_hash', 'hash', False), ('bukti_pembayaran_size', 'size', False),
+                   ('bukti_pembayaran_mime', 'mime', False)],
+    'users': [('username', 'text', True), ('email', 'text', False), ('password_hash', 'name', True)],
+})
+
+def _list_indexes(table, date_col, filter_cols):
+    # Keyset paging mengurutkan (tanggal, id); setiap filter '=' / status mendapat indeks (filter, tanggal, id)
+    # sehingga WHERE dan ORDER BY ... LIMIT dilayani satu indeks tanpa sort
+    indexes = [(table, f"ix_{table.lower()}_{date_col.lower()}", (date_col, 'id'))]
+    indexes += [(table, f"ix_{table.lower()}_{col.lower()}", (col, date_col, 'id')) for col in filter_cols]
+    return indexes
+
+QUERY_INDEXES = [index for table, _, _ in DOKUMEN_TYPES
+                 for index in _list_indexes(table, 'tanggalMasuk', ['departemen', 'tanggalDisetujui'])]
+QUERY_INDEXES += _list_indexes('persuratan', 'tanggal_masuk', ['instansi', 'jenis_surat', 'tanggal_approve'])
+QUERY_INDEXES += _list_indexes('inventaris', 'tanggal_surat_masuk', ['instansi', 'keterangan_dp_lunas'])
+
+def schema_migration(version, name):
+    """Daftarkan fungsi sebagai migrasi bernomor. Fungsi harus idempoten: DDL MySQL tidak bisa di-rollback."""
+    def decorator(func):
+        SCHEMA_MIGRATIONS.append((version, name, func))
+        SCHEMA_MIGRATIONS.sort(key=lambda migration: migration[0])
+        return func
+    return decorator
+
+def _column_sql(name, kind, not_null, dialect):
+    sql = f"{name} {COLUMN_TYPES[kind][dialect]}{' NOT NULL' if not_null else ''}"
+    if dialect and kind == 'date':
+        # SQLite tidak memeriksa tipe DATE; teks yang bukan YYYY-MM-DD ditolak seperti di MySQL
+        sql += f" CHECK ({name} IS NULL OR date({name}) IS {name})"
+    return sql
+
+def create_table_sql(table, columns):
+    dialect = 1 if DB_BACKEND == 'sqlite' else 0
+    definitions = ', '.join(_column_sql(name, kind, not_null, dialect) for name, kind, not_null in columns)
+    if dialect:
+        return f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, {definitions})"
+    return (f"CREATE TABLE IF NOT EXISTS {table} (id INT AUTO_INCREMENT PRIMARY KEY, {definitions}) "
+            f"ENGINE=InnoDB DEFAULT CHARSET=utf8mb4")
+
+def ensure_index(cursor, table, name, columns, unique=False):
+    """Buat indeks bila belum ada (MySQL tidak mengenal CREATE INDEX IF NOT EXISTS)."""
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    if DB_BACKEND == 'sqlite':
+        cursor.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        return
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, name))
+    if not cursor.fetchall():
+        cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+
+@schema_migration(1, 'tabel_dasar')
+def _migrate_base_tables(cursor):
+    # Database lama di Railway sudah punya tabel ini; IF NOT EXISTS membiarkannya apa adanya
+    for table, columns in SCHEMA_TABLES.items():
+        cursor.execute(create_table_sql(table, columns))
+
+@schema_migration(2, 'dokumen_store')
+def _migrate_dokumen_store(cursor):
+    ensure_dokumen_schema(cursor)
+
+@schema_migration(3, 'table_version')
+def _migrate_table_version(cursor):
+    ensure_table_version_schema(cursor)
+
+@schema_migration(4, 'users_username_unik')
+def _migrate_users_username(cursor):
+    ensure_users_schema(cursor)
+
+@schema_migration(5, 'indeks_list')
+def _migrate_list_indexes(cursor):
+    for table, name, columns in QUERY_INDEXES:
+        ensure_index(cursor, table, name, columns)
+
+@schema_migration(6, 'mime_docx')
+def _migrate_docx_mime(cursor):
+    # detect_mime_type dulu memberi .docx tipe application/msword, sehingga unduhannya ikut dikompres
+    for table, (name_col, _, _, _, mime_col) in DOKUMEN_COLUMNS.items():
+        cursor.execute(f"UPDATE {table} SET {mime_col} = %s WHERE {mime_col} = %s AND LOWER({name_col}) LIKE %s",
+                       (DOCX_MIME_TYPE, 'application/msword', '%.docx'))
+        if cursor.rowcount:
+            touch_table(cursor, table)
+
+def migrate_schema(conn, cursor, echo=print):
+    """Jalankan migrasi yang belum tercatat di schema_migrations. Mengembalikan versi yang baru dijalankan.
+
+    Di SQLite semua migrasi berjalan dalam satu transaksi (DDL SQLite
+    transaksional); di MySQL setiap migrasi di-commit sendiri dan proses
+    lain ditahan dengan GET_LOCK.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    if DB_BACKEND == 'sqlite':
+        cursor.execute("BEGIN IMMEDIATE") # Worker lain menunggu lalu melihat migrasi yang sudah selesai
+    else:
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (MIGRATION_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Migrasi skema lain sedang berjalan.")
+    applied = []
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM LRA WHERE id = %s", (lra_id,))
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cursor.fetchall()}
+        for version, name, migrate in SCHEMA_MIGRATIONS:
+            if version in done:
+                continue
+            echo(f"Migrasi {version:03d} {name}")
+            migrate(cursor)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            if DB_BACKEND != 'sqlite':
+                conn.commit()
+            applied.append(version)
         conn.commit()
-
-        if cursor.rowcount == 0:
-            return jsonify({"error": "LRA tidak ditemukan."}), 404
-
-        cursor.close()
-        conn.close()
-
-        return jsonify({"message": "LRA berhasil dihapus!"}), 200
-    except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
-        return jsonify({"error": f"Kesalahan database: {err}"}), 500
-    except Exception as e:
-        print(f"Error deleting LRA: {e}")
-        return jsonify({"error": f"Terjadi kesalahan internal: {e}"}), 500
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if DB_BACKEND != 'sqlite':
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchall()
+    return applied
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Buat/perbarui skema database (tabel dan indeks) ke versi terbaru."""
+    with db_cursor(replica=False) as (conn, cursor):
+        applied = migrate_schema(conn, cursor, echo=click.echo)
+    click.echo(f"{len(applied)} migrasi dijalankan." if applied else "Skema sudah versi terbaru.")
+
+# table_version memang selalu dibaca utuh (satu baris per tabel)
+FULL_SCAN_ALLOWED = {'table_version'}
+
+def explain_full_scans(cursor, sql, params):
+    """Tabel yang dibaca utuh (full table scan) oleh sebuah query menurut EXPLAIN; cursor harus dictionary."""
+    if DB_BACKEND == 'sqlite':
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        # "SCAN t" tanpa "USING INDEX"/"USING COVERING INDEX" berarti setiap baris tabel dibaca
+        tables = [row['detail'].split()[1] for row in cursor.fetchall() if re.fullmatch(r'SCAN \w+', row['detail'])]
+    else:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        tables = [row['table'] for row in cursor.fetchall() if row['type'] == 'ALL']
+    return [table for table in tables if table not in FULL_SCAN_ALLOWED]
+
+def index_check_requests():
+    """(method, path) endpoint baca yang query-nya diperiksa check-indexes, mencakup setiap filter."""
+    page = encode_cursor(date(2024, 1, 1), 1)
+    paths = []
+    for resource in DOKUMEN_RESOURCES.values():
+        slug = resource.slug
+        paths += [f'/get_{slug}s', f'/get_{slug}s?cursor={page}', f'/get_{slug}s?order=asc&cursor={page}',
+                  f'/get_{slug}s?departemen=x', f'/get_{slug}s?departemen=x&cursor={page}',
+                  f'/get_{slug}s?dari=2024-01-01&sampai=2024-12-31', f'/get_{slug}s?status=pending',
+                  f'/get_{slug}s?status=approved', f'/get_{slug}s?ids=1,2', f'/{slug}/1', f'/download_{slug}/1']
+    paths += ['/persuratan', f'/persuratan?cursor={page}', '/persuratan?instansi=x', '/persuratan?jenis_surat=x',
+              '/persuratan?status=pending', '/persuratan?dari=2024-01-01', '/persuratan?ids=1,2',
+              '/persuratan/1', '/download_file/1']
+    paths += ['/inventaris', f'/inventaris?cursor={page}', '/inventaris?instansi=x', '/inventaris?status=x',
+              '/inventaris?sampai=2024-12-31', '/inventaris?ids=1,2', '/inventaris/1', '/download_bukti/1']
+    return [('GET', path) for path in paths]
+
+def find_full_scans():
+    """Jalankan endpoint baca, lalu EXPLAIN setiap query-nya. Mengembalikan ([(tabel, sql)], jumlah query)."""
+    client = app.test_client()
+    with recorded_queries() as queries:
+        for method, path in index_check_requests():
+            client.open(path, method=method).close()
+        # Login membaca users lewat username; kredensial salah cukup untuk menjalankan query-nya
+        client.post('/login', json={'username': 'check-indexes', 'password': 'x'}).close()
+    seen, problems = set(), []
+    with db_cursor(dictionary=True, replica=False) as (conn, cursor):
+        for sql, params in queries:
+            if not sql.lstrip().upper().startswith('SELECT') or sql in seen:
+                continue
+            seen.add(sql)
+            tables = explain_full_scans(cursor, sql, params)
+            if tables:
+                problems.append((tables, ' '.join(sql.split())))
+    return problems, len(seen)
+
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    """Jalankan endpoint baca, lalu EXPLAIN setiap query-nya; gagal bila ada full table scan."""
+    problems, checked = find_full_scans()
+    for tables, sql in problems:
+        click.echo(f"FULL SCAN {', '.join(tables)}: {sql}")
+    if problems:
+        raise click.ClickException(f"{len(problems)} dari {checked} query membaca tabel utuh.")
+    click.echo(f"{checked} query diperiksa, tidak ada full table scan.")
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""Semua test memakai backend SQLite di folder sementara. app membaca konfigurasi saat di-import,
+jadi environment diisi di sini sebelum modul test mana pun meng-import app."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix='fkdk-test-')
+os.environ.update(
+    DB_BACKEND='sqlite',
+    SQLITE_PATH=os.path.join(_tmp_dir, 'fkdk.sqlite3'),
+    DOKUMEN_STORE_DIR=os.path.join(_tmp_dir, 'dokumen_store'),
+    JWT_KEY_FILE=os.path.join(_tmp_dir, 'jwt_key'),
+    AUTH_REQUIRED='0', # Endpoint yang dilindungi harus benar-benar menjalankan query-nya
+)
+os.environ.pop('JWT_KEYS', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as fkdk
+
+fkdk.app.config['UPLOAD_FOLDER'] = os.path.join(_tmp_dir, 'uploads')
+os.makedirs(fkdk.app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+
+@pytest.fixture
+def client():
+    return fkdk.app.test_client()
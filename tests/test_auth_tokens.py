@@ -0,0 +1,91 @@
+"""JWT: rotasi kunci (kid), refresh token, dan kunci acak yang disimpan di JWT_KEY_FILE."""
+import os
+import stat
+
+import jwt
+import pytest
+
+import app
+
+OLD_KEY = ('old', 'o' * 40)
+NEW_KEY = ('new', 'n' * 40)
+
+
+@pytest.fixture
+def use_keys(monkeypatch):
+    monkeypatch.setattr(app.login_ip_limiter, 'capacity', 0) # Limit per IP tidak diuji di sini
+
+    def use(*keys):
+        monkeypatch.setattr(app, 'JWT_KEYS', list(keys))
+        monkeypatch.setattr(app, 'token_verifier', app.TokenVerifier(keys, 16))
+    return use
+
+
+def admin_request(client, access_token):
+    # Endpoint khusus admin; id yang tidak ada dijawab 404 setelah token lolos
+    return client.delete('/delete_rab/999999', headers={'Authorization': f'Bearer {access_token}'})
+
+
+def test_tokens_from_previous_key_verify_after_rotation(client, use_keys):
+    use_keys(OLD_KEY)
+    tokens = app.issue_tokens('pengurus', 'admin')
+    use_keys(NEW_KEY, OLD_KEY)
+    assert admin_request(client, tokens['access_token']).status_code == 404
+    assert jwt.get_unverified_header(app.issue_tokens('pengurus', 'admin')['access_token'])['kid'] == 'new'
+
+
+def test_tokens_from_retired_key_are_rejected(client, use_keys):
+    use_keys(OLD_KEY)
+    tokens = app.issue_tokens('pengurus', 'admin')
+    use_keys(NEW_KEY)
+    response = admin_request(client, tokens['access_token'])
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+
+
+def test_role_is_checked(client, use_keys):
+    use_keys(NEW_KEY)
+    assert admin_request(client, app.issue_tokens('anggota', 'user')['access_token']).status_code == 403
+
+
+def test_refresh_issues_pair_signed_with_current_key(client, use_keys):
+    use_keys(OLD_KEY)
+    tokens = app.issue_tokens('pengurus', 'admin')
+    use_keys(NEW_KEY, OLD_KEY)
+    response = client.post('/token/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+    refreshed = response.get_json()
+    assert jwt.get_unverified_header(refreshed['access_token'])['kid'] == 'new'
+    assert app.token_verifier.verify(refreshed['access_token'])['sub'] == 'pengurus'
+    assert admin_request(client, refreshed['access_token']).status_code == 404
+
+
+def test_access_token_cannot_be_used_to_refresh(client, use_keys):
+    use_keys(NEW_KEY)
+    tokens = app.issue_tokens('pengurus', 'admin')
+    assert client.post('/token/refresh', json={'refresh_token': tokens['access_token']}).status_code == 401
+    # Dan refresh token tidak bisa dipakai sebagai access token
+    assert admin_request(client, tokens['refresh_token']).status_code == 401
+
+
+def test_refresh_for_deleted_user_is_rejected(client, use_keys):
+    use_keys(NEW_KEY)
+    tokens = app.issue_tokens('akun-terhapus', 'user')
+    response = client.post('/token/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 401
+
+
+def test_jwt_keys_parsing(monkeypatch):
+    monkeypatch.setenv('JWT_KEYS', f"{NEW_KEY[0]}:{NEW_KEY[1]}, {OLD_KEY[0]}:{OLD_KEY[1]}")
+    assert app._load_jwt_keys() == [NEW_KEY, OLD_KEY]
+    monkeypatch.setenv('JWT_KEYS', 'pendek:rahasia')
+    with pytest.raises(RuntimeError):
+        app._load_jwt_keys()
+
+
+def test_generated_key_is_persisted_privately(tmp_path):
+    path = str(tmp_path / 'fkdk' / 'jwt_key')
+    secret = app._generated_jwt_key(path)
+    assert len(secret) >= 32
+    assert app._generated_jwt_key(path) == secret # Worker lain membaca kunci yang sama
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
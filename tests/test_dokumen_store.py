@@ -0,0 +1,135 @@
+"""Dokumen base64 lama dan penyimpanannya di dokumen_store."""
+import base64
+import hashlib
+import os
+import time
+
+import pytest
+
+import app
+
+
+def insert_legacy_lpj(dokumen_base64, name='laporan.pdf'):
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute("""
+            INSERT INTO LPJ (tanggalMasuk, departemen, namaProker, sekretaris, dokumenName, dokumenBase64)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, ('2024-03-01', 'Humas', 'Bakti Sosial', 'Sekretaris', name, dokumen_base64))
+        conn.commit()
+        return cursor.lastrowid
+
+
+def stored_hash(table, row_id):
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute(f"SELECT dokumenHash, dokumenBase64 FROM {table} WHERE id = %s", (row_id,))
+        return cursor.fetchone()
+
+
+def test_decode_ignores_line_wrapping():
+    data = bytes(range(256)) * 4
+    encoded = base64.encodebytes(data).decode() # Dibungkus per 76 karakter
+    assert '\n' in encoded
+    assert app.decode_dokumen_base64('data:application/pdf;base64,' + encoded, 'a.pdf') == (data, 'application/pdf')
+
+
+def test_migrate_moves_line_wrapped_base64(client):
+    data = b'%PDF-1.4 ' + bytes(range(256)) * 8
+    plain_id = insert_legacy_lpj(base64.b64encode(data + b'plain').decode())
+    wrapped_id = insert_legacy_lpj(base64.encodebytes(data + b'wrapped').decode().replace('\n', '\r\n'))
+    # Sebelum dimigrasikan, keduanya tetap bisa diunduh dari kolom base64
+    assert client.get(f'/download_lpj/{wrapped_id}').data == data + b'wrapped'
+
+    migrated, failed = app.migrate_dokumen_table('LPJ', echo=lambda message: None)
+
+    assert failed == 0 and migrated >= 2
+    for row_id, content in ((plain_id, data + b'plain'), (wrapped_id, data + b'wrapped')):
+        digest, legacy = stored_hash('LPJ', row_id)
+        assert legacy is None
+        assert digest == hashlib.sha256(content).hexdigest()
+        assert app.dokumen_store.exists(digest)
+        assert client.get(f'/download_lpj/{row_id}').data == content
+
+
+def test_download_wrapped_base64_with_aligned_length(client):
+    # 4 baris 76 karakter + 4 baris baru: panjang kolom tetap kelipatan 4, tapi tidak bisa dibaca per potongan
+    data = bytes(range(228))
+    encoded = base64.encodebytes(data).decode()
+    assert len(encoded) % 4 == 0 and encoded.count('\n') == 4
+    row_id = insert_legacy_lpj(encoded)
+    response = client.get(f'/download_lpj/{row_id}')
+    assert response.status_code == 200
+    assert response.data == data
+
+
+def submit_lpj(client, content):
+    response = client.post('/submit_lpj', json={
+        'tanggalMasuk': '2024-04-01', 'departemen': 'Humas', 'namaProker': 'Bakti Sosial', 'sekretaris': 'Sekretaris',
+        'dokumenName': 'lpj.pdf', 'dokumenBase64': base64.b64encode(content).decode(),
+    })
+    assert response.status_code == 200
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute("SELECT MAX(id) FROM LPJ")
+        return cursor.fetchone()[0]
+
+
+def ref_count(digest):
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute("SELECT ref_count FROM dokumen_blob WHERE hash = %s", (digest,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def age(digest, seconds):
+    old = time.time() - seconds
+    os.utime(app.dokumen_store.path(digest), (old, old))
+
+
+def test_identical_documents_share_one_blob_until_the_last_reference(client):
+    content = b'%PDF-1.4 dokumen bersama'
+    digest = hashlib.sha256(content).hexdigest()
+    first, second = submit_lpj(client, content), submit_lpj(client, content)
+    assert ref_count(digest) == 2
+
+    assert client.delete(f'/delete_lpj/{first}').status_code == 200
+    assert ref_count(digest) == 1
+    assert app.dokumen_store.exists(digest)
+    assert client.get(f'/download_lpj/{second}').data == content
+
+    assert client.delete(f'/delete_lpj/{second}').status_code == 200
+    assert ref_count(digest) is None
+    assert not app.dokumen_store.exists(digest)
+
+
+def test_orphan_from_rolled_back_transaction_is_swept():
+    orphan, kept = b'%PDF-1.4 transaksi gagal', b'%PDF-1.4 tersimpan'
+    with pytest.raises(RuntimeError):
+        with app.db_cursor() as (conn, cursor):
+            orphan_digest, _ = app.acquire_dokumen(cursor, orphan, 'application/pdf')
+            raise RuntimeError("INSERT berikutnya gagal")
+    with app.db_cursor() as (conn, cursor):
+        kept_digest, _ = app.acquire_dokumen(cursor, kept, 'application/pdf')
+        conn.commit()
+    assert ref_count(orphan_digest) is None and app.dokumen_store.exists(orphan_digest)
+
+    # File yang masih baru dibiarkan: transaksinya mungkin belum selesai
+    assert app.collect_orphan_dokumen(grace=3600) == 0
+    age(orphan_digest, 7200)
+    age(kept_digest, 7200)
+    assert app.collect_orphan_dokumen(grace=3600) == 1
+    assert not app.dokumen_store.exists(orphan_digest)
+    assert app.dokumen_store.exists(kept_digest)
+
+
+def test_reused_orphan_is_not_swept():
+    content = b'%PDF-1.4 dipakai lagi'
+    with app.db_cursor() as (conn, cursor):
+        digest, _ = app.acquire_dokumen(cursor, content, 'application/pdf')
+        conn.rollback()
+    age(digest, 7200)
+    # Transaksi lain memakai ulang file lama: mtime diperbarui sehingga sweep tidak menghapusnya
+    # sebelum transaksi itu sempat commit
+    with app.db_cursor() as (conn, cursor):
+        app.acquire_dokumen(cursor, content, 'application/pdf')
+        conn.rollback()
+    assert app.collect_orphan_dokumen(grace=3600) == 0
+    assert app.dokumen_store.exists(digest)
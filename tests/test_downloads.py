@@ -0,0 +1,110 @@
+"""Unduhan dokumen: Range/206 dari dokumen_store dan pembacaan base64 lama per potongan."""
+import base64
+import hashlib
+
+import pytest
+
+import app
+
+CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 40
+
+
+def submit_rab(client, content, name='anggaran.pdf'):
+    response = client.post('/submit_rab', json={
+        'tanggalMasuk': '2024-05-01', 'departemen': 'Keuangan', 'namaProker': 'Rapat Kerja', 'bendahara': 'Bendahara',
+        'dokumenName': name, 'dokumenBase64': base64.b64encode(content).decode(),
+    })
+    assert response.status_code == 200, response.get_json()
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute("SELECT MAX(id) FROM RAB")
+        return cursor.fetchone()[0]
+
+
+def insert_legacy_rab(dokumen_base64):
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute("""
+            INSERT INTO RAB (tanggalMasuk, departemen, namaProker, bendahara, dokumenName, dokumenBase64)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, ('2024-05-02', 'Keuangan', 'Rapat Kerja', 'Bendahara', 'lama.pdf', dokumen_base64))
+        conn.commit()
+        return cursor.lastrowid
+
+
+@pytest.fixture
+def stored_id(client):
+    return submit_rab(client, CONTENT)
+
+
+def test_full_download_advertises_ranges(client, stored_id):
+    response = client.get(f'/download_rab/{stored_id}')
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag'] == f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+
+
+def test_single_range_returns_206(client, stored_id):
+    response = client.get(f'/download_rab/{stored_id}', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(CONTENT)}'
+    assert response.data == CONTENT[100:200]
+
+
+def test_suffix_range(client, stored_id):
+    response = client.get(f'/download_rab/{stored_id}', headers={'Range': 'bytes=-10'})
+    assert response.status_code == 206
+    assert response.data == CONTENT[-10:]
+
+
+def test_multiple_ranges_return_multipart(client, stored_id):
+    response = client.get(f'/download_rab/{stored_id}', headers={'Range': 'bytes=0-9,500-509'})
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert f'Content-Range: bytes 0-9/{len(CONTENT)}'.encode() in response.data
+    assert CONTENT[0:10] in response.data and CONTENT[500:510] in response.data
+
+
+def test_unsatisfiable_range_returns_416(client, stored_id):
+    response = client.get(f'/download_rab/{stored_id}', headers={'Range': f'bytes={len(CONTENT) + 10}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+
+def test_matching_etag_returns_304(client, stored_id):
+    etag = client.get(f'/download_rab/{stored_id}').headers['ETag']
+    response = client.get(f'/download_rab/{stored_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_legacy_base64_is_read_in_chunks(client, monkeypatch):
+    row_id = insert_legacy_rab('data:application/pdf;base64,' + base64.b64encode(CONTENT).decode())
+    monkeypatch.setattr(app, 'DOWNLOAD_CHUNK_SIZE', 64)
+    with app.recorded_queries() as queries:
+        response = client.get(f'/download_rab/{row_id}')
+        assert response.data == CONTENT
+    chunks = [sql for sql, _ in queries if 'SUBSTRING(dokumenBase64, %s, %s)' in sql]
+    assert len(chunks) == -(-len(base64.b64encode(CONTENT)) // 64)
+    assert response.mimetype == 'application/pdf'
+    assert int(response.headers['Content-Length']) == len(CONTENT)
+
+
+def test_legacy_range_seeks_without_reading_earlier_chunks(client, monkeypatch):
+    row_id = insert_legacy_rab(base64.b64encode(CONTENT).decode())
+    monkeypatch.setattr(app, 'DOWNLOAD_CHUNK_SIZE', 64)
+    with app.recorded_queries() as queries:
+        response = client.get(f'/download_rab/{row_id}', headers={'Range': 'bytes=1001-1010'})
+        assert response.status_code == 206
+        assert response.data == CONTENT[1001:1011]
+    starts = [params[0] for sql, params in queries if 'SUBSTRING(dokumenBase64, %s, %s)' in sql]
+    assert starts == [1001 // 3 * 4 + 1]
+
+
+def test_base64_column_reader_seek_and_read():
+    encoded = base64.b64encode(CONTENT).decode()
+    row_id = insert_legacy_rab(encoded)
+    reader = app.Base64ColumnReader('RAB', row_id, 'dokumenBase64', 0, len(encoded))
+    reader.seek(5)
+    assert reader.read(20) == CONTENT[5:25]
+    assert reader.tell() == 25
+    assert reader.read() == CONTENT[25:]
@@ -0,0 +1,10 @@
+"""Query endpoint baca harus memakai indeks: sama dengan `flask check-indexes`, di atas file SQLite sementara."""
+import app
+
+
+def test_list_queries_do_not_scan_full_tables():
+    with app.db_cursor() as (conn, cursor):
+        app.migrate_schema(conn, cursor, echo=lambda message: None)
+    problems, checked = app.find_full_scans()
+    assert checked > 0
+    assert problems == []
@@ -0,0 +1,88 @@
+"""ResponseCache: invalidasi saat tabel ditulis (di worker ini atau worker lain) dan stale-while-revalidate."""
+import base64
+import time
+from types import SimpleNamespace
+
+import app
+
+
+def insert_lra_directly(departemen):
+    # Menulis tanpa touch_table/mark_table_changed: cache tidak tahu ada perubahan
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute("""
+            INSERT INTO LRA (tanggalMasuk, departemen, namaProker, bendahara, dokumenName)
+            VALUES (%s, %s, %s, %s, %s)
+        """, ('2024-06-01', departemen, 'Proker', 'Bendahara', 'lra.pdf'))
+        conn.commit()
+
+
+def list_lra(client, departemen):
+    response = client.get(f'/get_lras?departemen={departemen}')
+    assert response.status_code == 200
+    return [row['departemen'] for row in response.get_json()]
+
+
+def lra_queries(queries):
+    return [sql for sql, _ in queries if 'FROM LRA' in sql]
+
+
+def test_cached_list_is_served_without_queries(client):
+    assert list_lra(client, 'cache-hit') == []
+    insert_lra_directly('cache-hit')
+    with app.recorded_queries() as queries:
+        assert list_lra(client, 'cache-hit') == []
+    assert lra_queries(queries) == []
+
+
+def test_write_through_endpoint_invalidates(client):
+    assert list_lra(client, 'cache-write') == []
+    insert_lra_directly('cache-write')
+    response = client.post('/submit_lra', json={
+        'tanggalMasuk': '2024-06-02', 'departemen': 'cache-write', 'namaProker': 'Proker', 'bendahara': 'Bendahara',
+        'dokumenName': 'lra.pdf', 'dokumenBase64': base64.b64encode(b'%PDF lra').decode(),
+    })
+    assert response.status_code == 200
+    assert list_lra(client, 'cache-write') == ['cache-write', 'cache-write']
+
+
+def test_version_bump_from_another_worker_invalidates(client):
+    assert list_lra(client, 'cache-remote') == []
+    insert_lra_directly('cache-remote')
+    with app.db_cursor() as (conn, cursor):
+        app.touch_table(cursor, 'LRA') # Seperti worker lain: versi naik tanpa mark_table_changed di worker ini
+        conn.commit()
+    app.table_versions.expire()
+    assert list_lra(client, 'cache-remote') == ['cache-remote']
+
+
+def test_stale_entry_is_served_while_refreshing(client, monkeypatch):
+    monkeypatch.setattr(app.response_cache, 'ttl', 0)
+    assert list_lra(client, 'cache-stale') == []
+    insert_lra_directly('cache-stale')
+    # Entri basi langsung dikirim; satu thread memperbaruinya di belakang
+    assert list_lra(client, 'cache-stale') == []
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and list_lra(client, 'cache-stale') == []:
+        time.sleep(0.02)
+    assert list_lra(client, 'cache-stale') == ['cache-stale']
+
+
+def test_expired_entry_is_served_when_database_is_unavailable(client, monkeypatch):
+    assert list_lra(client, 'cache-fallback') == []
+    monkeypatch.setattr(app.response_cache, 'ttl', 0)
+    monkeypatch.setattr(app.response_cache, 'stale', 0)
+
+    def unavailable(*args, **kwargs):
+        raise app.DatabaseUnavailable(1)
+    monkeypatch.setattr(app, 'db_cursor', unavailable)
+    assert list_lra(client, 'cache-fallback') == []
+    assert client.get('/get_lras?departemen=cache-uncached').status_code == 503
+
+
+def test_store_is_rejected_after_invalidate():
+    cache = app.ResponseCache(4, 30, 300)
+    generation = cache.generation('LRA')
+    cache.invalidate('LRA') # Tabel ditulis selama response dibuat
+    assert not cache.store('/get_lras', SimpleNamespace(table='LRA'), generation)
+    assert cache.lookup('/get_lras') == (None, False)
+    assert cache.store('/get_lras', SimpleNamespace(table='LRA'), cache.generation('LRA'))
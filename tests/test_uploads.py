@@ -0,0 +1,139 @@
+"""Upload bertahap: potongan, lanjutan setelah putus, dan finalize ke tabel dokumen/persuratan."""
+import base64
+import hashlib
+import os
+
+import pytest
+
+import app
+
+CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 2 # 521 byte: 9 potongan 64 byte
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(app, 'UPLOAD_CHUNK_SIZE', 64)
+
+
+def create_upload(client, target, filename='proposal.pdf', content=CONTENT):
+    response = client.post('/uploads', json={'target': target, 'filename': filename, 'size': len(content)})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def send_chunks(client, upload_id, content=CONTENT, first=0):
+    for index in range(first, -(-len(content) // 64)):
+        response = client.put(f'/uploads/{upload_id}/{index}', data=content[index * 64:(index + 1) * 64])
+        assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+PROPOSAL_FIELDS = {'tanggalMasuk': '2024-07-01', 'departemen': 'Upload', 'namaProker': 'Unggah', 'sekretaris': 'S'}
+PERSURATAN_FIELDS = {'tanggalMasuk': '2024-07-01', 'jenisSurat': 'Undangan', 'nama': 'Budi', 'instansi': 'Upload'}
+
+
+def latest(table, columns):
+    with app.db_cursor(dictionary=True) as (conn, cursor):
+        cursor.execute(f"SELECT {columns} FROM {table} ORDER BY id DESC LIMIT 1")
+        return cursor.fetchone()
+
+
+def count_persuratan(instansi):
+    with app.db_cursor() as (conn, cursor):
+        cursor.execute("SELECT COUNT(*) FROM persuratan WHERE instansi = %s", (instansi,))
+        return cursor.fetchone()[0]
+
+
+def test_resumed_upload_is_finalized_into_store(client):
+    upload_id = create_upload(client, 'Proposal')
+    assert client.put(f'/uploads/{upload_id}/0', data=CONTENT[:64]).status_code == 200
+    # Potongan yang dikirim ulang setelah koneksi putus diabaikan; potongan yang melompat ditolak
+    assert client.put(f'/uploads/{upload_id}/0', data=CONTENT[:64]).get_json()['offset'] == 64
+    assert client.put(f'/uploads/{upload_id}/2', data=CONTENT[128:192]).status_code == 409
+    status = client.get(f'/uploads/{upload_id}')
+    assert status.headers['Upload-Offset'] == '64' and status.get_json()['nextChunk'] == 1
+
+    assert send_chunks(client, upload_id, first=1)['complete']
+    response = client.post(f'/uploads/{upload_id}/finalize', json=PROPOSAL_FIELDS)
+    assert response.status_code == 200
+
+    assert client.get(f'/uploads/{upload_id}').status_code == 404
+    row = latest('Proposal', 'id, dokumenHash, dokumenSize, dokumenName')
+    assert row['dokumenHash'] == hashlib.sha256(CONTENT).hexdigest()
+    assert row['dokumenSize'] == len(CONTENT) and row['dokumenName'] == 'proposal.pdf'
+    assert client.get(f"/download_proposal/{row['id']}").data == CONTENT
+
+
+def test_corrupt_chunk_is_rejected_by_checksum(client):
+    upload_id = create_upload(client, 'Proposal')
+    checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(CONTENT[:64]).digest()).decode()
+    response = client.put(f'/uploads/{upload_id}/0', data=b'x' * 64, headers={'Upload-Checksum': checksum})
+    assert response.status_code == 460
+    assert client.get(f'/uploads/{upload_id}').get_json()['offset'] == 0
+    response = client.put(f'/uploads/{upload_id}/0', data=CONTENT[:64], headers={'Upload-Checksum': checksum})
+    assert response.get_json()['offset'] == 64
+
+
+def test_incomplete_upload_cannot_be_finalized(client):
+    upload_id = create_upload(client, 'Proposal')
+    client.put(f'/uploads/{upload_id}/0', data=CONTENT[:64])
+    assert client.post(f'/uploads/{upload_id}/finalize', json=PROPOSAL_FIELDS).status_code == 409
+
+
+def test_rejected_fields_keep_the_session(client):
+    upload_id = create_upload(client, 'Proposal')
+    send_chunks(client, upload_id)
+    assert client.post(f'/uploads/{upload_id}/finalize', json={'departemen': 'Upload'}).status_code == 400
+    bad_date = dict(PROPOSAL_FIELDS, tanggalMasuk='2024-13-45')
+    assert client.post(f'/uploads/{upload_id}/finalize', json=bad_date).status_code == 400
+    assert client.get(f'/uploads/{upload_id}').status_code == 200
+    assert client.post(f'/uploads/{upload_id}/finalize', json=PROPOSAL_FIELDS).status_code == 200
+
+
+def test_database_outage_keeps_the_session_for_retry(client, monkeypatch):
+    upload_id = create_upload(client, 'Proposal')
+    send_chunks(client, upload_id)
+    db_cursor = app.db_cursor
+
+    def unavailable(*args, **kwargs):
+        raise app.DatabaseUnavailable(1)
+    monkeypatch.setattr(app, 'db_cursor', unavailable)
+    assert client.post(f'/uploads/{upload_id}/finalize', json=PROPOSAL_FIELDS).status_code == 503
+    monkeypatch.setattr(app, 'db_cursor', db_cursor)
+
+    assert client.get(f'/uploads/{upload_id}').get_json()['complete']
+    assert client.post(f'/uploads/{upload_id}/finalize', json=PROPOSAL_FIELDS).status_code == 200
+    assert latest('Proposal', 'dokumenHash')['dokumenHash'] == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_persuratan_uploads_with_the_same_name_do_not_overwrite(client):
+    fields = dict(PERSURATAN_FIELDS, instansi='upload-unik')
+    names = []
+    for content in (CONTENT, CONTENT[::-1]):
+        upload_id = create_upload(client, 'persuratan', 'surat.pdf', content)
+        send_chunks(client, upload_id, content)
+        assert client.post(f'/uploads/{upload_id}/finalize', json=fields).status_code == 201
+        row = latest('persuratan', 'id, aktivitas')
+        names.append(row['aktivitas'])
+        assert client.get(f"/download_file/{row['id']}").data == content
+    assert names[0] != names[1]
+    assert all(name.startswith('surat_') and name.endswith('.pdf') for name in names)
+
+
+def test_failed_persuratan_move_rolls_back_the_row(client, monkeypatch):
+    fields = dict(PERSURATAN_FIELDS, instansi='upload-disk-penuh')
+    upload_id = create_upload(client, 'persuratan', 'surat.pdf')
+    send_chunks(client, upload_id)
+    move = app.shutil.move
+
+    def disk_full(*args):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(app.shutil, 'move', disk_full)
+    assert client.post(f'/uploads/{upload_id}/finalize', json=fields).status_code == 500
+    monkeypatch.setattr(app.shutil, 'move', move)
+
+    assert count_persuratan('upload-disk-penuh') == 0
+    assert client.post(f'/uploads/{upload_id}/finalize', json=fields).status_code == 201
+    assert count_persuratan('upload-disk-penuh') == 1
+    aktivitas = latest('persuratan', 'aktivitas')['aktivitas']
+    assert os.path.exists(os.path.join(app.app.config['UPLOAD_FOLDER'], aktivitas))